@@ -244,15 +244,15 @@ def generate_comparison_criteria_with_aggregated_summary(paper_ids: list, get_pa
         logger.error("Error parsing aggregated criteria: %s", e)
         return {}, summaries
 
-def refine_criterion(criterion: dict, paper_ids: list, get_paper_chunks, retrieve_relevant_chunks, prompt_chatgpt) -> dict:
+def refine_criterion(criterion: dict, paper_ids: list, retrieve_relevant_chunks, prompt_chatgpt) -> dict:
     """
     Refine a given evaluation criterion by gathering additional details (via RAG) from each paper.
+    retrieve_relevant_chunks(query, paper_id, top_k) returns a paper's chunks most relevant to the query.
     """
     combined_excerpts = ""
     for pid in paper_ids:
-        chunks = get_paper_chunks(pid)
         query_text = f"{criterion['criterion']} - {criterion['description']}"
-        relevant_chunks = retrieve_relevant_chunks(query_text, chunks, top_k=3)
+        relevant_chunks = retrieve_relevant_chunks(query_text, pid, top_k=3)
         excerpt_text = "\n".join(f"{c['section_title']}: {c['chunk_text']}" for c in relevant_chunks)
         combined_excerpts += f"Paper {pid}:\n{excerpt_text}\n\n"
     
@@ -320,7 +320,7 @@ def generate_comparison_criteria_with_hybrid_approach(paper_ids: list, get_paper
 
     refined_criteria = {"comparison_points": []}
     for crit in initial_criteria:
-        refined = refine_criterion(crit, paper_ids, get_paper_chunks, retrieve_relevant_chunks, prompt_chatgpt)
+        refined = refine_criterion(crit, paper_ids, retrieve_relevant_chunks, prompt_chatgpt)
         # Assuming the refined output is directly a dictionary; if it contains a list, adjust accordingly.
         refined_criteria["comparison_points"].extend(refined)
     
@@ -769,7 +769,8 @@ def create_comparison_criteria_two_passes(
     paper_ids: list[str],
     prompt_chatgpt,
     expansion_approach: str = "boolean_then_expand",
-    merging_approach: str = "full_table"
+    merging_approach: str = "full_table",
+    papers_chunks: dict = None
 ) -> list[dict]:
     """
     Master method that:
@@ -779,6 +780,7 @@ def create_comparison_criteria_two_passes(
       4) (Optional) Creates the final "comparison table" across all papers using these merged criteria.
 
     Returns the final merged criteria or a final table structure.
+    If papers_chunks (paper ID -> chunks) is given, chunks are read from it instead of the repository.
     """
 
     if expansion_approach not in ["boolean_then_expand", "direct_boolean"]:
@@ -792,7 +794,7 @@ def create_comparison_criteria_two_passes(
 
     for idx, pid in enumerate(paper_ids):
         # Retrieve or build the full text
-        chunks = repository.get_chunks_by_semantic_id(pid)
+        chunks = papers_chunks[pid] if papers_chunks is not None else repository.get_chunks_by_semantic_id(pid)
         full_text = "\n".join(chunk["chunk_text"] for chunk in chunks)
 
         # Expand criteria
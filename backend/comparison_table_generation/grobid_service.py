@@ -1,7 +1,14 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
+from lxml import etree
 import grobid_tei_xml
+import functools
+import hashlib
+import io
 import os
+import re
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -9,12 +16,46 @@ load_dotenv()
 
 # Define the GROBID server URL
 GROBID_BASE_URL = os.getenv("GROBID_BASE_URL")
+GROBID_TIMEOUT = 120  # seconds to wait for a single GROBID response
+
+# Directory holding formatted extraction results, keyed by PDF content hash
+GROBID_CACHE_DIR = os.getenv("GROBID_CACHE_DIR", "grobid_cache")
+
+# Shared session so repeated GROBID calls reuse pooled TCP connections.
+# Retries cover connection failures; POSTs are not re-sent after a response.
+SESSION = requests.Session()
+_GROBID_ADAPTER = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=Retry(total=3, backoff_factor=0.5))
+SESSION.mount("http://", _GROBID_ADAPTER)
+SESSION.mount("https://", _GROBID_ADAPTER)
+
+# Namespace used by every element in GROBID's TEI output
+TEI_NS = {"t": "http://www.tei-c.org/ns/1.0"}
+TEI_DIV_TAG = "{http://www.tei-c.org/ns/1.0}div"
 
 # Keywords for filtering section titles
 HEAD_KEYWORDS = [
     "evaluation", "methodology", "related work", "conclusion", "baseline"
 ]
 
+# Lowercased once, so differently-cased or repeated keywords collapse to one entry
+HEAD_KEYWORDS_SET = frozenset(keyword.lower() for keyword in HEAD_KEYWORDS)
+
+@functools.lru_cache(maxsize=32)
+def compile_keyword_regex(keywords):
+    """
+    Compile a case-insensitive alternation matching any of the given keywords.
+
+    Parameters:
+        keywords (frozenset): Lowercased keywords to match.
+
+    Returns:
+        re.Pattern: Pattern whose search() succeeds if any keyword occurs in the text.
+    """
+    ordered = sorted(keywords, key=len, reverse=True)
+    return re.compile("|".join(re.escape(keyword) for keyword in ordered), re.IGNORECASE)
+
+HEAD_REGEX = compile_keyword_regex(HEAD_KEYWORDS_SET)
+
 def send_request_to_grobid(endpoint, pdf_path):
     """
     Sends a request to the GROBID server for a specified endpoint.
@@ -27,10 +68,11 @@ def send_request_to_grobid(endpoint, pdf_path):
         response: Response object from the GROBID server.
     """
     url = f"{GROBID_BASE_URL}/{endpoint}"
-    files = {'input': open(pdf_path, 'rb')}
-    headers = {'Accept': 'application/xml'}
+    headers = {'Accept': 'application/xml', 'Accept-Encoding': 'gzip'}
 
-    return requests.post(url, files=files, headers=headers)
+    with open(pdf_path, 'rb') as pdf_file:
+        files = {'input': (os.path.basename(pdf_path), pdf_file, 'application/pdf')}
+        return SESSION.post(url, files=files, headers=headers, timeout=GROBID_TIMEOUT)
 
 def extract_tei_from_pdf(pdf_path):
     """
@@ -60,16 +102,27 @@ def extract_filtered_sections_from_tei(tei_xml, keywords=HEAD_KEYWORDS):
     Returns:
         dict: A dictionary with filtered section titles as keys and full <div> content as values.
     """
-    print(tei_xml)
-    soup = BeautifulSoup(tei_xml, "xml")
+    if keywords is HEAD_KEYWORDS:
+        keyword_regex = HEAD_REGEX
+    else:
+        keyword_regex = compile_keyword_regex(frozenset(keyword.lower() for keyword in keywords))
     filtered_sections = {}
 
-    for div in soup.find_all("div", xmlns="http://www.tei-c.org/ns/1.0"):
-        head = div.find("head")
-        if head and head.text.strip():
-            title = head.text.strip()
-            if any(keyword.lower() in title.lower() for keyword in keywords):
-                filtered_sections[title] = div.text.strip()
+    # Stream the document div by div, discarding each one once it has been read
+    # so memory stays bounded by a single section rather than the whole TEI tree
+    for _, div in etree.iterparse(io.BytesIO(tei_xml.encode()), events=("end",), tag=TEI_DIV_TAG):
+        head = div.find("t:head", TEI_NS)
+        if head is not None:
+            title = "".join(head.itertext()).strip()
+            if title and keyword_regex.search(title):
+                filtered_sections[title] = "".join(div.itertext()).strip()
+
+        # Nested divs are kept until their enclosing div has been read
+        parent = div.getparent()
+        if parent is not None and parent.tag != TEI_DIV_TAG:
+            div.clear()
+            while div.getprevious() is not None:
+                del parent[0]
 
     return filtered_sections
 
@@ -122,6 +175,36 @@ def extract_all_sections(pdf_path):
     
     
 
+def header_metadata_from_document(doc):
+    """
+    Build the header metadata dictionary from a parsed GROBID document.
+
+    Parameters:
+        doc (GrobidDocument): Document returned by grobid_tei_xml.parse_document_xml.
+
+    Returns:
+        dict: Title, abstract, authors, DOI and citations, with placeholders for missing fields.
+    """
+    return {
+        "title": doc.header.title if doc.header.title else "Title not found.",
+        "abstract": doc.abstract if doc.abstract else "Abstract not found.",
+        "authors": doc.header.authors if doc.header.authors else [],
+        "doi": doc.header.doi if doc.header.doi else "DOI not found.",
+        "citations": doc.citations if doc.citations else []
+    }
+
+def reference_titles(citations):
+    """
+    Collect reference titles from parsed GROBID citations.
+
+    Parameters:
+        citations (list): GrobidBiblio entries.
+
+    Returns:
+        list: Reference titles, or a single placeholder if none were found.
+    """
+    return [citation.title for citation in citations if citation.title] or ["No reference titles found."]
+
 def extract_metadata(pdf_path, metadata_type):
     """
     Extract metadata (title, abstract, or references) from a PDF using GROBID.
@@ -138,16 +221,10 @@ def extract_metadata(pdf_path, metadata_type):
     if response.status_code == 200:
         if metadata_type == "processHeaderDocument":
             doc = grobid_tei_xml.parse_document_xml(response.text)
-            return {
-                "title": doc.header.title if doc.header.title else "Title not found.",
-                "abstract": doc.abstract if doc.abstract else "Abstract not found.",
-                "authors": doc.header.authors if doc.header.authors else [],
-                "doi": doc.header.doi if doc.header.doi else "DOI not found.",
-                "citations": doc.citations if doc.citations else []
-            }
+            return header_metadata_from_document(doc)
         elif metadata_type == "processReferences":
             citations = grobid_tei_xml.parse_citation_list_xml(response.text)
-            return [citation.title for citation in citations if citation.title] or ["No reference titles found."]
+            return reference_titles(citations)
     else:
         print(f"Error extracting {metadata_type}: {response.status_code}")
         return None
@@ -178,10 +255,33 @@ def format_extracted_data(title, abstract, references, sections):
     return "\n".join(formatted_data)
 
 
+def hash_pdf_content(pdf_path, chunk_size=1 << 20):
+    """
+    Compute a BLAKE2b digest of a PDF's bytes, reading it in chunks.
+
+    Parameters:
+        pdf_path (str): Path to the PDF file.
+        chunk_size (int): Number of bytes read per iteration.
+
+    Returns:
+        str: Hex digest identifying the file content.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(pdf_path, 'rb') as pdf_file:
+        for chunk in iter(lambda: pdf_file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+@functools.lru_cache(maxsize=256)
+def _cached_pdf_hash(pdf_path, mtime):
+    # Keyed on mtime so an overwritten PDF is re-hashed
+    return hash_pdf_content(pdf_path)
+
 # Extract everything metadata, title, abstract, references, and filtered sections then format the output
 def extract_all_metadata(pdf_path):
     """
     Extract all metadata, title, abstract, references, and filtered sections from a PDF.
+    Successful results are cached on disk under GROBID_CACHE_DIR, keyed by the PDF's content hash.
 
     Parameters:
         pdf_path (str): Path to the PDF file.
@@ -189,23 +289,36 @@ def extract_all_metadata(pdf_path):
     Returns:
         str: Formatted string of the extracted data.
     """
-    # Extract TEI XML
+    cache_key = _cached_pdf_hash(pdf_path, os.path.getmtime(pdf_path))
+    cache_path = os.path.join(GROBID_CACHE_DIR, f"{cache_key}.txt")
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as cache_file:
+            return cache_file.read()
+
+    # The full-text TEI already contains the header and bibliography, so one
+    # GROBID request covers sections, title/abstract and references
     tei_xml = extract_tei_from_pdf(pdf_path)
-    
+
     if tei_xml:
-        # Extract filtered sections
+        # Extract filtered sections, title/abstract and reference titles
         filtered_sections = extract_filtered_sections_from_tei(tei_xml, HEAD_KEYWORDS)
+        doc = grobid_tei_xml.parse_document_xml(tei_xml)
+        metadata = header_metadata_from_document(doc)
+        references = reference_titles(doc.citations or [])
+    else:
+        filtered_sections, metadata, references = {}, None, []
 
     # Extract title and abstract
-    metadata = extract_metadata(pdf_path, "processHeaderDocument")
     title = metadata["title"] if metadata else "Title extraction failed."
     abstract = metadata["abstract"] if metadata else "Abstract extraction failed."
 
-    # Extract reference titles
-    references = extract_metadata(pdf_path, "processReferences") or []
-
-    # Format and return the extracted data
-    return format_extracted_data(title, abstract, references, filtered_sections)
+    # Format the extracted data, caching it only if GROBID succeeded
+    formatted_output = format_extracted_data(title, abstract, references, filtered_sections)
+    if tei_xml:
+        os.makedirs(GROBID_CACHE_DIR, exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as cache_file:
+            cache_file.write(formatted_output)
+    return formatted_output
 
 # Example usage
 if __name__ == "__main__":
@@ -1,11 +1,16 @@
+import hashlib
 import json
 import logging
-from .paper_utils import convert_pgvector
+from concurrent.futures import ThreadPoolExecutor
 from .criterion_generation import generate_comparison_criteria_with_hybrid_approach, create_comparison_criteria_two_passes
+from .paper_embedding import get_paper_matrices, paper_matrix_from_chunks, retrieve_relevant_chunks_batch
 from .paper_utils import parse_json_response
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of criterion comparisons sent to the LLM at the same time
+COMPARISON_MAX_WORKERS = 8
+
 
 DUMMY_CRITERIA1 = """
 [
@@ -421,10 +426,16 @@ def generate_comparison_content(
     prompt_chatgpt,
     parse_json_response,
     logger,
-    content_generation_strategy
+    content_generation_strategy,
+    generate_embeddings_batch=None,
+    paper_matrices=None
 ) -> list:
     """
     Generate comparison table content based on the content generation strategy.
+    When generate_embeddings_batch is given, the RAG strategy embeds every criterion in one call
+    and ranks each paper's chunks for all criteria with a single matrix product.
+    paper_matrices optionally maps paper IDs to precomputed (embedded_chunks, normalized_matrix) pairs.
+    retrieve_relevant_chunks(query, paper_id, top_k) returns a paper's chunks most relevant to the query.
     """
     if content_generation_strategy == "all_chunks":
         # Instead of processing each criterion individually, we generate one prompt per paper.
@@ -500,8 +511,22 @@ def generate_comparison_content(
             })
     else:
         # Default RAG approach (existing logic): one prompt per criterion.
-        comparison_table = []
-        for criterion_obj in criteria_list:
+        top_chunk_indices = {}
+        if generate_embeddings_batch is not None and criteria_list:
+            query_embs = generate_embeddings_batch([
+                f"{crit.get('criterion')} - {crit.get('description')}" for crit in criteria_list
+            ])
+            for pid in all_paper_ids:
+                if paper_matrices and pid in paper_matrices:
+                    embedded, chunk_matrix = paper_matrices[pid]
+                else:
+                    embedded, chunk_matrix = paper_matrix_from_chunks(papers_chunks.get(pid, []))
+                if embedded:
+                    top = retrieve_relevant_chunks_batch(query_embs, chunk_matrix, top_k=3)
+                    top_chunk_indices[pid] = (embedded, top)
+
+        # Each criterion is an independent LLM call, so they run concurrently; map keeps criterion order.
+        def process_criterion(criterion_idx, criterion_obj):
             criterion_name = criterion_obj.get("criterion")
             criterion_description = criterion_obj.get("description")
             papers_excerpts = {}
@@ -511,8 +536,12 @@ def generate_comparison_content(
                     papers_excerpts[pid] = "No relevant details found."
                     continue
 
-                query_text = f"{criterion_name} - {criterion_description}"
-                relevant_chunks = retrieve_relevant_chunks(query_text, chunks, top_k=3)
+                if generate_embeddings_batch is not None:
+                    embedded, top = top_chunk_indices.get(pid, ([], [[]] * len(criteria_list)))
+                    relevant_chunks = [embedded[i] for i in top[criterion_idx]]
+                else:
+                    query_text = f"{criterion_name} - {criterion_description}"
+                    relevant_chunks = retrieve_relevant_chunks(query_text, pid, top_k=3)
                 excerpt_text = "\n".join(f"{c['section_title']}: {c['chunk_text']}" for c in relevant_chunks)
                 papers_excerpts[pid] = excerpt_text if excerpt_text else "No relevant details found."
             
@@ -563,13 +592,36 @@ def generate_comparison_content(
                 logger.error("Error parsing comparison response: %s", e)
                 comparisons = {}
             
-            comparison_table.append({
+            return {
                 "criterion": criterion_name,
                 "description": criterion_description,
                 "comparisons": comparisons
-            })
+            }
+
+        with ThreadPoolExecutor(max_workers=COMPARISON_MAX_WORKERS) as executor:
+            comparison_table = list(executor.map(process_criterion, range(len(criteria_list)), criteria_list))
     return comparison_table
 
+def comparison_cache_key(main_paper_id: str, baseline_paper_ids: list, criterion_generation_strategy: str, content_generation_strategy: str) -> str:
+    """
+    Stable key for a comparison table: the main paper, the set of baselines (order-independent),
+    and both generation strategies.
+    """
+    parts = [main_paper_id, ",".join(sorted(baseline_paper_ids)), criterion_generation_strategy, content_generation_strategy]
+    return hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+def find_unkeyed_comparison(repository, main_paper_id: str, baseline_paper_ids: list, criterion_generation_strategy: str, content_generation_strategy: str) -> list:
+    """
+    Return a table stored before comparison_key existed for exactly these papers and strategies, or None.
+    Such rows only record the main paper, so the paper set is read from the table's comparison columns.
+    """
+    paper_ids = {main_paper_id, *baseline_paper_ids}
+    for row in repository.get_unkeyed_paper_comparisons(main_paper_id, criterion_generation_strategy, content_generation_strategy):
+        table = row.get("comparison_data") or []
+        if table and all(set((entry.get("comparisons") or {}).keys()) == paper_ids for entry in table):
+            return table
+    return None
+
 def create_comparison_table(
     repository, 
     main_paper_id: str, 
@@ -579,33 +631,52 @@ def create_comparison_table(
     prompt_chatgpt=None, 
     retrieve_relevant_chunks=None,
     generate_detailed_summary=None,
-    content_generation_strategy: str = "rag"   # New parameter: "rag" (default) or "all_chunks"
+    content_generation_strategy: str = "rag",   # New parameter: "rag" (default) or "all_chunks"
+    generate_embeddings_batch=None
 ) -> list:
     """
     Create a comparison table for the main paper (and baseline papers) based on generated criteria.
     Logs the intermediate comparison table to a file.
 
     Parameters:
+        retrieve_relevant_chunks: Callable (query, embedded_chunks, normalized_matrix, top_k) -> chunks,
+                        given a paper's prefetched chunks and matrix (see paper_embedding.retrieve_relevant_chunks).
         content_generation_strategy: If set to "rag", use top_k relevant excerpts; if "all_chunks",
                         retrieve all chunks and concatenate them for each paper.
+        generate_embeddings_batch: Optional callable mapping a list of texts to an (N, dim) array;
+                        lets the RAG strategy rank chunks for all criteria at once.
     """
-    existing = repository.get_paper_comparison_by_semantic_id(
-        main_paper_id,
-        criterion_generation_strategy=criterion_generation_strategy,
-        content_generation_strategy=content_generation_strategy
-    )
+    # Reuse a stored table generated from exactly the same papers and strategies.
+    comparison_key = comparison_cache_key(main_paper_id, baseline_paper_ids, criterion_generation_strategy, content_generation_strategy)
+    existing = repository.get_paper_comparison_by_key(comparison_key)
     if existing:
         return existing["comparison_data"]
+    # Tables stored before the key was introduced are matched by their paper set instead
+    legacy_table = find_unkeyed_comparison(repository, main_paper_id, baseline_paper_ids, criterion_generation_strategy, content_generation_strategy)
+    if legacy_table:
+        return legacy_table
 
     all_paper_ids = [main_paper_id] + baseline_paper_ids
 
+    # Pre-fetch all chunks for every paper, with their normalized embedding matrices, in one request,
+    # before criterion generation so every stage reads the same prefetched chunks.
+    # Both are cached per paper, so repeated tables over the same papers skip the database.
+    cached_papers = get_paper_matrices(repository, all_paper_ids)
+    papers_chunks = {pid: chunks for pid, (chunks, _, _) in cached_papers.items()}
+    paper_matrices = {pid: (embedded, matrix) for pid, (_, embedded, matrix) in cached_papers.items()}
+
+    def retrieve_for_paper(query, pid, top_k=3):
+        # Ranks over the paper's prefetched matrix, which is passed along instead of being rebuilt per query
+        embedded, chunk_matrix = paper_matrices[pid]
+        return retrieve_relevant_chunks(query, embedded, chunk_matrix, top_k=top_k)
+
     if criterion_generation_strategy == "hybrid":
         criteria_list = generate_comparison_criteria_with_hybrid_approach(
             all_paper_ids,
-            lambda pid: repository.get_chunks_by_semantic_id(pid),
+            lambda pid: papers_chunks[pid],
             generate_detailed_summary,
             prompt_chatgpt,
-            lambda query, chunks, top_k=3: retrieve_relevant_chunks(query, chunks, top_k=top_k)
+            retrieve_for_paper
         )
     elif criterion_generation_strategy.startswith("boolean_then_expand") or criterion_generation_strategy.startswith("direct_boolean"):
         expansion_approach = criterion_generation_strategy.split("+")[0].strip()
@@ -616,7 +687,8 @@ def create_comparison_table(
             paper_ids=all_paper_ids,
             prompt_chatgpt=prompt_chatgpt,
             expansion_approach=expansion_approach,
-            merging_approach=merging_approach
+            merging_approach=merging_approach,
+            papers_chunks=papers_chunks
         )
 
         # criteria_list = json.loads(DUMMY_CRITERIA1)
@@ -632,22 +704,17 @@ def create_comparison_table(
     else:
         criteria_list = []
 
-    # Pre-fetch all chunks for every paper.
-    papers_chunks = {pid: repository.get_chunks_by_semantic_id(pid) for pid in all_paper_ids}
-    for pid, chunks in papers_chunks.items():
-        for chunk in chunks:
-            if chunk.get("embedding"):
-                chunk["embedding"] = convert_pgvector(chunk["embedding"])
-
     comparison_table = generate_comparison_content(
         criteria_list,
         all_paper_ids,
         papers_chunks,
-        retrieve_relevant_chunks,
+        retrieve_for_paper,
         prompt_chatgpt,
         parse_json_response,
         logger,
-        content_generation_strategy
+        content_generation_strategy,
+        generate_embeddings_batch,
+        paper_matrices
     )
 
     # Log intermediate comparison table.
@@ -655,7 +722,8 @@ def create_comparison_table(
         "semantic_id": main_paper_id,
         "comparison_data": comparison_table,
         "criterion_generation_strategy": criterion_generation_strategy,
-        "content_generation_strategy": content_generation_strategy
+        "content_generation_strategy": content_generation_strategy,
+        "comparison_key": comparison_key
     })
 
     return comparison_table
@@ -1,49 +1,78 @@
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity as sk_cosine_similarity
 from .paper_utils import convert_pgvector
 
-def mean_embedding_similarity(embeddings_A: list, embeddings_B: list) -> float:
-    arr_A = np.array(embeddings_A)
-    arr_B = np.array(embeddings_B)
-    mean_A = np.mean(arr_A, axis=0)
-    mean_B = np.mean(arr_B, axis=0)
-    return sk_cosine_similarity([mean_A], [mean_B])[0][0]
-
-def pairwise_chunk_similarity(embeddings_A: list, embeddings_B: list) -> float:
-    arr_A = np.array(embeddings_A)
-    arr_B = np.array(embeddings_B)
-    sim_matrix = sk_cosine_similarity(arr_A, arr_B)
-    max_sim_A = np.max(sim_matrix, axis=1)
-    max_sim_B = np.max(sim_matrix, axis=0)
-    return (np.mean(max_sim_A) + np.mean(max_sim_B)) / 2.0
-
-def compare_paper_embeddings(embeddings_A: list, embeddings_B: list, alpha: float = 0.6) -> float:
+def normalize_rows(matrix) -> np.ndarray:
     """
-    Combine the mean embedding similarity and pairwise chunk similarity into a single score.
+    L2-normalize each row of a 2-D array of embeddings, returning a float32 copy.
     """
-    mean_sim = mean_embedding_similarity(embeddings_A, embeddings_B)
-    pairwise_sim = pairwise_chunk_similarity(embeddings_A, embeddings_B)
-    return alpha * pairwise_sim + (1 - alpha) * mean_sim
+    matrix = np.array(matrix, dtype=np.float32, ndmin=2)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+    return matrix
 
 def compare_two_papers(repository, main_paper_id: str, baseline_paper_id: str, alpha: float = 0.5) -> float:
     """
-    Retrieve chunk embeddings for two papers from the repository and compute a combined similarity score.
+    Compute a combined similarity score for two papers from their chunk embeddings.
+    Both similarity terms are computed in Postgres, so no embeddings are transferred.
     """
-    main_chunks = repository.get_chunks_by_semantic_id(main_paper_id)
-    baseline_chunks = repository.get_chunks_by_semantic_id(baseline_paper_id)
-
-    embeddings_A = [convert_pgvector(chunk["embedding"]) for chunk in main_chunks if chunk.get("embedding")]
-    embeddings_B = [convert_pgvector(chunk["embedding"]) for chunk in baseline_chunks if chunk.get("embedding")]
+    similarity = repository.get_paper_similarity(main_paper_id, baseline_paper_id)
 
-    if not embeddings_A or not embeddings_B:
+    if not similarity or similarity["mean_similarity"] is None:
         print("One or both papers have no valid embeddings.")
         return 0.0
 
-    return compare_paper_embeddings(embeddings_A, embeddings_B, alpha=alpha)
+    return alpha * similarity["pairwise_similarity"] + (1 - alpha) * similarity["mean_similarity"]
+
+# Per-paper (chunks, embedded_chunks, normalized_matrix), filled on first access
+_paper_cache: dict[str, tuple[list, list, np.ndarray]] = {}
+
+def paper_matrix_from_chunks(chunks: list[dict]) -> tuple[list, np.ndarray]:
+    """
+    Stack the embedded chunks of a paper into a row-normalized matrix.
+    Returns the embedded chunks and the matrix, with rows in the same order.
+    Rows are normalized here as well: embeddings stored before generate_embedding_for_paper_chunks
+    normalized them at insert are not unit length.
+    """
+    embedded = [chunk for chunk in chunks if chunk.get("embedding") is not None]
+    if not embedded:
+        return [], np.empty((0, 0), dtype=np.float32)
+    # Stacked straight into float32: no float64 temporary
+    matrix = np.vstack([
+        convert_pgvector(chunk["embedding"]) if isinstance(chunk["embedding"], str) else chunk["embedding"]
+        for chunk in embedded
+    ], dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+    return embedded, matrix
+
+def get_paper_matrices(repository, paper_ids: list) -> dict:
+    """
+    Return {paper_id: (chunks, embedded_chunks, normalized_matrix)}, fetching and normalizing each paper only once:
+    every paper missing from the cache is fetched with a single repository request.
+    Papers without chunks are not cached, since their chunks may still be generated.
+    """
+    papers = {pid: _paper_cache[pid] for pid in paper_ids if pid in _paper_cache}
+    missing = [pid for pid in dict.fromkeys(paper_ids) if pid not in papers]
+    if missing:
+        for pid, chunks in repository.get_chunks_by_semantic_ids(missing).items():
+            papers[pid] = _cache_paper(pid, chunks)
+    return papers
+
+def _cache_paper(paper_id: str, chunks: list[dict]) -> tuple[list, list, np.ndarray]:
+    entry = (chunks, *paper_matrix_from_chunks(chunks))
+    if chunks:
+        _paper_cache[paper_id] = entry
+    return entry
 
-def generate_embedding_for_paper_chunks(repository, paper_id: str, extract_all_sections, generate_embedding):
+def invalidate_paper_matrix(paper_id: str):
+    """
+    Drop a paper's cached chunks and matrix, e.g. after its chunks were (re)written.
+    """
+    _paper_cache.pop(paper_id, None)
+
+def generate_embedding_for_paper_chunks(repository, paper_id: str, extract_all_sections, generate_embeddings_batch):
     """
     Generate embeddings for each section (chunk) of a paper and store them in the database.
+    All sections are embedded together through generate_embeddings_batch (list of texts -> list of embeddings).
+    Embeddings are L2-normalized before insert, so readers can take cosine similarity as a plain dot product.
     """
     chunks = repository.get_chunks_by_semantic_id(paper_id)
     if chunks:
@@ -52,16 +81,18 @@ def generate_embedding_for_paper_chunks(repository, paper_id: str, extract_all_s
     paper = repository.get_paper_by_semantic_id(paper_id)
     pdf_path = paper["local_filepath"]
     sections = extract_all_sections(pdf_path)
+    embeddings = normalize_rows(generate_embeddings_batch(list(sections.values())))
 
-    for section, text in sections.items():
-        embedding = generate_embedding(text)
-        chunk = {
+    repository.create_chunks([
+        {
             "semantic_id": paper_id,
             "section_title": section,
             "chunk_text": text,
-            "embedding": embedding
+            "embedding": embedding.tolist()
         }
-        repository.create_chunk(chunk)
+        for (section, text), embedding in zip(sections.items(), embeddings)
+    ])
+    invalidate_paper_matrix(paper_id)
 
     return repository.get_chunks_by_semantic_id(paper_id)
 
@@ -71,20 +102,29 @@ def get_paper_chunks(repository, paper_id: str) -> list[dict]:
     """
     return repository.get_chunks_by_semantic_id(paper_id)
 
-def retrieve_relevant_chunks(query_text: str, chunks: list[dict], generate_embedding, top_k=3) -> list[dict]:
+def retrieve_relevant_chunks_batch(query_embs: np.ndarray, chunk_matrix: np.ndarray, top_k=3) -> np.ndarray:
+    """
+    Rank chunks for many queries at once with a single matrix product.
+    chunk_matrix must already be row-normalized (see normalize_rows); query_embs need not be.
+    Returns an (n_queries, min(top_k, n_chunks)) array of chunk indices, best match first.
+    """
+    sim = normalize_rows(query_embs) @ chunk_matrix.T
+    top_k = min(top_k, sim.shape[1])
+    if top_k < sim.shape[1]:
+        top = np.argpartition(-sim, top_k, axis=1)[:, :top_k]
+    else:
+        top = np.broadcast_to(np.arange(sim.shape[1]), sim.shape)
+    order = np.argsort(-np.take_along_axis(sim, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+def retrieve_relevant_chunks(query_text: str, embedded: list[dict], chunk_matrix: np.ndarray, generate_embedding, top_k=3) -> list[dict]:
     """
     Retrieve the top_k most relevant chunks based on cosine similarity between the query embedding and each chunk's embedding.
+    embedded and chunk_matrix are a paper's embedded chunks and their row-normalized matrix, as returned by
+    paper_matrix_from_chunks or get_paper_matrices, so the matrix is built once per paper rather than per query.
     """
+    if not embedded:
+        return []
     query_embedding = generate_embedding(query_text)
-    scored_chunks = []
-    for chunk in chunks:
-        emb = chunk["embedding"]
-        if isinstance(emb, str):
-            emb = convert_pgvector(emb)
-        score = sk_cosine_similarity(
-            np.array(query_embedding).reshape(1, -1),
-            np.array(emb).reshape(1, -1)
-        )[0][0]
-        scored_chunks.append((score, chunk))
-    scored_chunks.sort(key=lambda x: x[0], reverse=True)
-    return [chunk for score, chunk in scored_chunks[:top_k]]
+    top = retrieve_relevant_chunks_batch(query_embedding, chunk_matrix, top_k)[0]
+    return [embedded[i] for i in top]
@@ -2,36 +2,46 @@ import numpy as np
 import re
 import json
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 
-def convert_pgvector(embedding_str: str) -> list[float]:
+# The first Markdown code fence in a response, with an optional language tag;
+# the model sometimes adds prose before or after the fenced JSON
+CODE_FENCE_PATTERN = re.compile(r"```[A-Za-z]*\s*(.*?)\s*```", re.DOTALL)
+
+def convert_pgvector(embedding_str: str) -> np.ndarray:
     """
-    Convert a bracketed embedding string from pgvector into a Python list of floats.
-    For example: "[0.04895872,0.0069324,...]" -> [0.04895872, 0.0069324, ...]
+    Convert a bracketed embedding string from pgvector into a float32 NumPy array.
+    For example: "[0.04895872,0.0069324,...]" -> array([0.04895872, 0.0069324, ...], dtype=float32)
+    Parsing happens in NumPy's C text reader rather than one float() call per value.
     """
     embedding_str = embedding_str.strip()
     if embedding_str.startswith("[") and embedding_str.endswith("]"):
         embedding_str = embedding_str[1:-1]  # remove the surrounding brackets
-    float_strs = embedding_str.split(",")
-    return [float(val) for val in float_strs]
+    return np.fromstring(embedding_str, sep=",", dtype=np.float32)
 
 def cosine_similarity(vec1: list[float], vec2: list[float]) -> float:
     """
     Compute the cosine similarity between two vectors.
     """
-    a = np.array(vec1)
-    b = np.array(vec2)
-    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+    a = np.asarray(vec1, dtype=np.float32)
+    b = np.asarray(vec2, dtype=np.float32)
+    # One sqrt over the product of squared norms instead of two norm() calls
+    return float(np.dot(a, b) / np.sqrt(np.vdot(a, a) * np.vdot(b, b)))
 
 def parse_json_response(response: str) -> dict:
     """
     Clean and parse the JSON response from the LLM.
     """
-    cleaned_response = re.sub(r"^```json\s*|```$", "", response.strip()).strip()
+    cleaned_response = response.strip()
+    if "```" in cleaned_response:
+        match = CODE_FENCE_PATTERN.search(cleaned_response)
+        if match:
+            cleaned_response = match.group(1)
 
     try:
-        return json.loads(cleaned_response)
+        return orjson.loads(cleaned_response)
     except Exception as e:
         line = e.lineno
         col = e.colno
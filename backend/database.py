@@ -1,16 +1,27 @@
 import os
-from supabase import create_client
+import threading
+from supabase import Client, create_client
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+_supabase_client: Client = None
+_supabase_client_lock = threading.Lock()
+
 def init_supabase_client():
     """
     Initialize a Supabase client.
+    The client (and its connection pool) is created once and shared for the lifetime of the process;
+    the lock keeps concurrent first callers from each building their own.
     """
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_KEY")
-    if not url or not key:
-        raise ValueError("Missing SUPABASE_URL or SUPABASE_KEY in environment variables.")
-    return create_client(url, key)
\ No newline at end of file
+    global _supabase_client
+    if _supabase_client is None:
+        with _supabase_client_lock:
+            if _supabase_client is None:
+                url = os.getenv("SUPABASE_URL")
+                key = os.getenv("SUPABASE_KEY")
+                if not url or not key:
+                    raise ValueError("Missing SUPABASE_URL or SUPABASE_KEY in environment variables.")
+                _supabase_client = create_client(url, key)
+    return _supabase_client
@@ -1,22 +1,37 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import json
+import orjson
+import queue
+import threading
 
-def load_file():
-    """Prompt user to select a txt file and parse its JSON content."""
+# Height reserved for a snapshot that has not been built yet
+PLACEHOLDER_HEIGHT = 300
+# Extra distance beyond the viewport within which snapshots get built ahead of scrolling
+PREFETCH_MARGIN = 600
+
+# Snapshot frames whose tables are still waiting to be built, mapped to their table data
+pending_snapshots = {}
+
+# How often (ms) the UI thread checks for a finished background file load
+LOAD_POLL_INTERVAL = 50
+# Results handed from the loader thread to the UI thread as (data, error) pairs
+load_results = queue.Queue()
+
+def select_file():
+    """Prompt user to select a txt file and return its path (or None)."""
     file_path = filedialog.askopenfilename(
         title="Select Criteria Log File",
         filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")]
     )
-    if not file_path:
-        return None
+    return file_path or None
+
+def _load_worker(file_path):
+    """Read and parse the JSON log off the UI thread, posting the result to load_results."""
     try:
-        with open(file_path, "r", encoding="utf-8") as file:
-            data = json.load(file)
-        return data
+        with open(file_path, "rb") as file:
+            load_results.put((orjson.loads(file.read()), None))
     except Exception as e:
-        messagebox.showerror("Error", f"Error reading file:\n{e}")
-        return None
+        load_results.put((None, e))
 
 def create_table(frame, snapshot_title, active, removed):
     """Creates a Treeview table showing active criteria (with status) and removed ones."""
@@ -34,22 +49,20 @@ def create_table(frame, snapshot_title, active, removed):
     tree.column("description", minwidth=300, stretch=True)
     tree.column("status", minwidth=100, stretch=True)
 
+    # Precompute row values and tags so the insert loop does no per-row work
+    status_tags = {"new": "new"}
+    rows = [((item["criterion"], item["description"], item["status"]), (status_tags.get(item["status"], "normal"),))
+            for item in active]
+    rows.extend(((item["criterion"], item["description"], "removed"), ("removed",)) for item in removed)
+
+    # Insert active criteria (from full_snapshot), then removed criteria (from the delta) at the end,
+    # before the tree is packed so Tk lays it out once instead of after every row
+    for values, tags in rows:
+        tree.insert("", "end", values=values, tags=tags)
+
     # Pack the tree so it expands in both directions (but the parent frame will mostly expand horizontally)
     tree.pack(padx=10, pady=5, fill="both", expand=True)
     
-    # Insert active criteria (from full_snapshot)
-    for item in active:
-        tag = "new" if item["status"] == "new" else "normal"
-        tree.insert("", "end",
-                    values=(item["criterion"], item["description"], item["status"]),
-                    tags=(tag,))
-    
-    # Insert removed criteria (from the delta) at the end
-    for item in removed:
-        tree.insert("", "end",
-                    values=(item["criterion"], item["description"], "removed"),
-                    tags=("removed",))
-    
     # Style the rows
     tree.tag_configure("new", background="#d4f4dd")      # light green for new
     tree.tag_configure("removed", background="#f4d4d4")  # light red for removed
@@ -82,34 +95,76 @@ def process_and_display(data, container):
         removed_delta = content.get("removed", [])
         
         # Build sets for easy lookup (using criterion names)
-        created_names = set(item.get("criterion") for item in created_delta)
+        created_names = {item.get("criterion") for item in created_delta}
         
-        active = []
-        for crit in full_snapshot:
-            status = "new" if crit.get("criterion") in created_names else "unchanged"
-            active.append({
-                "criterion": crit.get("criterion", ""),
+        active = [
+            {
+                "criterion": name if name is not None else "",
                 "description": crit.get("description", ""),
-                "status": status
-            })
+                "status": "new" if name in created_names else "unchanged"
+            }
+            for crit, name in ((crit, crit.get("criterion")) for crit in full_snapshot)
+        ]
         
         # The removed ones are those that appear in the delta (they're not in the current full snapshot)
-        removed = []
-        for crit in removed_delta:
-            removed.append({
-                "criterion": crit.get("criterion", ""),
-                "description": crit.get("description", "")
-            })
+        removed = [
+            {"criterion": crit.get("criterion", ""), "description": crit.get("description", "")}
+            for crit in removed_delta
+        ]
         
-        create_table(snapshot_frame, snapshot_title, active, removed)
+        # Defer building the table until the frame is scrolled near the viewport
+        snapshot_frame.configure(height=PLACEHOLDER_HEIGHT)
+        snapshot_frame.pack_propagate(False)
+        pending_snapshots[snapshot_frame] = (snapshot_title, active, removed)
+
+    container.after_idle(realize_visible_snapshots)
+
+def realize_visible_snapshots():
+    """Build the tables of pending snapshots that intersect the visible part of the canvas."""
+    if not pending_snapshots:
+        return
+    view_top = canvas.canvasy(0) - PREFETCH_MARGIN
+    view_bottom = canvas.canvasy(canvas.winfo_height()) + PREFETCH_MARGIN
+
+    for snapshot_frame in list(pending_snapshots):
+        frame_top = snapshot_frame.winfo_y()
+        frame_bottom = frame_top + snapshot_frame.winfo_height()
+        if frame_bottom >= view_top and frame_top <= view_bottom:
+            snapshot_title, active, removed = pending_snapshots.pop(snapshot_frame)
+            snapshot_frame.pack_propagate(True)
+            create_table(snapshot_frame, snapshot_title, active, removed)
+
+def _on_canvas_scroll(first, last):
+    """Keep the scrollbar in sync and build snapshots that scrolled into view."""
+    scrollbar.set(first, last)
+    realize_visible_snapshots()
 
 def load_and_display():
     """Main function to load file and display snapshots."""
-    data = load_file()
-    if data is None:
+    file_path = select_file()
+    if file_path is None:
+        return
+
+    # Parse in the background so the window keeps responding while large logs load
+    load_button.config(state="disabled")
+    threading.Thread(target=_load_worker, args=(file_path,), daemon=True).start()
+    root.after(LOAD_POLL_INTERVAL, _drain_load_results)
+
+def _drain_load_results():
+    """Poll for the background load result and display it on the UI thread."""
+    try:
+        data, error = load_results.get_nowait()
+    except queue.Empty:
+        root.after(LOAD_POLL_INTERVAL, _drain_load_results)
+        return
+
+    load_button.config(state="normal")
+    if error is not None:
+        messagebox.showerror("Error", f"Error reading file:\n{error}")
         return
     
     # Clear the container frame if needed
+    pending_snapshots.clear()
     for widget in content_frame.winfo_children():
         widget.destroy()
     
@@ -154,8 +209,9 @@ content_frame.bind(
 
 canvas.create_window((0, 0), window=content_frame, anchor="nw")
 
-# Tie the canvas's yscrollcommand to the scrollbar
-canvas.configure(yscrollcommand=scrollbar.set)
+# Tie the canvas's yscrollcommand to the scrollbar (and lazy snapshot building)
+canvas.configure(yscrollcommand=_on_canvas_scroll)
+canvas.bind("<Configure>", lambda e: realize_visible_snapshots())
 
 # Pack the canvas and scrollbar to fill the window
 canvas.pack(side="left", fill="both", expand=True)
@@ -1,13 +1,16 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, ORJSONResponse
 from routes import router
+from repository.read_cache import RequestCacheMiddleware
 import os
+import stat
 
 app = FastAPI(
     title="Research Paper API",
     description="API for retrieving papers and related information.",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -18,9 +21,27 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
-# Mount the directory with PDFs as a static file route
-pdf_directory = os.path.join(os.getcwd(), "downloaded_papers")
-app.mount("/pdfs", StaticFiles(directory=pdf_directory), name="pdfs")
+# Each request gets its own read cache, so repeated lookups of a paper within it are free
+app.add_middleware(RequestCacheMiddleware)
+
+# Serve the directory with PDFs through FileResponse, which lets the server use
+# zero-copy sends where supported
+pdf_directory = os.path.realpath(os.path.join(os.getcwd(), "downloaded_papers"))
+
+@app.api_route("/pdfs/{path:path}", methods=["GET", "HEAD"], tags=["Papers"])
+def serve_pdf(path: str):
+    file_path = os.path.realpath(os.path.join(pdf_directory, path))
+    if os.path.commonpath([file_path, pdf_directory]) != pdf_directory:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Stat on every request: PDFs are re-downloaded and overwritten in place, so a cached
+    # result could send a stale Content-Length or point at a deleted file
+    try:
+        stat_result = os.stat(file_path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return FileResponse(file_path, media_type="application/pdf", stat_result=stat_result)
 
 # Include the routes
 app.include_router(router)
@@ -2,7 +2,7 @@ import os
 import logging
 from dotenv import load_dotenv
 from supabase import create_client, Client
-from semantic_scholar import process_and_cite_paper, search_papers_by_title
+from semantic_scholar import WriteBuffer, process_and_cite_paper, search_papers_by_titles
 
 load_dotenv()
 
@@ -31,12 +31,16 @@ supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 def main():
     # Example: search for papers by title (optional usage)
     # api_key = os.getenv("SEMANTIC_SCHOLAR_API_KEY", None)
-    # search_results = search_papers_by_title("Attention Is All You Need", limit=5, api_key=api_key)
+    # search_results = asyncio.run(search_papers_by_titles(["Attention Is All You Need"], limit=5, api_key=api_key))[0]
     # logger.info(f"Search results: {search_results}")
 
     start_paper_id = input("Enter the Semantic Scholar paper id: ").strip()
     api_key = os.getenv("SEMANTIC_SCHOLAR_API_KEY", None)
-    process_and_cite_paper(start_paper_id, supabase, api_key)
+    write_buffer = WriteBuffer(supabase)
+    try:
+        process_and_cite_paper(start_paper_id, supabase, api_key, write_buffer=write_buffer)
+    finally:
+        write_buffer.drain()
     logger.info("Processing complete.")
 
 
@@ -1,164 +1,653 @@
 import os
+import re
+import atexit
+import asyncio
+import aiohttp
+import functools
+import queue
+import threading
 import time
-import requests
 import logging
+import sqlite3
+import orjson
+from collections import OrderedDict, deque
 from PyPDF2 import PdfReader
 
 logger = logging.getLogger(__name__)
 
-from supabase import Client, create_client
-
-SUPABASE_URL = os.getenv("SUPABASE_URL", "https://your-supabase-url.supabase.co")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY", "your-supabase-api-key")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 
 
 
 SEMANTIC_SCHOLAR_BASE_URL = "https://api.semanticscholar.org/graph/v1/paper/"
 SEMANTIC_SCHOLAR_API_KEY = os.getenv("SEMANTIC_SCHOLAR_API_KEY", None)
 
-# Maximum recursion depth for processing citations
+# Maximum depth of references followed when processing citations
 MAX_DEPTH = 4
+# Papers taken off the traversal frontier together, whose metadata and PDFs are fetched as one batch
+TRAVERSAL_BATCH_SIZE = 32
+
+
+class SeenKeys:
+    """
+    Papers already visited, under every identifier they can be referred to by: DOI, arXiv id,
+    Semantic Scholar paperId and normalized title (see canonical_keys). Each key maps to the
+    Semantic Scholar id the paper was processed under, so a paper reached through another id is recognized.
+    """
+    KINDS = ("doi", "arxiv", "s2id", "norm_title")
+
+    def __init__(self):
+        self.keys = {kind: {} for kind in self.KINDS}
+
+    def find(self, keys: dict) -> str:
+        """
+        Return the paper id registered under any of keys, or None if none of them was seen.
+        """
+        for kind in self.KINDS:
+            value = keys.get(kind)
+            if value and value in self.keys[kind]:
+                return self.keys[kind][value]
+        return None
+
+    def add(self, keys: dict, paper_id: str):
+        """
+        Register paper_id under each of keys; keys already registered keep their paper.
+        """
+        for kind in self.KINDS:
+            value = keys.get(kind)
+            if value:
+                self.keys[kind].setdefault(value, paper_id)
+
+
+def normalize_title(title: str) -> str:
+    """
+    Lower-case a title and strip punctuation and spaces, so titles differing only in formatting compare equal.
+    """
+    return re.sub(r"[\W_]+", "", title.lower())
 
-# A set to track processed Semantic Scholar paper ids to avoid duplicates
-processed_papers = set()
+
+def canonical_keys(metadata: dict) -> dict:
+    """
+    Identifiers a paper can be deduplicated by, from its metadata or a reference entry:
+    DOI, arXiv id, Semantic Scholar paperId and its title lower-cased with punctuation and spaces stripped.
+    """
+    external_ids = metadata.get("externalIds") or {}
+    title = metadata.get("title")
+    return {
+        "doi": (external_ids.get("DOI") or "").strip().lower() or None,
+        "arxiv": (external_ids.get("ArXiv") or "").strip().lower() or None,
+        "s2id": metadata.get("paperId"),
+        "norm_title": normalize_title(title) or None if title else None
+    }
+
+
+def metadata_richness(metadata: dict) -> int:
+    return sum(1 for value in metadata.values() if value)
+
+
+# Papers processed so far, to avoid processing one twice under different ids
+processed_papers = SeenKeys()
 
 # Directory to save downloaded PDFs (adjust as needed)
 PDF_SAVE_DIRECTORY = "downloaded_papers"
+# Created once here instead of being checked before every download
+os.makedirs(PDF_SAVE_DIRECTORY, exist_ok=True)
+
+PDF_DOWNLOAD_CONCURRENCY = 8  # PDFs downloaded at once, to avoid overwhelming arXiv
+PDF_DOWNLOAD_TIMEOUT = 15  # seconds
+PDF_CHUNK_SIZE = 1 << 16
+MAX_PDF_BYTES = 100 * 1024 * 1024  # larger files are not papers we can use; skip them
+
+
+SEMANTIC_SCHOLAR_SEARCH_URL = "https://api.semanticscholar.org/graph/v1/paper/search"
+SEMANTIC_SCHOLAR_BATCH_URL = "https://api.semanticscholar.org/graph/v1/paper/batch"
+SEMANTIC_SCHOLAR_BATCH_SIZE = 500  # most ids the batch endpoint accepts per request
+# References carry their ids and title, so duplicates can be spotted before they are fetched
+METADATA_FIELDS = "paperId,title,year,venue,externalIds,openAccessPdf,references.title,references.externalIds,citations"
+SEMANTIC_SCHOLAR_TIMEOUT = 10  # seconds per request
+SEMANTIC_SCHOLAR_CONNECTIONS = 20
+# Requests allowed in flight at once
+SEMANTIC_SCHOLAR_CONCURRENCY = 10
+# Requests started per second; the API grants more to requests carrying a key
+SEMANTIC_SCHOLAR_RATE = float(os.getenv("SEMANTIC_SCHOLAR_RATE", 10 if SEMANTIC_SCHOLAR_API_KEY else 1))
+RATE_LIMIT_BACKOFF = 10  # seconds to wait after a 429 before retrying
+
+# Fetched metadata is kept on disk, so re-runs do not ask Semantic Scholar for the same papers again
+METADATA_CACHE_PATH = os.getenv("METADATA_CACHE_PATH", "semantic_scholar_cache.sqlite3")
+METADATA_CACHE_TTL = float(os.getenv("METADATA_CACHE_TTL", 30 * 24 * 3600))  # seconds
+METADATA_MEMORY_CACHE_SIZE = 4096
+_metadata_memory_cache = OrderedDict()  # paper_id -> (fetched_at, metadata)
+_metadata_cache_lock = threading.Lock()
+_metadata_db = None
+
+
+class TokenBucket:
+    """
+    Async rate limiter: up to capacity requests may start back to back, after which they are let
+    through at rate per second. Use as "async with bucket:" around each request.
+    """
 
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+class SemanticScholarSession:
+    """
+    Async context manager holding one pooled aiohttp session for Semantic Scholar API calls,
+    plus the semaphore that bounds how many of them run concurrently and the token bucket
+    that keeps them within the API's rate limit.
+    All are bound to the running event loop, so open one per asyncio.run().
+    Synchronous callers go through run_sync, which keeps one open per API key on a shared loop.
+    """
 
-def fetch_semantic_scholar_metadata(paper_id: str, api_key: str = None) -> dict:
+    def __init__(self, api_key: str = SEMANTIC_SCHOLAR_API_KEY, max_concurrency: int = SEMANTIC_SCHOLAR_CONCURRENCY,
+                 rate: float = SEMANTIC_SCHOLAR_RATE):
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.session = None
+        self.semaphore = None
+        self.rate_limiter = None
+
+    async def __aenter__(self):
+        headers = {"x-api-key": self.api_key} if self.api_key else {}
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=SEMANTIC_SCHOLAR_CONNECTIONS),
+            timeout=aiohttp.ClientTimeout(total=SEMANTIC_SCHOLAR_TIMEOUT),
+            headers=headers,
+            json_serialize=lambda payload: orjson.dumps(payload).decode()
+        )
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.rate_limiter = TokenBucket(self.rate)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    async def get_json(self, url: str, params: dict = None) -> dict:
+        """
+        GET a Semantic Scholar endpoint and decode the JSON body, retrying after rate limiting.
+        """
+        return await self.request_json("GET", url, params=params)
+
+    async def request_json(self, method: str, url: str, params: dict = None, payload: dict = None):
+        """
+        Send a request to a Semantic Scholar endpoint and decode the JSON body, retrying after rate limiting.
+        """
+        while True:
+            async with self.rate_limiter, self.semaphore:
+                async with self.session.request(method, url, params=params, json=payload) as response:
+                    if response.status == 200:
+                        # Responses with references and citations run to hundreds of KB; orjson decodes them much faster
+                        return orjson.loads(await response.read())
+                    if response.status != 429:
+                        text = await response.text()
+                        logger.error("API request failed: %s - %s", response.status, text)
+                        raise Exception(f"API request failed: {response.status} - {text}")
+            logger.warning("Rate limit reached. Waiting %s seconds before retrying...", RATE_LIMIT_BACKOFF)
+            await asyncio.sleep(RATE_LIMIT_BACKOFF)
+
+
+def _get_metadata_db():
+    global _metadata_db
+    if _metadata_db is None:
+        _metadata_db = sqlite3.connect(METADATA_CACHE_PATH, check_same_thread=False)
+        # WAL lets several ingestion processes share the cache file
+        _metadata_db.execute("PRAGMA journal_mode=WAL")
+        _metadata_db.execute("PRAGMA synchronous=NORMAL")
+        _metadata_db.execute("CREATE TABLE IF NOT EXISTS cache (paper_id TEXT PRIMARY KEY, fetched_at REAL, json BLOB)")
+    return _metadata_db
+
+
+def _remember_metadata(paper_id: str, fetched_at: float, metadata: dict):
+    _metadata_memory_cache[paper_id] = (fetched_at, metadata)
+    _metadata_memory_cache.move_to_end(paper_id)
+    if len(_metadata_memory_cache) > METADATA_MEMORY_CACHE_SIZE:
+        _metadata_memory_cache.popitem(last=False)
+
+
+def lookup_cached_metadata(paper_ids: list) -> dict:
+    """
+    Returns {paper_id: metadata} for every paper fetched less than METADATA_CACHE_TTL seconds ago,
+    looking in memory first and then in the on-disk cache.
+    """
+    fresh_after = time.time() - METADATA_CACHE_TTL
+    found = {}
+    with _metadata_cache_lock:
+        for paper_id in paper_ids:
+            entry = _metadata_memory_cache.get(paper_id)
+            if entry is not None and entry[0] > fresh_after:
+                _metadata_memory_cache.move_to_end(paper_id)
+                found[paper_id] = entry[1]
+
+        missing = [paper_id for paper_id in paper_ids if paper_id not in found]
+        if missing:
+            db = _get_metadata_db()
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = db.execute(
+                    f"SELECT paper_id, fetched_at, json FROM cache WHERE paper_id IN ({placeholders}) AND fetched_at > ?",
+                    [*chunk, fresh_after]
+                )
+                for paper_id, fetched_at, blob in rows:
+                    found[paper_id] = orjson.loads(blob)
+                    _remember_metadata(paper_id, fetched_at, found[paper_id])
+    return found
+
+
+def store_cached_metadata(metadata_by_id: dict):
+    """
+    Save fetched metadata in the memory and on-disk caches. Papers without metadata are not cached.
+    """
+    fetched_at = time.time()
+    entries = [(paper_id, metadata) for paper_id, metadata in metadata_by_id.items() if metadata]
+    if not entries:
+        return
+    with _metadata_cache_lock:
+        for paper_id, metadata in entries:
+            _remember_metadata(paper_id, fetched_at, metadata)
+        db = _get_metadata_db()
+        db.executemany(
+            "INSERT OR REPLACE INTO cache (paper_id, fetched_at, json) VALUES (?, ?, ?)",
+            [(paper_id, fetched_at, orjson.dumps(metadata)) for paper_id, metadata in entries]
+        )
+        db.commit()
+
+
+async def fetch_semantic_scholar_metadata(client: SemanticScholarSession, paper_id: str) -> dict:
     """
     Given a paper identifier (e.g., a Semantic Scholar paper id or DOI),
-    fetch metadata using the Semantic Scholar API.
-    """
-    fields = (
-        "paperId,title,year,venue,externalIds,openAccessPdf,"
-        "references,citations"
-    )
-    url = f"{SEMANTIC_SCHOLAR_BASE_URL}{paper_id}?fields={fields}"
-    headers = {}
-    if api_key:
-        headers["x-api-key"] = api_key
-
-    logger.info(f"Fetching metadata from: {url}")
-    
-    while True:
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 429:
-            logger.warning("Rate limit reached. Waiting 10 seconds before retrying...")
-            time.sleep(10)
-            continue
-        elif response.status_code != 200:
-            logger.error(f"API request failed: {response.status_code} - {response.text}")
-            raise Exception(f"API request failed: {response.status_code} - {response.text}")
-        
-        time.sleep(1)  # Respect rate limits
-        return response.json()
-
-
-def search_papers_by_title(title: str, limit: int = 10, api_key = SEMANTIC_SCHOLAR_API_KEY) -> dict:
+    fetch metadata using the Semantic Scholar API, unless it is in the metadata cache.
+    """
+    cached = lookup_cached_metadata([paper_id])
+    if paper_id in cached:
+        return cached[paper_id]
+    url = f"{SEMANTIC_SCHOLAR_BASE_URL}{paper_id}"
+    logger.info("Fetching metadata from: %s", url)
+    metadata = await client.get_json(url, params={"fields": METADATA_FIELDS})
+    store_cached_metadata({paper_id: metadata})
+    return metadata
+
+
+async def fetch_semantic_scholar_metadata_batch(client: SemanticScholarSession, paper_ids: list) -> dict:
+    """
+    Fetch metadata for many papers through the batch endpoint, one request per SEMANTIC_SCHOLAR_BATCH_SIZE ids.
+    Papers found in the metadata cache are not requested again.
+    Returns {paper_id: metadata}; ids unknown to Semantic Scholar map to None.
+    """
+    found = lookup_cached_metadata(paper_ids)
+    missing = [paper_id for paper_id in dict.fromkeys(paper_ids) if paper_id not in found]
+    if not missing:
+        return found
+    batches = [missing[start:start + SEMANTIC_SCHOLAR_BATCH_SIZE] for start in range(0, len(missing), SEMANTIC_SCHOLAR_BATCH_SIZE)]
+    logger.info("Fetching metadata for %s papers in %s batch requests (%s cached)", len(missing), len(batches), len(found))
+    results = await asyncio.gather(*[
+        client.request_json("POST", SEMANTIC_SCHOLAR_BATCH_URL, params={"fields": METADATA_FIELDS}, payload={"ids": batch})
+        for batch in batches
+    ])
+    # The endpoint answers with one entry per requested id, in request order
+    fetched = {
+        paper_id: metadata
+        for batch, batch_result in zip(batches, results)
+        for paper_id, metadata in zip(batch, batch_result)
+    }
+    store_cached_metadata(fetched)
+    found.update(fetched)
+    return found
+
+
+async def search_papers_by_title(client: SemanticScholarSession, title: str, limit: int = 10) -> dict:
     """
     Search for papers on Semantic Scholar by title and return the top 'limit' results.
     """
-    search_url = "https://api.semanticscholar.org/graph/v1/paper/search"
-    print("search_url", search_url)
     params = {
         "query": title,
         "limit": limit,
         "fields": "paperId,title,year,venue,externalIds,openAccessPdf"
     }
-    print("params", params)
-    headers = {}
-    if api_key:
-        headers["x-api-key"] = api_key
-
-    logger.info(f"Searching for papers with title: {title}")
-    response = requests.get(search_url, params=params, headers=headers, timeout=10)
-    if response.status_code == 429:
-        logger.warning("Rate limit reached during search. Waiting 10 seconds before retrying...")
-        time.sleep(10)
-        return search_papers_by_title(title, limit, api_key)
-    elif response.status_code != 200:
-        logger.error(f"Search request failed: {response.status_code} - {response.text}")
-        raise Exception(f"Search request failed: {response.status_code} - {response.text}")
-    
-    time.sleep(1)  # Respect rate limits
-    return response.json()
+    logger.info("Searching for papers with title: %s", title)
+    return await client.get_json(SEMANTIC_SCHOLAR_SEARCH_URL, params=params)
 
 
-def download_arxiv_pdf(arxiv_id: str) -> str:
+async def search_papers_by_titles(titles: list, limit: int = 10, api_key: str = SEMANTIC_SCHOLAR_API_KEY) -> list:
+    """
+    Search for many titles concurrently over one session.
+    Returns one result per title, in order; a failed search yields its exception instead of a result.
+    """
+    async with SemanticScholarSession(api_key) as client:
+        return await asyncio.gather(
+            *[search_papers_by_title(client, title, limit) for title in titles],
+            return_exceptions=True
+        )
+
+
+# Event loop shared by the blocking wrappers below. It outlives each call, and so do the sessions
+# opened on it, so keep-alive connections to Semantic Scholar and arXiv are reused across calls.
+_io_loop = None
+_io_loop_lock = threading.Lock()
+_shared_clients = {}  # api_key -> SemanticScholarSession opened on _io_loop
+_shared_pdf_session = None
+
+
+def _get_io_loop() -> asyncio.AbstractEventLoop:
+    global _io_loop
+    with _io_loop_lock:
+        if _io_loop is None:
+            _io_loop = asyncio.new_event_loop()
+            threading.Thread(target=_io_loop.run_forever, name="semantic-scholar-io", daemon=True).start()
+            atexit.register(_close_shared_sessions)
+    return _io_loop
+
+
+def run_sync(coro):
+    """
+    Run a coroutine on the shared background event loop and block until it returns.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_io_loop()).result()
+
+
+async def run_shared(coro):
+    """
+    Await a coroutine run on the shared background event loop, from code running on another loop
+    (e.g. a request handler). The caller's loop is not blocked while it runs.
+    """
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _get_io_loop()))
+
+
+async def _shared_client(api_key: str) -> SemanticScholarSession:
+    # Only awaited on _io_loop, so no lock is needed
+    client = _shared_clients.get(api_key)
+    if client is None:
+        client = _shared_clients[api_key] = await SemanticScholarSession(api_key).__aenter__()
+    return client
+
+
+async def _pdf_session() -> aiohttp.ClientSession:
+    global _shared_pdf_session
+    if _shared_pdf_session is None:
+        _shared_pdf_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=PDF_DOWNLOAD_TIMEOUT))
+    return _shared_pdf_session
+
+
+def _close_shared_sessions():
+    async def close():
+        for client in _shared_clients.values():
+            await client.__aexit__(None, None, None)
+        if _shared_pdf_session is not None:
+            await _shared_pdf_session.close()
+    run_sync(close())
+
+
+async def search_paper_by_title_shared(title: str, limit: int = 10, api_key: str = SEMANTIC_SCHOLAR_API_KEY) -> dict:
+    """
+    search_papers_by_title over the shared per-key client, so concurrent callers in this process share
+    one rate limiter and its keep-alive connections.
+    """
+    async def search():
+        return await search_papers_by_title(await _shared_client(api_key), title, limit)
+    return await run_shared(search())
+
+
+def fetch_metadata_batch_sync(paper_ids: list, api_key: str = SEMANTIC_SCHOLAR_API_KEY) -> dict:
+    """
+    Blocking wrapper around fetch_semantic_scholar_metadata_batch for synchronous callers.
+    """
+    async def fetch():
+        return await fetch_semantic_scholar_metadata_batch(await _shared_client(api_key), paper_ids)
+    return run_sync(fetch())
+
+
+def fetch_metadata_sync(paper_id: str, api_key: str = SEMANTIC_SCHOLAR_API_KEY) -> dict:
+    """
+    Blocking wrapper around fetch_semantic_scholar_metadata for synchronous callers.
+    """
+    async def fetch():
+        return await fetch_semantic_scholar_metadata(await _shared_client(api_key), paper_id)
+    return run_sync(fetch())
+
+
+def pdf_source(metadata: dict) -> tuple:
+    """
+    Pick where to download a paper's PDF from: arXiv if it has an ArXiv id, otherwise its openAccessPdf url.
+    Returns (online_url, arxiv_id); arxiv_id is None for openAccessPdf sources and both are None without a source.
+    """
+    external_ids = metadata.get("externalIds") or {}
+    open_access_pdf_info = metadata.get("openAccessPdf") or {}
+    if "ArXiv" in external_ids:
+        arxiv_id = external_ids["ArXiv"].strip()
+        return f"https://arxiv.org/pdf/{arxiv_id}.pdf", arxiv_id
+    if open_access_pdf_info.get("url"):
+        return open_access_pdf_info["url"], None
+    return None, None
+
+
+async def stream_pdf(session: aiohttp.ClientSession, url: str, file_path: str):
+    """
+    Stream a PDF to file_path chunk by chunk, so memory use stays at one chunk per download.
+    Files over MAX_PDF_BYTES are rejected, from their Content-Length when the server sends one.
+    The PDF is written to a temporary file that replaces file_path only once complete, so other
+    processes checking for file_path never see a partial download; the temporary file is removed on failure.
+    """
+    tmp_path = f"{file_path}.part"
+    try:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            if response.content_length and response.content_length > MAX_PDF_BYTES:
+                raise ValueError(f"PDF is {response.content_length} bytes, over the {MAX_PDF_BYTES} byte limit")
+            written = 0
+            with open(tmp_path, "wb") as f:
+                async for chunk in response.content.iter_chunked(PDF_CHUNK_SIZE):
+                    written += len(chunk)
+                    if written > MAX_PDF_BYTES:
+                        raise ValueError(f"PDF exceeds the {MAX_PDF_BYTES} byte limit")
+                    f.write(chunk)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# In-flight downloads by target file, so concurrent requests for one PDF share a single download
+_download_flights: dict[str, asyncio.Future] = {}
+
+
+async def download_once(file_path: str, download) -> str:
+    """
+    Run the download coroutine function and return its result, unless a download to file_path
+    is already running on this event loop; then wait for that one's result instead.
+    Waiting happens before the download semaphore is taken, so waiters do not hold download slots.
+    """
+    loop = asyncio.get_running_loop()
+    flight = _download_flights.get(file_path)
+    if flight is not None and flight.get_loop() is loop:
+        return await asyncio.shield(flight)
+
+    flight = loop.create_future()
+    _download_flights[file_path] = flight
+    try:
+        result = await download()
+        flight.set_result(result)
+        return result
+    except Exception as e:
+        flight.set_exception(e)
+        # Mark the exception as retrieved when no other caller was waiting on it
+        flight.exception()
+        raise
+    except asyncio.CancelledError:
+        flight.cancel()
+        raise
+    finally:
+        if _download_flights.get(file_path) is flight:
+            del _download_flights[file_path]
+
+
+async def download_arxiv_pdf(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, arxiv_id: str) -> str:
     """
     Given an ArXiv ID, download the PDF from ArXiv and save it locally.
     Returns the local file path or None if download fails.
     """
     filename = f"{arxiv_id}.pdf"
     file_path = os.path.join(PDF_SAVE_DIRECTORY, filename)
+    # Checked on disk: test.py, the old scripts and other workers write to the same directory
     if os.path.exists(file_path):
-        logger.info(f"PDF already exists as {file_path}.")
+        logger.debug("PDF already exists as %s.", file_path)
         return file_path
 
     pdf_url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
-    try:
-        logger.info(f"Downloading PDF from {pdf_url} ...")
-        response = requests.get(pdf_url, timeout=15)
-        response.raise_for_status()
-        if not os.path.exists(PDF_SAVE_DIRECTORY):
-            os.makedirs(PDF_SAVE_DIRECTORY)
-        with open(file_path, "wb") as f:
-            f.write(response.content)
-        logger.info(f"Saved PDF as {file_path}")
-        return file_path
-    except Exception as e:
-        logger.error(f"Failed to download PDF for {arxiv_id}: {e}")
-        return None
 
+    async def download() -> str:
+        try:
+            async with semaphore:
+                logger.info("Downloading PDF from %s ...", pdf_url)
+                await stream_pdf(session, pdf_url, file_path)
+            logger.info("Saved PDF as %s", file_path)
+            return file_path
+        except Exception as e:
+            logger.error("Failed to download PDF for %s: %s", arxiv_id, e)
+            return None
 
-def download_pdf_from_url(url: str, paper_id: str) -> str:
+    return await download_once(file_path, download)
+
+
+async def download_pdf_from_url(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, url: str, paper_id: str) -> str:
     """
     Download a PDF from the given URL and save it locally using paper_id as filename.
     """
     filename = f"{paper_id}.pdf"
     file_path = os.path.join(PDF_SAVE_DIRECTORY, filename)
+
+    async def download() -> str:
+        try:
+            async with semaphore:
+                logger.info("Attempting to download PDF from %s ...", url)
+                await stream_pdf(session, url, file_path)
+            logger.info("Saved PDF as %s", file_path)
+            return file_path
+        except Exception as e:
+            logger.error("Failed to download PDF from %s: %s", url, e)
+            return None
+
+    return await download_once(file_path, download)
+
+
+async def download_paper_pdfs(metadata_by_id: dict, session: aiohttp.ClientSession = None) -> dict:
+    """
+    Download the PDFs of many papers concurrently, at most PDF_DOWNLOAD_CONCURRENCY at a time.
+    Uses session if given, otherwise a session opened for this call only.
+    Returns {paper_id: (online_url, local_filepath)}: local_filepath is None if the download failed,
+    and both are None for papers without a PDF source.
+    """
+    if session is None:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=PDF_DOWNLOAD_TIMEOUT)) as session:
+            return await download_paper_pdfs(metadata_by_id, session)
+
+    semaphore = asyncio.Semaphore(PDF_DOWNLOAD_CONCURRENCY)
+
+    async def download(paper_id: str, metadata: dict) -> tuple:
+        online_url, arxiv_id = pdf_source(metadata)
+        if arxiv_id:
+            logger.debug("Paper %s has ArXiv id: %s. Attempting download from arXiv.", paper_id, arxiv_id)
+            return online_url, await download_arxiv_pdf(session, semaphore, arxiv_id)
+        if online_url:
+            logger.debug("Paper %s has openAccessPdf url: %s. Attempting download.", paper_id, online_url)
+            return online_url, await download_pdf_from_url(session, semaphore, online_url, paper_id)
+        return None, None
+
+    results = await asyncio.gather(*[download(paper_id, metadata) for paper_id, metadata in metadata_by_id.items()])
+    return dict(zip(metadata_by_id, results))
+
+
+def download_paper_pdfs_sync(metadata_by_id: dict) -> dict:
+    """
+    Blocking wrapper around download_paper_pdfs for synchronous callers.
+    """
+    async def download():
+        return await download_paper_pdfs(metadata_by_id, await _pdf_session())
+    return run_sync(download())
+
+
+def get_pdf_page_count(file_path: str) -> int:
+    """
+    Return the number of pages in a PDF, or None if it cannot be read.
+    Results are cached per file, modification time and size, so repeated checks of an unchanged file are free.
+    """
     try:
-        logger.info(f"Attempting to download PDF from {url} ...")
-        response = requests.get(url, stream=True, timeout=15)
-        response.raise_for_status()
-        if not os.path.exists(PDF_SAVE_DIRECTORY):
-            os.makedirs(PDF_SAVE_DIRECTORY)
-        with open(file_path, "wb") as f:
-            f.write(response.content)
-        logger.info(f"Saved PDF as {file_path}")
-        return file_path
-    except Exception as e:
-        logger.error(f"Failed to download PDF from {url}: {e}")
+        stat = os.stat(file_path)
+    except OSError as e:
+        logger.error("Failed to read PDF '%s': %s", file_path, e)
         return None
+    return _pdf_page_count(file_path, stat.st_mtime_ns, stat.st_size)
 
 
-def get_pdf_page_count(file_path: str) -> int:
+@functools.lru_cache(maxsize=1024)
+def _pdf_page_count(file_path: str, mtime_ns: int, size: int) -> int:
     try:
         reader = PdfReader(file_path)
         return len(reader.pages)
     except Exception as e:
-        logger.error(f"Failed to read PDF '{file_path}': {e}")
+        logger.error("Failed to read PDF '%s': %s", file_path, e)
         return None
 
 
-def insert_paper(db_client, paper: dict):
+# on_conflict targets of the ingestion upserts (see repository/sql/unique_keys.sql)
+UNIQUE_KEYS = {
+    "papers": "semantic_id",
+    "citations": "source_paper_id,cited_paper_id"
+}
+
+
+def insert_papers(db_client, papers: list, batch_size: int = 500):
     """
-    Insert a paper record into the papers table.
+    Insert paper records into the papers table, one request per batch_size rows.
     Expected keys:
       - semantic_id, title, year, venue, external_ids, open_access_pdf, local_filepath
+    Papers that already exist are left untouched.
     """
-    try:
-        response = db_client.table("papers").insert(paper).execute()
-        logger.info(f"Inserted paper: {paper['semantic_id']} - {paper['title']}")
-    except Exception as e:
-        if "23505" in str(e):
-            logger.info(f"Paper {paper['semantic_id']} already exists, skipping insertion.")
-        else:
-            logger.error(f"Error inserting paper {paper['semantic_id']}: {e}")
+    for start in range(0, len(papers), batch_size):
+        batch = papers[start:start + batch_size]
+        try:
+            # ON CONFLICT DO NOTHING: only the rows actually inserted come back
+            response = db_client.table("papers").upsert(batch, on_conflict=UNIQUE_KEYS["papers"], ignore_duplicates=True).execute()
+            logger.info("Inserted %s of %s papers; the rest already exist", len(response.data), len(batch))
+        except Exception as e:
+            logger.error("Error inserting batch of %s papers: %s", len(batch), e)
+
+
+def existing_paper_ids(db_client, paper_ids: list, chunk_size: int = 500) -> set:
+    """
+    Return the subset of paper_ids already in the papers table, with one query per chunk_size ids
+    instead of one per paper.
+    """
+    existing = set()
+    for start in range(0, len(paper_ids), chunk_size):
+        chunk = paper_ids[start:start + chunk_size]
+        response = db_client.table("papers").select("semantic_id").in_("semantic_id", chunk).execute()
+        existing.update(row["semantic_id"] for row in response.data)
+    return existing
 
 
 def insert_citation(db_client, source_id: str, cited_id: str, remarks: dict = None, relevance_score: float = None):
@@ -174,174 +663,308 @@ def insert_citation(db_client, source_id: str, cited_id: str, remarks: dict = No
             "remarks": remarks or {},
             "relevance_score": relevance_score
         }
-        response = db_client.table("citations").insert(payload).execute()
-        logger.info(f"Inserted citation: {source_id} -> {cited_id}")
+        db_client.table("citations").upsert(payload, on_conflict=UNIQUE_KEYS["citations"], ignore_duplicates=True).execute()
+        logger.debug("Inserted citation: %s -> %s", source_id, cited_id)
     except Exception as e:
-        logger.error(f"Error inserting citation from {source_id} to {cited_id}: {e}")
+        logger.error("Error inserting citation from %s to %s: %s", source_id, cited_id, e)
 
 
-def process_paper_semantic(paper_id: str, db_client, api_key: str = None, depth: int = 0) -> bool:
+def insert_citations(db_client, citations: list, batch_size: int = 1000):
     """
-    Process a paper using Semantic Scholar:
-      - Fetch metadata.
-      - Attempt to download the PDF using available sources.
-      - Only insert the paper if a PDF file is successfully downloaded.
-      - Recursively process its references.
-    Returns True if the paper was successfully inserted (or already exists), False otherwise.
+    Insert many citation relationships, one request per batch_size rows.
+    Each entry is a (source_id, cited_id) pair; relationship_type is left as null.
+    Citations that already exist are skipped. If a batch is rejected, its rows are retried
+    one by one so a single bad row does not drop the rest.
+    """
+    rows = [citation_row(source_id, cited_id) for source_id, cited_id in citations]
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        try:
+            db_client.table("citations").upsert(batch, on_conflict=UNIQUE_KEYS["citations"], ignore_duplicates=True).execute()
+            logger.info("Inserted %s citations", len(batch))
+        except Exception as e:
+            logger.error("Error inserting batch of %s citations, retrying individually: %s", len(batch), e)
+            for row in batch:
+                insert_citation(db_client, row["source_paper_id"], row["cited_paper_id"])
+
+
+class WriteBuffer:
+    """
+    Collects rows submitted during ingestion and writes them from a background thread,
+    one multi-row insert per table every flush_ms (at most max_batch rows per request).
+    Rows of tables listed in UNIQUE_KEYS are skipped when they already exist.
+    Callers never wait on the database, and rows do not pile up until the end of the run.
+    Call drain() once ingestion is finished to flush what is left and stop the worker.
     """
-    global processed_papers
-    if paper_id in processed_papers:
-        return True
-    
-    if depth > MAX_DEPTH:
-        logger.info(f"Depth {depth} exceeded MAX_DEPTH for paper {paper_id}; not processing further.")
-        return False
 
-    processed_papers.add(paper_id)
-    
-    logger.info(f"\nProcessing paper {paper_id} at depth {depth}")
-    
-    try:
-        metadata = fetch_semantic_scholar_metadata(paper_id, api_key)
-    except Exception as e:
-        logger.error(f"Failed to fetch metadata for {paper_id}: {e}")
-        return False
+    def __init__(self, db_client, max_batch: int = 500, flush_ms: int = 50):
+        self.db_client = db_client
+        self.max_batch = max_batch
+        self.flush_ms = flush_ms
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, table: str, row: dict):
+        """
+        Queue a row for insertion into the given table.
+        """
+        self._queue.put((table, row))
+
+    def drain(self):
+        """
+        Flush every queued row and stop the background worker.
+        """
+        self._stopped.set()
+        self._worker.join()
+        self._flush()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_ms / 1000):
+            self._flush()
+
+    def _flush(self):
+        rows_by_table = {}
+        while True:
+            try:
+                table, row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            rows_by_table.setdefault(table, []).append(row)
+
+        for table, rows in rows_by_table.items():
+            for start in range(0, len(rows), self.max_batch):
+                batch = rows[start:start + self.max_batch]
+                try:
+                    self._insert(table, batch)
+                    logger.info("Inserted %s rows into %s", len(batch), table)
+                except Exception as e:
+                    logger.error("Error inserting batch of %s rows into %s, retrying individually: %s", len(batch), table, e)
+                    for single in batch:
+                        try:
+                            self._insert(table, single)
+                        except Exception as e:
+                            logger.error("Error inserting row into %s: %s", table, e)
+
+    def _insert(self, table: str, rows):
+        if table in UNIQUE_KEYS:
+            self.db_client.table(table).upsert(rows, on_conflict=UNIQUE_KEYS[table], ignore_duplicates=True).execute()
+        else:
+            self.db_client.table(table).insert(rows).execute()
 
-    if not metadata:
-        return False
 
-    title = metadata.get("title", "No Title")
-    year = metadata.get("year")
-    venue = metadata.get("venue")
-    external_ids = metadata.get("externalIds", {})
-    open_access_pdf_info = metadata.get("openAccessPdf", {})
+def citation_row(source_id: str, cited_id: str) -> dict:
+    """
+    Build a citations table row; relationship_type is left as null.
+    """
+    return {
+        "source_paper_id": source_id,
+        "cited_paper_id": cited_id,
+        "relationship_type": None,  # Left as null
+        "remarks": {},
+        "relevance_score": None
+    }
 
-    # Try to download the PDF and only continue if successful.
-    local_filepath = None
-    online_url = None
 
-    if "ArXiv" in external_ids:
-        arxiv_id = external_ids["ArXiv"].strip()
-        online_url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
-        logger.info(f"Paper {paper_id} has ArXiv id: {arxiv_id}. Attempting download from arXiv.")
-        local_filepath = download_arxiv_pdf(arxiv_id)
-    elif open_access_pdf_info and open_access_pdf_info.get("url"):
-        online_url = open_access_pdf_info["url"]
-        logger.info(f"Paper {paper_id} has openAccessPdf url: {online_url}. Attempting download.")
-        local_filepath = download_pdf_from_url(online_url, paper_id)
-    else:
-        logger.warning(f"Paper {paper_id} has no available PDF source; skipping.")
-        return False
+def write_citations(db_client, citations: list, write_buffer: WriteBuffer = None):
+    """
+    Submit (source_id, cited_id) pairs to write_buffer if given, otherwise insert them now.
+    """
+    if write_buffer is None:
+        insert_citations(db_client, citations)
+        return
+    for source_id, cited_id in citations:
+        write_buffer.submit("citations", citation_row(source_id, cited_id))
+
+
+def semantic_paper_record(paper_id: str, metadata: dict, download: tuple) -> dict:
+    """
+    Build a papers table row from Semantic Scholar metadata and the paper's (online_url, local_filepath) download.
+    Returns None if its PDF file was not successfully downloaded, since such papers are not inserted.
+    """
+    title = metadata.get("title", "No Title")
+    online_url, local_filepath = download
+
+    if online_url is None:
+        logger.warning("Paper %s has no available PDF source; skipping.", paper_id)
+        return None
 
     if not local_filepath:
-        logger.warning(f"Failed to download PDF for paper {paper_id} ({title}); skipping insertion.")
-        return False
+        logger.warning("Failed to download PDF for paper %s (%s); skipping insertion.", paper_id, title)
+        return None
 
-    paper_record = {
+    return {
         "semantic_id": paper_id,
         "title": title,
-        "year": year,
-        "venue": venue,
-        "external_ids": external_ids,
+        "year": metadata.get("year"),
+        "venue": metadata.get("venue"),
+        "external_ids": metadata.get("externalIds", {}),
         "open_access_pdf": online_url,
         "local_filepath": local_filepath
     }
 
-    insert_paper(db_client, paper_record)
-
-    # Process references recursively.
-    references = metadata.get("references", [])
-    logger.info(f"Paper {paper_id} references {len(references)} works.")
-    for ref in references:
-        ref_id = ref.get("paperId")
-        if ref_id:
-            child_inserted = process_paper_semantic(ref_id, db_client, api_key, depth=depth+1)
-            if child_inserted:
-                insert_citation(db_client, paper_id, ref_id)
-            time.sleep(0.5)  # Respect rate limits
 
-    return True
-
-
-def process_and_cite_paper(paper_id: str, db_client, api_key = SEMANTIC_SCHOLAR_API_KEY):
+def process_paper_semantic(paper_id: str, db_client, api_key: str = None, write_buffer: WriteBuffer = None,
+                           traversal_type: str = "bfs") -> bool:
+    """
+    Process a paper and its references using Semantic Scholar, down to MAX_DEPTH, either
+    breadth-first (traversal_type="bfs") or depth-first (traversal_type="dfs"):
+      - Take up to TRAVERSAL_BATCH_SIZE papers off the frontier at a time: for BFS, papers of
+        the same depth; for DFS, the most recently discovered ones.
+      - Fetch their metadata in one batch request and download their PDFs concurrently.
+      - Skip papers already processed under another id (DOI, arXiv id, paperId or title).
+      - Insert the papers whose PDF file was successfully downloaded, in one request.
+      - Queue their references that were not visited yet, one level deeper. References past
+        MAX_DEPTH are pruned here, before any of their work is done.
+      - Insert the citations whose referenced paper has been processed by then.
+    Returns True if the paper was successfully inserted (or already exists), False otherwise.
+    """
+    global processed_papers
+    if traversal_type not in ("bfs", "dfs"):
+        raise ValueError(f"Unknown traversal_type: {traversal_type}")
+    if processed_papers.find({"s2id": paper_id}) is not None:
+        return True
+    # Papers are marked as visited when they are queued, so each is queued only once
+    processed_papers.add({"s2id": paper_id}, paper_id)
+
+    frontier = deque([(paper_id, 0)])
+    queued = {paper_id}
+    done = set()
+    inserted = set()
+    aliases = {}  # paper id -> id of the same paper it was deduplicated against
+    pending_citations = []  # (citing, cited) pairs whose cited paper is still on the frontier
+
+    while frontier:
+        if traversal_type == "bfs":
+            batch = []
+            depth = frontier[0][1]
+            while frontier and frontier[0][1] == depth and len(batch) < TRAVERSAL_BATCH_SIZE:
+                batch.append(frontier.popleft())
+        else:
+            # The top of the stack: the first references of the paper processed last
+            batch = [frontier.pop() for _ in range(min(len(frontier), TRAVERSAL_BATCH_SIZE))]
+        depths = dict(batch)  # paper id -> depth
+        level = list(depths)
+        logger.info("\nProcessing %s papers at depth %s-%s", len(level), min(depths.values()), max(depths.values()))
+
+        try:
+            fetched = fetch_metadata_batch_sync(level, api_key)
+        except Exception as e:
+            logger.error("Failed to fetch metadata for %s papers: %s", len(level), e)
+            fetched = {}
+
+        # Full metadata can reveal that two ids are one paper; only the entry with the most fields is kept
+        metadata_by_id = {}
+        level_keys = SeenKeys()
+        for pid, metadata in sorted(((pid, metadata) for pid, metadata in fetched.items() if metadata),
+                                    key=lambda item: metadata_richness(item[1]), reverse=True):
+            keys = canonical_keys(metadata)
+            same = level_keys.find(keys)
+            if same is None:
+                same = processed_papers.find(keys)
+                if same not in done:
+                    same = None
+            if same is not None:
+                logger.debug("Paper %s is a duplicate of %s; skipping.", pid, same)
+                aliases[pid] = same
+                continue
+            level_keys.add(keys, pid)
+            processed_papers.add(keys, pid)
+            metadata_by_id[pid] = metadata
+        downloads = download_paper_pdfs_sync(metadata_by_id)
+
+        citations = []
+        paper_records = []
+        for pid, metadata in metadata_by_id.items():
+            paper_record = semantic_paper_record(pid, metadata, downloads[pid])
+            if paper_record is None:
+                continue
+            paper_records.append(paper_record)
+            inserted.add(pid)
+
+            references = metadata.get("references") or []
+            logger.debug("Paper %s references %s works.", pid, len(references))
+            depth = depths[pid]
+            discovered = []
+            for ref in references:
+                ref_id = ref.get("paperId")
+                if not ref_id:
+                    continue
+                keys = canonical_keys(ref)
+                seen_id = processed_papers.find(keys)
+                if seen_id in queued:
+                    pending_citations.append((pid, seen_id))
+                elif seen_id is not None:
+                    # Processed by an earlier call, so it is already in the database
+                    citations.append((pid, seen_id))
+                elif depth + 1 <= MAX_DEPTH:
+                    processed_papers.add(keys, ref_id)
+                    queued.add(ref_id)
+                    discovered.append((ref_id, depth + 1))
+                    pending_citations.append((pid, ref_id))
+            # Pushed in reverse for DFS, so references are popped in their original order
+            frontier.extend(discovered if traversal_type == "bfs" else reversed(discovered))
+
+        insert_papers(db_client, paper_records)
+
+        done.update(level)
+        still_pending = []
+        for citing, cited in pending_citations:
+            cited = aliases.get(cited, cited)
+            if cited not in done:
+                still_pending.append((citing, cited))
+            elif cited in inserted and cited != citing:
+                citations.append((citing, cited))
+        pending_citations = still_pending
+        write_citations(db_client, list(dict.fromkeys(citations)), write_buffer)
+
+    return aliases.get(paper_id, paper_id) in inserted
+
+
+def process_and_cite_paper(paper_id: str, db_client, api_key = SEMANTIC_SCHOLAR_API_KEY, write_buffer: WriteBuffer = None):
     """
     Fetches, downloads, and inserts a paper, then creates citation entries
     for its references that already exist in the database.
+    With a write_buffer, citations are handed to it instead of being inserted before returning.
     """
     try:
-        result = db_client.table("papers").select("semantic_id").eq("semantic_id", paper_id).execute()
-        if result.data:
-            logger.info(f"Paper {paper_id} already exists in the database; skipping.")
+        result = db_client.table("papers").select("semantic_id", count="exact", head=True).eq("semantic_id", paper_id).execute()
+        if result.count:
+            logger.info("Paper %s already exists in the database; skipping.", paper_id)
             return
     except Exception as e:
-        logger.error(f"Error checking for existing paper {paper_id}: {e}")
+        logger.error("Error checking for existing paper %s: %s", paper_id, e)
         return
     
-    logger.info(f"\nProcessing and citing paper {paper_id}")
+    logger.info("\nProcessing and citing paper %s", paper_id)
 
     try:
-        metadata = fetch_semantic_scholar_metadata(paper_id, api_key)
+        metadata = fetch_metadata_sync(paper_id, api_key)
     except Exception as e:
-        logger.error(f"Failed to fetch metadata for {paper_id}: {e}")
+        logger.error("Failed to fetch metadata for %s: %s", paper_id, e)
         return
 
     if not metadata:
         return
 
-    title = metadata.get("title", "No Title")
-    year = metadata.get("year")
-    venue = metadata.get("venue")
-    external_ids = metadata.get("externalIds", {})
-    open_access_pdf_info = metadata.get("openAccessPdf", {})
-
-    local_filepath = None
-    online_url = None
-
-    if "ArXiv" in external_ids:
-        arxiv_id = external_ids["ArXiv"].strip()
-        online_url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
-        logger.info(f"Paper {paper_id} has ArXiv id: {arxiv_id}. Attempting download from arXiv.")
-        local_filepath = download_arxiv_pdf(arxiv_id)
-    elif open_access_pdf_info and open_access_pdf_info.get("url"):
-        online_url = open_access_pdf_info["url"]
-        logger.info(f"Paper {paper_id} has openAccessPdf url: {online_url}. Attempting download.")
-        local_filepath = download_pdf_from_url(online_url, paper_id)
-    else:
-        logger.warning(f"Paper {paper_id} has no available PDF source; skipping.")
-        return
-
-    if not local_filepath:
-        logger.warning(f"Failed to download PDF for paper {paper_id} ({title}); skipping insertion.")
+    download = download_paper_pdfs_sync({paper_id: metadata})[paper_id]
+    paper_record = semantic_paper_record(paper_id, metadata, download)
+    if paper_record is None:
         return
-
-    paper_record = {
-        "semantic_id": paper_id,
-        "title": title,
-        "year": year,
-        "venue": venue,
-        "external_ids": external_ids,
-        "open_access_pdf": online_url,
-        "local_filepath": local_filepath
-    }
-
-    insert_paper(db_client, paper_record)
+    insert_papers(db_client, [paper_record])
 
     # Process references and create citations only if they exist.
     references = metadata.get("references", [])
-    logger.info(f"Paper {paper_id} references {len(references)} works.")
-    for ref in references:
-        ref_id = ref.get("paperId")
-        if ref_id:
-            try:
-                result = db_client.table("papers").select("semantic_id").eq("semantic_id", ref_id).execute()
-                if result.data:
-                    insert_citation(db_client, paper_id, ref_id)
-                else:
-                    logger.info(f"Referenced paper {ref_id} not found in database; skipping citation.")
-            except Exception as e:
-                logger.error(f"Error checking for referenced paper {ref_id}: {e}")
-
-            time.sleep(0.5)  # Respect rate limits
+    logger.info("Paper %s references %s works.", paper_id, len(references))
+    ref_ids = list(dict.fromkeys(ref["paperId"] for ref in references if ref.get("paperId")))
+    try:
+        existing = existing_paper_ids(db_client, ref_ids)
+    except Exception as e:
+        logger.error("Error checking for referenced papers of %s: %s", paper_id, e)
+        return
+    logger.info("%s of %s referenced papers found in database; skipping the rest.", len(existing), len(ref_ids))
+    write_citations(db_client, [(paper_id, ref_id) for ref_id in ref_ids if ref_id in existing], write_buffer)
 
 
 
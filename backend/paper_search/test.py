@@ -1,12 +1,14 @@
 import os
-import time
+import asyncio
 import requests
+from concurrent.futures import ThreadPoolExecutor
 import logging
 from PyPDF2 import PdfReader
 
 logger = logging.getLogger(__name__)
 
 from supabase import Client, create_client
+from semantic_scholar import fetch_metadata_batch_sync, fetch_metadata_sync, normalize_title, search_papers_by_titles
 
 SUPABASE_URL = os.getenv("SUPABASE_URL", "https://your-supabase-url.supabase.co")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "your-supabase-api-key")
@@ -70,86 +72,66 @@ paper_titles = [
     'In-depth Analysis of Densest Subgraph Discovery in a Unified Framework'
 ]
 
-def fetch_semantic_scholar_metadata(paper_id: str, api_key: str = None) -> dict:
-    fields = (
-        "paperId,title,year,venue,externalIds,openAccessPdf,"
-        "references,citations"
-    )
-    url = f"{SEMANTIC_SCHOLAR_BASE_URL}{paper_id}?fields={fields}"
-    headers = {}
-    if api_key:
-        headers["x-api-key"] = api_key
-    print(f"Fetching metadata from: {url}")
-    while True:
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 429:
-            logger.warning("Rate limit reached. Waiting 10 seconds before retrying...")
-            time.sleep(10)
-            continue
-        elif response.status_code != 200:
-            print(f"API request failed: {response.status_code} - {response.text}")
-            raise Exception(f"API request failed: {response.status_code} - {response.text}")
-        time.sleep(1)  # Respect rate limits
-        return response.json()
-
-def search_papers_by_title(title: str, limit: int = 10, api_key=SEMANTIC_SCHOLAR_API_KEY) -> dict:
-    search_url = "https://api.semanticscholar.org/graph/v1/paper/search"
-    params = {
-        "query": title,
-        "limit": limit,
-        "fields": "paperId,title,year,venue,externalIds,openAccessPdf"
-    }
-    headers = {}
-    if api_key:
-        headers["x-api-key"] = api_key
-    print(f"Searching for papers with title: {title}")
-    response = requests.get(search_url, params=params, headers=headers, timeout=10)
-    if response.status_code == 429:
-        logger.warning("Rate limit reached during search. Waiting 10 seconds before retrying...")
-        time.sleep(10)
-        return search_papers_by_title(title, limit, api_key)
-    elif response.status_code != 200:
-        print(f"Search request failed: {response.status_code} - {response.text}")
-        raise Exception(f"Search request failed: {response.status_code} - {response.text}")
-    time.sleep(1)  # Respect rate limits
-    return response.json()
+# Normalized form of each title, computed once; titles equal after normalization are searched once
+NORMALIZED_TITLES = {title: normalize_title(title) for title in paper_titles}
+
+MAX_PDF_BYTES = 100 * 1024 * 1024
+# Papers processed concurrently after the title searches
+INGEST_WORKERS = 8
+# One session for every download, so connections to arXiv are kept alive between papers
+SESSION = requests.Session()
+
+def stream_pdf(url: str, file_path: str):
+    # Copied to disk in 64 KiB chunks rather than held in memory as response.content.
+    # Written to a temporary file that only replaces file_path once the whole PDF is in, so a failed
+    # or cut-off transfer never leaves a partial file that download_arxiv_pdf would treat as cached.
+    tmp_path = f"{file_path}.part"
+    try:
+        with SESSION.get(url, stream=True, timeout=15) as response:
+            response.raise_for_status()
+            content_length = int(response.headers.get("Content-Length") or 0)
+            if content_length > MAX_PDF_BYTES:
+                raise ValueError(f"PDF is {content_length} bytes, over the {MAX_PDF_BYTES} byte limit")
+            os.makedirs(PDF_SAVE_DIRECTORY, exist_ok=True)
+            written = 0
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=1 << 16):
+                    written += len(chunk)
+                    if written > MAX_PDF_BYTES:
+                        raise ValueError(f"PDF exceeds the {MAX_PDF_BYTES} byte limit")
+                    f.write(chunk)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
 def download_arxiv_pdf(arxiv_id: str) -> str:
     filename = f"{arxiv_id}.pdf"
     file_path = os.path.join(PDF_SAVE_DIRECTORY, filename)
     if os.path.exists(file_path):
-        print(f"PDF already exists as {file_path}.")
+        logger.debug("PDF already exists as %s.", file_path)
         return file_path
     pdf_url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
     try:
-        print(f"Downloading PDF from {pdf_url} ...")
-        response = requests.get(pdf_url, timeout=15)
-        response.raise_for_status()
-        if not os.path.exists(PDF_SAVE_DIRECTORY):
-            os.makedirs(PDF_SAVE_DIRECTORY)
-        with open(file_path, "wb") as f:
-            f.write(response.content)
-        print(f"Saved PDF as {file_path}")
+        logger.info("Downloading PDF from %s ...", pdf_url)
+        stream_pdf(pdf_url, file_path)
+        logger.info("Saved PDF as %s", file_path)
         return file_path
     except Exception as e:
-        print(f"Failed to download PDF for {arxiv_id}: {e}")
+        logger.error("Failed to download PDF for %s: %s", arxiv_id, e)
         return None
 
 def download_pdf_from_url(url: str, paper_id: str) -> str:
     filename = f"{paper_id}.pdf"
     file_path = os.path.join(PDF_SAVE_DIRECTORY, filename)
     try:
-        print(f"Attempting to download PDF from {url} ...")
-        response = requests.get(url, stream=True, timeout=15)
-        response.raise_for_status()
-        if not os.path.exists(PDF_SAVE_DIRECTORY):
-            os.makedirs(PDF_SAVE_DIRECTORY)
-        with open(file_path, "wb") as f:
-            f.write(response.content)
-        print(f"Saved PDF as {file_path}")
+        logger.info("Attempting to download PDF from %s ...", url)
+        stream_pdf(url, file_path)
+        logger.info("Saved PDF as %s", file_path)
         return file_path
     except Exception as e:
-        print(f"Failed to download PDF from {url}: {e}")
+        logger.error("Failed to download PDF from %s: %s", url, e)
         return None
 
 def get_pdf_page_count(file_path: str) -> int:
@@ -157,18 +139,19 @@ def get_pdf_page_count(file_path: str) -> int:
         reader = PdfReader(file_path)
         return len(reader.pages)
     except Exception as e:
-        print(f"Failed to read PDF '{file_path}': {e}")
+        logger.error("Failed to read PDF '%s': %s", file_path, e)
         return None
 
 def insert_paper(db_client, paper: dict):
     try:
-        response = db_client.table("papers").insert(paper).execute()
-        print(f"Inserted paper: {paper['semantic_id']} - {paper['title']}")
-    except Exception as e:
-        if "23505" in str(e):
-            print(f"Paper {paper['semantic_id']} already exists, skipping insertion.")
+        # ON CONFLICT DO NOTHING: an existing row comes back empty instead of as a 23505 error
+        response = db_client.table("papers").upsert(paper, on_conflict="semantic_id", ignore_duplicates=True).execute()
+        if response.data:
+            logger.info("Inserted paper: %s - %s", paper["semantic_id"], paper["title"])
         else:
-            print(f"Error inserting paper {paper['semantic_id']}: {e}")
+            logger.info("Paper %s already exists, skipping insertion.", paper["semantic_id"])
+    except Exception as e:
+        logger.error("Error inserting paper %s: %s", paper["semantic_id"], e)
 
 def insert_citation(db_client, source_id: str, cited_id: str):
     try:
@@ -176,33 +159,34 @@ def insert_citation(db_client, source_id: str, cited_id: str):
             "source_paper_id": source_id,
             "cited_paper_id": cited_id,
         }
-        response = db_client.table("citations").insert(payload).execute()
-        print(f"Inserted citation: {source_id} -> {cited_id}")
+        response = db_client.table("citations").upsert(payload, on_conflict="source_paper_id,cited_paper_id", ignore_duplicates=True).execute()
+        logger.debug("Inserted citation: %s -> %s", source_id, cited_id)
     except Exception as e:
-        print(f"Error inserting citation from {source_id} to {cited_id}: {e}")
+        logger.error("Error inserting citation from %s to %s: %s", source_id, cited_id, e)
 
-def process_and_cite_paper(paper_id: str, db_client, api_key=SEMANTIC_SCHOLAR_API_KEY):
+def process_and_cite_paper(paper_id: str, db_client, api_key=SEMANTIC_SCHOLAR_API_KEY, metadata: dict = None):
     """
     Processes a paper:
       - Checks if already in DB.
-      - If not, fetch metadata, download PDF (via ArXiv or openAccessPdf), and insert.
+      - If not, fetch metadata (unless the caller passes it), download PDF (via ArXiv or openAccessPdf), and insert.
       - Then, process its references recursively.
     """
     try:
         result = db_client.table("papers").select("semantic_id").eq("semantic_id", paper_id).execute()
         if result.data:
-            print(f"Paper {paper_id} already exists in the database; skipping processing.")
+            logger.info("Paper %s already exists in the database; skipping processing.", paper_id)
             return
     except Exception as e:
-        print(f"Error checking for existing paper {paper_id}: {e}")
+        logger.error("Error checking for existing paper %s: %s", paper_id, e)
         return
 
-    print(f"\nProcessing and citing paper {paper_id}")
-    try:
-        metadata = fetch_semantic_scholar_metadata(paper_id, api_key)
-    except Exception as e:
-        print(f"Failed to fetch metadata for {paper_id}: {e}")
-        return
+    logger.info("\nProcessing and citing paper %s", paper_id)
+    if metadata is None:
+        try:
+            metadata = fetch_metadata_sync(paper_id, api_key)
+        except Exception as e:
+            logger.error("Failed to fetch metadata for %s: %s", paper_id, e)
+            return
     if not metadata:
         return
 
@@ -218,18 +202,18 @@ def process_and_cite_paper(paper_id: str, db_client, api_key=SEMANTIC_SCHOLAR_AP
     if "ArXiv" in external_ids:
         arxiv_id = external_ids["ArXiv"].strip()
         online_url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
-        print(f"Paper {paper_id} has ArXiv id: {arxiv_id}. Attempting download from ArXiv.")
+        logger.debug("Paper %s has ArXiv id: %s. Attempting download from ArXiv.", paper_id, arxiv_id)
         local_filepath = download_arxiv_pdf(arxiv_id)
     elif open_access_pdf_info and open_access_pdf_info.get("url"):
         online_url = open_access_pdf_info["url"]
-        print(f"Paper {paper_id} has openAccessPdf url: {online_url}. Attempting download.")
+        logger.debug("Paper %s has openAccessPdf url: %s. Attempting download.", paper_id, online_url)
         local_filepath = download_pdf_from_url(online_url, paper_id)
     else:
-        print(f"Paper {paper_id} has no available PDF source; skipping processing.")
+        logger.warning("Paper %s has no available PDF source; skipping processing.", paper_id)
         return
 
     if not local_filepath:
-        print(f"Failed to download PDF for paper {paper_id} ({title}); skipping insertion.")
+        logger.error("Failed to download PDF for paper %s (%s); skipping insertion.", paper_id, title)
         return
 
     paper_record = {
@@ -244,7 +228,27 @@ def process_and_cite_paper(paper_id: str, db_client, api_key=SEMANTIC_SCHOLAR_AP
 
     insert_paper(db_client, paper_record)
 
+def ingest_and_cite(paper_id: str, metadata: dict = None):
+    """
+    Process and insert a paper (download PDF, insert record, etc.), then cite it from manual1 if it is in the DB.
+    Returns the exception that stopped it, if any, so one failure does not end the whole run.
+    """
+    try:
+        process_and_cite_paper(paper_id, supabase, metadata=metadata)
+
+        # Now check if the paper exists in the DB. If it does, insert a citation from manual1.
+        result = supabase.table("papers").select("semantic_id").eq("semantic_id", paper_id).execute()
+        if result.data:
+            insert_citation(supabase, "manual1", paper_id)
+        else:
+            logger.warning("Paper %s not found in the database after processing; skipping citation.", paper_id)
+    except Exception as e:
+        return e
+    return None
+
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
     # 1. Insert the manually defined paper (manual1)
     manual1 = {
         "semantic_id": "manual1",
@@ -258,44 +262,64 @@ if __name__ == "__main__":
     insert_paper(supabase, manual1)
 
     # 2. Process each paper title from the global variable "paper_titles"
-    not_found_titles = []
-    for title in paper_titles:
-        try:
-            search_results = search_papers_by_title(title)
-        except Exception as e:
-            print(f"Search failed for title '{title}': {e}")
-            not_found_titles.append(title)
+    search_titles = list({NORMALIZED_TITLES[title]: title for title in paper_titles}.values())
+
+    # Titles of papers already stored are matched in one request (repository/sql/match_paper_titles.sql)
+    # and not searched again; the trigram match is only taken when the normalized titles agree
+    stored_ids = {}  # title as listed -> semantic_id
+    try:
+        for row in supabase.rpc("match_paper_titles", {"titles": search_titles}).execute().data:
+            paper = row.get("paper")
+            if paper and normalize_title(paper.get("title") or "") == NORMALIZED_TITLES[row["query"]]:
+                stored_ids[row["query"]] = paper["semantic_id"]
+    except Exception as e:
+        print(f"Stored title lookup failed, searching every title: {e}")
+    search_titles = [title for title in search_titles if title not in stored_ids]
+
+    # The other titles are searched concurrently up front; the semaphore in the session paces the requests
+    all_search_results = asyncio.run(search_papers_by_titles(search_titles))
+    not_found = {}  # normalized title -> title as listed
+    paper_ids = list(stored_ids.values())
+    for title, search_results in zip(search_titles, all_search_results):
+        if isinstance(search_results, Exception):
+            print(f"Search failed for title '{title}': {search_results}")
+            not_found[NORMALIZED_TITLES[title]] = title
             continue
 
         data = search_results.get("data", [])
         if not data:
             print(f"No results found for title: {title}")
-            not_found_titles.append(title)
+            not_found[NORMALIZED_TITLES[title]] = title
             continue
 
         # Use the first search result from Semantic Scholar.
         paper_id = data[0].get("paperId")
         if not paper_id:
             print(f"No paperId found in search result for title: {title}")
-            not_found_titles.append(title)
+            not_found[NORMALIZED_TITLES[title]] = title
             continue
+        if normalize_title(data[0].get("title") or "") != NORMALIZED_TITLES[title]:
+            print(f"Top search result for '{title}' has a different title: {data[0].get('title')}")
+        paper_ids.append(paper_id)
+    paper_ids = list(dict.fromkeys(paper_ids))
 
-        # Process and insert the paper (download PDF, insert record, etc.)
-        process_and_cite_paper(paper_id, supabase)
-
-        # Now check if the paper exists in the DB. If it does, insert a citation from manual1.
-        try:
-            result = supabase.table("papers").select("semantic_id").eq("semantic_id", paper_id).execute()
-            if result.data:
-                insert_citation(supabase, "manual1", paper_id)
-            else:
-                print(f"Paper {paper_id} not found in the database after processing; skipping citation.")
-        except Exception as e:
-            print(f"Error checking for paper {paper_id} in database: {e}")
+    # 3. Fetch full metadata for every newly found paper with the batch endpoint (one request per 500 ids).
+    # Stored papers get none: process_and_cite_paper skips them before looking at metadata
+    stored = set(stored_ids.values())
+    try:
+        metadata_by_id = fetch_metadata_batch_sync([paper_id for paper_id in paper_ids if paper_id not in stored])
+    except Exception as e:
+        print(f"Batch metadata fetch failed, falling back to one request per paper: {e}")
+        metadata_by_id = {}
+    paper_metadata = [metadata_by_id.get(paper_id) for paper_id in paper_ids]
 
-        time.sleep(0.5)  # Respect rate limits
+    # 4. Process the found papers in parallel: each one is mostly waiting on downloads and the database
+    with ThreadPoolExecutor(max_workers=INGEST_WORKERS) as executor:
+        for paper_id, error in zip(paper_ids, executor.map(ingest_and_cite, paper_ids, paper_metadata)):
+            if error is not None:
+                print(f"Error processing paper {paper_id}: {error}")
 
-    if not_found_titles:
+    if not_found:
         print("The following paper titles were not found on Semantic Scholar:")
-        for t in not_found_titles:
+        for t in not_found.values():
             print(t)
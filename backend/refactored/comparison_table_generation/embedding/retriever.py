@@ -35,25 +35,25 @@ def retrieve_relevant_chunks(
         logger.warning("No chunks provided for retrieval")
         return []
     
+    # Skip chunks without embeddings
+    embedded = [chunk for chunk in chunks if chunk.embedding]
+    if not embedded or top_k <= 0:
+        return []
+    
     # Generate embedding for the query
-    query_embedding = generate_embedding(query_text)
+    query_embedding = np.asarray(generate_embedding(query_text), dtype=np.float32)
     
-    # Score each chunk based on similarity to the query
-    scored_chunks = []
-    for chunk in chunks:
-        # Skip chunks without embeddings
-        if not chunk.embedding:
-            continue
-        
-        # Calculate similarity score
-        score = cosine_similarity(query_embedding, chunk.embedding)
-        scored_chunks.append((score, chunk))
+    # Score every chunk with a single matrix-vector product
+    chunk_matrix = np.asarray([chunk.embedding for chunk in embedded], dtype=np.float32)
+    scores = chunk_matrix @ query_embedding
+    scores /= np.linalg.norm(chunk_matrix, axis=1) * np.linalg.norm(query_embedding) + 1e-12
     
-    # Sort by score in descending order
-    scored_chunks.sort(key=lambda x: x[0], reverse=True)
+    # Select the top_k without sorting every score, then order only those
+    top_k = min(top_k, len(embedded))
+    top = np.argpartition(-scores, top_k - 1)[:top_k]
+    top = top[np.argsort(-scores[top])]
     
-    # Return the top_k chunks
-    return [chunk for score, chunk in scored_chunks[:top_k]]
+    return [embedded[i] for i in top]
 
 
 def mean_embedding_similarity(embeddings_A: List[List[float]], embeddings_B: List[List[float]]) -> float:
@@ -63,11 +63,13 @@ def mean_embedding_similarity(embeddings_A: List[List[float]], embeddings_B: Lis
     if not embeddings_A or not embeddings_B:
         return 0.0
     
-    arr_A = np.array(embeddings_A)
-    arr_B = np.array(embeddings_B)
-    mean_A = np.mean(arr_A, axis=0)
-    mean_B = np.mean(arr_B, axis=0)
-    return cosine_similarity(mean_A, mean_B)
+    # Sum in float32 and normalize once; the division by the chunk count
+    # cancels out after L2 normalization.
+    mean_A = np.asarray(embeddings_A, dtype=np.float32).sum(axis=0)
+    mean_B = np.asarray(embeddings_B, dtype=np.float32).sum(axis=0)
+    mean_A /= np.linalg.norm(mean_A) + 1e-12
+    mean_B /= np.linalg.norm(mean_B) + 1e-12
+    return float(mean_A @ mean_B)
 
 
 def pairwise_chunk_similarity(embeddings_A: List[List[float]], embeddings_B: List[List[float]]) -> float:
@@ -5,11 +5,15 @@ Utility functions for parsing LLM responses
 """
 
 import re
-import json
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# The first Markdown code fence in a response, with an optional language tag;
+# the model sometimes adds prose before or after the fenced JSON
+CODE_FENCE_PATTERN = re.compile(r"```[A-Za-z]*\s*(.*?)\s*```", re.DOTALL)
+
 
 def parse_json_response(response: str) -> dict:
     """
@@ -25,10 +29,14 @@ def parse_json_response(response: str) -> dict:
         Exception: If the response cannot be parsed as valid JSON
     """
     # Clean the response by removing markdown code block indicators
-    cleaned_response = re.sub(r"^```json\s*|```$", "", response.strip()).strip()
+    cleaned_response = response.strip()
+    if "```" in cleaned_response:
+        match = CODE_FENCE_PATTERN.search(cleaned_response)
+        if match:
+            cleaned_response = match.group(1)
     
     try:
-        return json.loads(cleaned_response)
+        return orjson.loads(cleaned_response)
     except Exception as e:
         # Get detailed error information if available
         line_no = getattr(e, 'lineno', None)
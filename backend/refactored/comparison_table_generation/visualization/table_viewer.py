@@ -5,9 +5,12 @@ Display comparison tables in a Tkinter-based GUI
 """
 
 import tkinter as tk
+import tkinter.font as tkfont
 from tkinter import ttk, messagebox
+import textwrap
 import webbrowser
 import logging
+import re
 from typing import List, Dict, Any, Optional
 
 from ..core.models import Paper, Criterion, TableCell, ComparisonTable
@@ -29,6 +32,14 @@ COLORS = {
     "tooltip_bg": "#f0fff0"
 }
 
+# Whitespace-delimited boolean/N/A markers in comparison cells, checked in this
+# order. Matching in place avoids splitting every cell into a token list.
+CELL_INDICATORS = (
+    (re.compile(r"(?<!\S)N/A(?!\S)"), "⚪"),
+    (re.compile(r"(?<!\S)true(?!\S)"), "✓"),
+    (re.compile(r"(?<!\S)false(?!\S)"), "✗"),
+)
+
 
 class EnhancedToolTip:
     """Enhanced tooltip for displaying detailed information on hover"""
@@ -37,10 +48,32 @@ class EnhancedToolTip:
         self.widget = widget
         self.tipwindow = None
         self.current_content = None
-        
+        # Font measurement and window creation are the expensive tk calls, so
+        # both are done once and the hidden Toplevel is reused between hovers.
+        self._font = tkfont.Font(font=("Palatino Linotype", 14))
+        self._avg_char = self._font.measure("0")
+        self._tw = None
+        self._text = None
+
+    def _ensure_window(self):
+        """Create the shared tooltip window and text widget on first use"""
+        if self._tw is not None:
+            return
+        self._tw = tw = tk.Toplevel(self.widget)
+        tw.wm_overrideredirect(True)
+        tw.wm_withdraw()
+
+        self._text = text_widget = tk.Text(tw, wrap=tk.WORD, relief=tk.SOLID, borderwidth=1,
+                                           font=self._font, bg=COLORS["tooltip_bg"])
+        # Configure text tags for different colors
+        text_widget.tag_configure("green", foreground=COLORS["true"])
+        text_widget.tag_configure("red", foreground=COLORS["false"])
+        text_widget.tag_configure("gray", foreground=COLORS["na"])
+        text_widget.pack(ipadx=5, ipady=3)
+
     def showtip(self, text, x, y):
         """Show tooltip at specified position with given text"""
-        # Avoid recreating tooltip if content hasn't changed
+        # Avoid refilling tooltip if content hasn't changed
         if text == self.current_content and self.tipwindow:
             self.tipwindow.wm_geometry(f"+{int(x)}+{int(y)}")
             return
@@ -49,23 +82,15 @@ class EnhancedToolTip:
         if not text:
             return
 
+        self._ensure_window()
         self.current_content = text
         screen_width = self.widget.winfo_screenwidth()
         screen_height = self.widget.winfo_screenheight()
 
-        self.tipwindow = tw = tk.Toplevel(self.widget)
-        tw.wm_overrideredirect(True)
-        
-        # Calculate dynamic width and height based on the text
-        import tkinter.font as tkfont
-        import textwrap
-
         # Calculate dynamic width based on text
-        font_obj = tkfont.Font(font=("Palatino Linotype", 14))
         lines = text.split('\n')
-        max_line_width = max(font_obj.measure(line) for line in lines) if lines else 0
-        avg_char_width = font_obj.measure("0")
-        calculated_width = max(int(max_line_width / avg_char_width) + 2, 20)
+        max_line_width = max(self._font.measure(line) for line in lines) if lines else 0
+        calculated_width = max(int(max_line_width / self._avg_char) + 2, 20)
         max_width_chars = 60
         width_chars = min(calculated_width, max_width_chars)
 
@@ -80,15 +105,9 @@ class EnhancedToolTip:
         # Now compute height based on the wrapped text
         height_lines = len(wrapped_lines) + 2
 
-        # Create text widget with computed dimensions
-        text_widget = tk.Text(tw, wrap=tk.WORD, width=width_chars, height=height_lines,
-                              relief=tk.SOLID, borderwidth=1,
-                              font=("Palatino Linotype", 14), bg=COLORS["tooltip_bg"])
-        
-        # Configure text tags for different colors
-        text_widget.tag_configure("green", foreground=COLORS["true"])
-        text_widget.tag_configure("red", foreground=COLORS["false"])
-        text_widget.tag_configure("gray", foreground=COLORS["na"])
+        text_widget = self._text
+        text_widget.config(state=tk.NORMAL, width=width_chars, height=height_lines)
+        text_widget.delete("1.0", tk.END)
 
         # Insert text and apply tags
         for i, line in enumerate(lines):
@@ -112,8 +131,8 @@ class EnhancedToolTip:
                     start_idx = line.find(word, start_idx + 1)
 
         text_widget.config(state=tk.DISABLED)  # Make read-only
-        text_widget.pack(ipadx=5, ipady=3)
-        
+
+        self.tipwindow = tw = self._tw
         tw.update_idletasks()
         tw_width = tw.winfo_reqwidth()
         tw_height = tw.winfo_reqheight()
@@ -125,11 +144,12 @@ class EnhancedToolTip:
             y = screen_height - tw_height - 10
 
         tw.wm_geometry(f"+{int(x)}+{int(y)}")
+        tw.wm_deiconify()
 
     def hidetip(self):
         """Hide the tooltip"""
         if self.tipwindow:
-            self.tipwindow.destroy()
+            self.tipwindow.wm_withdraw()
             self.tipwindow = None
             self.current_content = None
 
@@ -383,12 +403,11 @@ class TableViewer:
                 value = comparisons.get(pid, "No relevant details found.")
                 
                 # Add visual indicators for boolean values with enhanced visibility
-                if isinstance(value, str) and "N/A" in value.split():
-                    value = "⚪"  # Circle for N/A
-                elif isinstance(value, str) and "true" in value.split():
-                    value = "✓"
-                elif isinstance(value, str) and "false" in value.split():
-                    value = "✗"
+                if isinstance(value, str):
+                    for pattern, indicator in CELL_INDICATORS:
+                        if pattern.search(value):
+                            value = indicator
+                            break
                 elif value is True:
                     value = "✓"  # Checkmark
                 elif value is False:
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import os
+from supabase import AsyncClient, acreate_client
+from dotenv import load_dotenv
+from .paper_repository import _decode_chunk_embeddings
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class AsyncPaperRepository:
+    """
+    Read-side counterpart of PaperRepository built on supabase's AsyncClient,
+    so independent lookups can run concurrently on the event loop.
+    """
+    _client: AsyncClient = None
+    _client_lock = asyncio.Lock()
+    # In-flight paper lookups, so concurrent requests for one semantic_id share a single query
+    _paper_flights: dict[str, asyncio.Future] = {}
+
+    async def _get_client(self) -> AsyncClient:
+        # The async client can only be created inside a running loop, so it is built on first use
+        if AsyncPaperRepository._client is None:
+            async with AsyncPaperRepository._client_lock:
+                if AsyncPaperRepository._client is None:
+                    url = os.getenv("SUPABASE_URL")
+                    key = os.getenv("SUPABASE_KEY")
+                    if not url or not key:
+                        raise ValueError("Missing SUPABASE_URL or SUPABASE_KEY in environment variables.")
+                    AsyncPaperRepository._client = await acreate_client(url, key)
+        return AsyncPaperRepository._client
+
+    async def get_paper_by_semantic_id(self, semantic_id: str) -> dict:
+        """
+        Retrieve a paper by its semantic_id.
+        Concurrent calls for the same semantic_id await the first caller's query instead of issuing their own.
+        """
+        flight = AsyncPaperRepository._paper_flights.get(semantic_id)
+        if flight is not None:
+            return await asyncio.shield(flight)
+
+        flight = asyncio.get_running_loop().create_future()
+        AsyncPaperRepository._paper_flights[semantic_id] = flight
+        try:
+            paper = await self._fetch_paper(semantic_id)
+            flight.set_result(paper)
+            return paper
+        except Exception as e:
+            flight.set_exception(e)
+            # Mark the exception as retrieved when no other caller was waiting on it
+            flight.exception()
+            raise
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        finally:
+            del AsyncPaperRepository._paper_flights[semantic_id]
+
+    async def _fetch_paper(self, semantic_id: str) -> dict:
+        try:
+            client = await self._get_client()
+            response = await client.table("papers").select("*").eq("semantic_id", semantic_id).limit(1).maybe_single().execute()
+            logger.info("Retrieved paper %s", semantic_id)
+            return response.data if response else None
+        except Exception as e:
+            logger.error("Error getting paper %s: %s", semantic_id, e)
+            raise
+
+    async def get_chunks_by_semantic_id(self, semantic_id: str) -> list:
+        """
+        Retrieve all chunks for a given paper, with embeddings decoded into float32 NumPy arrays.
+        """
+        try:
+            client = await self._get_client()
+            response = await client.table("paper_chunks").select("*").eq("semantic_id", semantic_id).execute()
+            logger.info("Retrieved chunks for paper %s", semantic_id)
+            return _decode_chunk_embeddings(response.data)
+        except Exception as e:
+            logger.error("Error getting chunks for paper %s: %s", semantic_id, e)
+            raise
+
+    async def get_paper_comparison_by_semantic_id(self, semantic_id: str, criterion_generation_strategy: str, content_generation_strategy: str) -> dict:
+        """
+        Retrieve the comparison columns for a given paper.
+        """
+        try:
+            client = await self._get_client()
+            response = await client.table("paper_comparisons").select("comparison_data") \
+                .eq("semantic_id", semantic_id) \
+                .eq("criterion_generation_strategy", criterion_generation_strategy) \
+                .eq("content_generation_strategy", content_generation_strategy) \
+                .limit(1) \
+                .maybe_single() \
+                .execute()
+            logger.info("Retrieved paper comparison for %s", semantic_id)
+            return response.data if response else None
+        except Exception as e:
+            logger.error("Error getting paper comparison for %s: %s", semantic_id, e)
+            raise
+
+    async def get_paper_bundle(self, semantic_id: str, criterion_generation_strategy: str, content_generation_strategy: str) -> dict:
+        """
+        Retrieve a paper, its chunks and its stored comparison concurrently.
+        The three requests overlap, so the bundle costs one round-trip of wall time instead of three.
+        """
+        paper, chunks, comparison = await asyncio.gather(
+            self.get_paper_by_semantic_id(semantic_id),
+            self.get_chunks_by_semantic_id(semantic_id),
+            self.get_paper_comparison_by_semantic_id(semantic_id, criterion_generation_strategy, content_generation_strategy)
+        )
+        return {"paper": paper, "chunks": chunks, "comparison": comparison}
@@ -1,8 +1,11 @@
 import os
 import time
 import logging
-from supabase import create_client, Client
+from supabase import Client
+from database import init_supabase_client
 from paper_search.semantic_scholar import process_and_cite_paper
+from comparison_table_generation.paper_utils import convert_pgvector
+from repository.read_cache import TTLCache, invalidate_request_cache, memoize, request_scoped, single_flight
 
 # ----------------------------
 # Logging Configuration
@@ -17,13 +20,48 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-SUPABASE_URL = os.getenv("SUPABASE_URL", "https://your-supabase-url.supabase.co")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY", "your-supabase-api-key")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Columns needed to display a paper in the citation graph
+PAPER_HEADER_COLUMNS = "semantic_id,title,year,venue"
+
+# Shared by every repository: paper, summary and comparison rows are re-read often during graph traversal
+_read_cache = TTLCache(maxsize=10_000, ttl=300)
+
+def cache_stats() -> dict:
+    """
+    Size and hit rate of the repository read cache.
+    """
+    return _read_cache.stats()
+
+def _invalidate_cached(name: str, semantic_id: str):
+    # Drop the entries from both the shared cache and the current request's cache
+    _read_cache.invalidate(name, semantic_id)
+    invalidate_request_cache(name, semantic_id)
+
+def _decode_chunk_embeddings(chunks: list) -> list:
+    # PostgREST serializes vector columns as "[x,y,...]" text, so decode them once here
+    for chunk in chunks:
+        if isinstance(chunk.get("embedding"), str):
+            chunk["embedding"] = convert_pgvector(chunk["embedding"])
+    return chunks
 
 class PaperRepository:
-    def __init__(self):
-        self.client = supabase
+    def __init__(self, client: Client = None):
+        # Every repository shares the process-wide Supabase client, so all calls
+        # reuse its keep-alive HTTP connections instead of opening their own
+        self.client = client or init_supabase_client()
+
+    def _insert_in_batches(self, table: str, rows: list, batch_size: int) -> list:
+        # One multi-row INSERT per batch instead of one request per row
+        created = []
+        for start in range(0, len(rows), batch_size):
+            response = self.client.table(table).insert(rows[start:start + batch_size]).execute()
+            created.extend(response.data)
+        return created
+
+    def _invalidate_paper(self, semantic_id: str):
+        _invalidate_cached("get_paper_by_semantic_id", semantic_id)
+        _invalidate_cached("get_paper_summary_by_semantic_id", semantic_id)
+        _invalidate_cached("get_paper_header", semantic_id)
 
     # ----- Papers CRUD -----
     def create_paper(self, paper: dict) -> dict:
@@ -33,10 +71,39 @@ class PaperRepository:
         """
         try:
             response = self.client.table("papers").insert(paper).execute()
-            logger.info(f"Created paper: {paper.get('semantic_id')} - {paper.get('title')}")
+            logger.info("Created paper: %s - %s", paper.get('semantic_id'), paper.get('title'))
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error creating paper: {e}")
+            logger.error("Error creating paper: %s", e)
+            raise
+
+    def upsert_paper(self, paper: dict, ignore_duplicates: bool = False) -> dict:
+        """
+        Insert a paper, or update the stored row with the same semantic_id, in one request.
+        With ignore_duplicates, an existing row is left untouched and None is returned.
+        """
+        try:
+            response = self.client.table("papers") \
+                .upsert(paper, on_conflict="semantic_id", ignore_duplicates=ignore_duplicates) \
+                .execute()
+            self._invalidate_paper(paper.get("semantic_id"))
+            logger.info("Upserted paper: %s - %s", paper.get('semantic_id'), paper.get('title'))
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error("Error upserting paper: %s", e)
+            raise
+
+    def create_papers(self, papers: list, batch_size: int = 500) -> list:
+        """
+        Insert many paper records into the papers table, one request per batch_size rows.
+        Expected keys per paper: as for create_paper.
+        """
+        try:
+            created = self._insert_in_batches("papers", papers, batch_size)
+            logger.info("Created %s papers", len(created))
+            return created
+        except Exception as e:
+            logger.error("Error creating papers: %s", e)
             raise
 
     def get_all_papers(self) -> dict:
@@ -48,31 +115,60 @@ class PaperRepository:
             logger.info("Retrieved all papers")
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error getting all papers: {e}")
+            logger.error("Error getting all papers: %s", e)
             raise
 
+    @request_scoped
+    @memoize(_read_cache)
+    @single_flight
     def get_paper_by_semantic_id(self, semantic_id: str) -> dict:
         """
-        Retrieve a paper by its semantic_id.
+        Retrieve a paper by its semantic_id. Backed by get_paper in repository/sql/hot_getters.sql.
         """
         try:
-            response = self.client.table("papers").select("*").eq("semantic_id", semantic_id).execute()
-            logger.info(f"Retrieved paper {semantic_id}")
-            return response.data[0] if response.data else None
+            response = self.client.rpc("get_paper", {"sid": semantic_id}).execute()
+            logger.info("Retrieved paper %s", semantic_id)
+            return response.data
+        except Exception as e:
+            logger.error("Error getting paper %s: %s", semantic_id, e)
+            raise
+
+    @request_scoped
+    @memoize(_read_cache)
+    def get_paper_header(self, semantic_id: str) -> dict:
+        """
+        Retrieve only the semantic_id, title, year and venue of a paper, e.g. to build graph nodes.
+        """
+        try:
+            response = self.client.table("papers").select(PAPER_HEADER_COLUMNS).eq("semantic_id", semantic_id).limit(1).maybe_single().execute()
+            logger.info("Retrieved paper header %s", semantic_id)
+            return response.data if response else None
+        except Exception as e:
+            logger.error("Error getting paper header %s: %s", semantic_id, e)
+            raise
+
+    def paper_exists(self, semantic_id: str) -> bool:
+        """
+        Check whether a paper is stored. Only the match count is returned, in a header, with no row body.
+        """
+        try:
+            response = self.client.table("papers").select("semantic_id", count="exact", head=True).eq("semantic_id", semantic_id).execute()
+            return bool(response.count)
         except Exception as e:
-            logger.error(f"Error getting paper {semantic_id}: {e}")
+            logger.error("Error checking for paper %s: %s", semantic_id, e)
             raise
 
     def get_paper_by_title(self, title: str) -> dict:
         """
-        Retrieve a paper by its title.
+        Retrieve a paper by its title (case-insensitive). Served by the trigram index in
+        repository/sql/papers_title_trgm.sql.
         """
         try:
-            response = self.client.table("papers").select("*").ilike("title", title).execute()
-            logger.info(f"Retrieved paper with title {title}")
-            return response.data[0] if response.data else None
+            response = self.client.table("papers").select("*").ilike("title", title).limit(1).maybe_single().execute()
+            logger.info("Retrieved paper with title %s", title)
+            return response.data if response else None
         except Exception as e:
-            logger.error(f"Error getting paper with title {title}: {e}")
+            logger.error("Error getting paper with title %s: %s", title, e)
             raise
 
     def update_paper_by_semantic_id(self, semantic_id: str, updated_fields: dict) -> dict:
@@ -81,10 +177,12 @@ class PaperRepository:
         """
         try:
             response = self.client.table("papers").update(updated_fields).eq("semantic_id", semantic_id).execute()
-            logger.info(f"Updated paper {semantic_id} with {updated_fields}")
+            self._invalidate_paper(semantic_id)
+            logger.info("Updated paper %s", semantic_id)
+            logger.debug("Updated fields for paper %s: %s", semantic_id, updated_fields)
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error updating paper {semantic_id}: {e}")
+            logger.error("Error updating paper %s: %s", semantic_id, e)
             raise
 
     def delete_paper_by_semantic_id(self, semantic_id: str) -> dict:
@@ -93,10 +191,11 @@ class PaperRepository:
         """
         try:
             response = self.client.table("papers").delete().eq("semantic_id", semantic_id).execute()
-            logger.info(f"Deleted paper {semantic_id}")
+            self._invalidate_paper(semantic_id)
+            logger.info("Deleted paper %s", semantic_id)
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error deleting paper {semantic_id}: {e}")
+            logger.error("Error deleting paper %s: %s", semantic_id, e)
             raise
 
     # ----- Citations CRUD -----
@@ -108,10 +207,38 @@ class PaperRepository:
         """
         try:
             response = self.client.table("citations").insert(citation).execute()
-            logger.info(f"Created citation: {citation.get('source_paper_id')} -> {citation.get('cited_paper_id')}")
+            logger.info("Created citation: %s -> %s", citation.get('source_paper_id'), citation.get('cited_paper_id'))
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error creating citation: {e}")
+            logger.error("Error creating citation: %s", e)
+            raise
+
+    def upsert_citation(self, citation: dict, ignore_duplicates: bool = False) -> dict:
+        """
+        Insert a citation, or update the stored row for the same source and cited paper, in one request.
+        With ignore_duplicates, an existing row is left untouched and None is returned.
+        """
+        try:
+            response = self.client.table("citations") \
+                .upsert(citation, on_conflict="source_paper_id,cited_paper_id", ignore_duplicates=ignore_duplicates) \
+                .execute()
+            logger.info("Upserted citation: %s -> %s", citation.get('source_paper_id'), citation.get('cited_paper_id'))
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error("Error upserting citation: %s", e)
+            raise
+
+    def create_citations(self, citations: list, batch_size: int = 1000) -> list:
+        """
+        Insert many citation records into the citations table, one request per batch_size rows.
+        Expected keys per citation: source_paper_id, cited_paper_id.
+        """
+        try:
+            created = self._insert_in_batches("citations", citations, batch_size)
+            logger.info("Created %s citations", len(created))
+            return created
+        except Exception as e:
+            logger.error("Error creating citations: %s", e)
             raise
 
     def get_citations_by_source(self, source_paper_id: str) -> dict:
@@ -120,10 +247,10 @@ class PaperRepository:
         """
         try:
             response = self.client.table("citations").select("*").eq("source_paper_id", source_paper_id).execute()
-            logger.info(f"Retrieved citations for source paper {source_paper_id}")
+            logger.info("Retrieved citations for source paper %s", source_paper_id)
             return response.data
         except Exception as e:
-            logger.error(f"Error getting citations for {source_paper_id}: {e}")
+            logger.error("Error getting citations for %s: %s", source_paper_id, e)
             raise
 
     def update_citation_by_source_and_cited(self, source_paper_id: str, cited_paper_id: str, updated_fields: dict) -> dict:
@@ -136,10 +263,11 @@ class PaperRepository:
                 .eq("source_paper_id", source_paper_id) \
                 .eq("cited_paper_id", cited_paper_id) \
                 .execute()
-            logger.info(f"Updated citation {source_paper_id} -> {cited_paper_id} with {updated_fields}")
+            logger.info("Updated citation %s -> %s", source_paper_id, cited_paper_id)
+            logger.debug("Updated fields for citation %s -> %s: %s", source_paper_id, cited_paper_id, updated_fields)
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error updating citation {source_paper_id} -> {cited_paper_id}: {e}")
+            logger.error("Error updating citation %s -> %s: %s", source_paper_id, cited_paper_id, e)
             raise
 
     def delete_citation_by_source_and_cited(self, source_paper_id: str, cited_paper_id: str) -> dict:
@@ -152,10 +280,10 @@ class PaperRepository:
                 .eq("source_paper_id", source_paper_id) \
                 .eq("cited_paper_id", cited_paper_id) \
                 .execute()
-            logger.info(f"Deleted citation {source_paper_id} -> {cited_paper_id}")
+            logger.info("Deleted citation %s -> %s", source_paper_id, cited_paper_id)
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error deleting citation {source_paper_id} -> {cited_paper_id}: {e}")
+            logger.error("Error deleting citation %s -> %s: %s", source_paper_id, cited_paper_id, e)
             raise
 
     # ----- Relations CRUD -----
@@ -166,10 +294,57 @@ class PaperRepository:
         """
         try:
             response = self.client.table("relations").insert(relation).execute()
-            logger.info(f"Created relation: {relation.get('source_paper_id')} -> {relation.get('target_paper_id')}")
+            logger.info("Created relation: %s -> %s", relation.get('source_paper_id'), relation.get('target_paper_id'))
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error("Error creating relation: %s", e)
+            raise
+
+    def upsert_relation(self, relation: dict, ignore_duplicates: bool = False) -> dict:
+        """
+        Insert a relation, or update the stored row for the same source and target paper, in one request.
+        With ignore_duplicates, an existing row is left untouched and None is returned.
+        """
+        try:
+            response = self.client.table("relations") \
+                .upsert(relation, on_conflict="source_paper_id,target_paper_id", ignore_duplicates=ignore_duplicates) \
+                .execute()
+            logger.info("Upserted relation: %s -> %s", relation.get('source_paper_id'), relation.get('target_paper_id'))
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error creating relation: {e}")
+            logger.error("Error upserting relation: %s", e)
+            raise
+
+    def fetch_or_insert_relation(self, source_paper_id: str, target_paper_id: str) -> dict:
+        """
+        Retrieve the relation for a source and target paper, creating it with null fields if missing, in one request.
+        The row carries an extra "inserted" flag, true when this call created it.
+        Backed by repository/sql/fetch_or_insert_relation.sql.
+        """
+        try:
+            response = self.client.rpc("fetch_or_insert_relation", {"source_id": source_paper_id, "target_id": target_paper_id}).execute()
+            logger.info("Fetched or inserted relation %s -> %s", source_paper_id, target_paper_id)
+            return response.data
+        except Exception as e:
+            logger.error("Error fetching or inserting relation %s -> %s: %s", source_paper_id, target_paper_id, e)
+            raise
+
+    def upsert_relations(self, relations: list, batch_size: int = 1000) -> list:
+        """
+        Insert or update many relation records, one request per batch_size rows.
+        Only the columns present in the rows are written on conflict, e.g. just relevance_score.
+        """
+        try:
+            upserted = []
+            for start in range(0, len(relations), batch_size):
+                response = self.client.table("relations") \
+                    .upsert(relations[start:start + batch_size], on_conflict="source_paper_id,target_paper_id") \
+                    .execute()
+                upserted.extend(response.data)
+            logger.info("Upserted %s relations", len(upserted))
+            return upserted
+        except Exception as e:
+            logger.error("Error upserting relations: %s", e)
             raise
 
     def get_relations_by_source(self, source_paper_id: str) -> dict:
@@ -178,25 +353,23 @@ class PaperRepository:
         """
         try:
             response = self.client.table("relations").select("*").eq("source_paper_id", source_paper_id).execute()
-            logger.info(f"Retrieved relations for source paper {source_paper_id}")
+            logger.info("Retrieved relations for source paper %s", source_paper_id)
             return response.data
         except Exception as e:
-            logger.error(f"Error getting relations for {source_paper_id}: {e}")
+            logger.error("Error getting relations for %s: %s", source_paper_id, e)
             raise
 
     def get_relation_by_source_and_target(self, source_paper_id: str, target_paper_id: str) -> dict:
         """
         Retrieve relation records for a given source paper and target paper.
+        Backed by get_relation in repository/sql/hot_getters.sql.
         """
         try:
-            response = self.client.table("relations").select("*") \
-                .eq("source_paper_id", source_paper_id) \
-                .eq("target_paper_id", target_paper_id) \
-                .execute()
-            logger.info(f"Retrieved relations for {source_paper_id} -> {target_paper_id}")
-            return response.data[0] if response.data else None
+            response = self.client.rpc("get_relation", {"source_id": source_paper_id, "target_id": target_paper_id}).execute()
+            logger.info("Retrieved relations for %s -> %s", source_paper_id, target_paper_id)
+            return response.data
         except Exception as e:
-            logger.error(f"Error getting relations for {source_paper_id} and {target_paper_id}: {e}")
+            logger.error("Error getting relations for %s and %s: %s", source_paper_id, target_paper_id, e)
             raise
 
     def update_relation_by_source_and_target(self, source_paper_id: str, target_paper_id: str, updated_fields: dict) -> dict:
@@ -208,10 +381,11 @@ class PaperRepository:
                 .eq("source_paper_id", source_paper_id) \
                 .eq("target_paper_id", target_paper_id) \
                 .execute()
-            logger.info(f"Updated relation {source_paper_id} -> {target_paper_id} with {updated_fields}")
+            logger.info("Updated relation %s -> %s", source_paper_id, target_paper_id)
+            logger.debug("Updated fields for relation %s -> %s: %s", source_paper_id, target_paper_id, updated_fields)
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error updating relation {source_paper_id} -> {target_paper_id}: {e}")
+            logger.error("Error updating relation %s -> %s: %s", source_paper_id, target_paper_id, e)
             raise
 
     def delete_relation_by_source_and_target(self, source_paper_id: str, target_paper_id: str) -> dict:
@@ -223,32 +397,30 @@ class PaperRepository:
                 .eq("source_paper_id", source_paper_id) \
                 .eq("target_paper_id", target_paper_id) \
                 .execute()
-            logger.info(f"Deleted relation {source_paper_id} -> {target_paper_id}")
+            logger.info("Deleted relation %s -> %s", source_paper_id, target_paper_id)
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error deleting relation {source_paper_id} -> {target_paper_id}: {e}")
+            logger.error("Error deleting relation %s -> %s: %s", source_paper_id, target_paper_id, e)
             raise
 
-    def get_cited_papers(self, source_paper_id: str) -> dict:
+    def get_cited_papers(self, source_paper_id: str) -> list:
         """
         Retrieve all cited papers for a given source paper.
         This method queries the citations table for records with the given source_paper_id,
-        then fetches the corresponding paper details for each cited paper.
-        Returns a dictionary with the list of cited papers.
+        embedding the corresponding paper details in the same request.
+        Returns the list of cited papers.
         """
         try:
-            response = self.client.table("citations").select("cited_paper_id").eq("source_paper_id", source_paper_id).execute()
-            logger.info(f"Retrieved citations for source paper {source_paper_id}")
-            cited_papers = []
-            for citation in response.get("data", []):
-                cited_id = citation.get("cited_paper_id")
-                paper_response = self.get_paper_by_semantic_id(cited_id)
-                # If the paper exists, add its details to the list.
-                if paper_response.get("data"):
-                    cited_papers.append(paper_response.get("data")[0])
-            return cited_papers
+            # Each citation row embeds its cited paper through the citations -> papers foreign key,
+            # so a single request returns the paper details
+            response = self.client.table("citations") \
+                .select("cited_paper_id, papers!cited_paper_id(*)") \
+                .eq("source_paper_id", source_paper_id) \
+                .execute()
+            logger.info("Retrieved cited papers for source paper %s", source_paper_id)
+            return [citation["papers"] for citation in response.data if citation.get("papers")]
         except Exception as e:
-            logger.error(f"Error getting cited papers for {source_paper_id}: {e}")
+            logger.error("Error getting cited papers for %s: %s", source_paper_id, e)
             raise
 
     def get_citations_by_cited(self, cited_paper_id: str) -> dict:
@@ -257,31 +429,29 @@ class PaperRepository:
         """
         try:
             response = self.client.table("citations").select("*").eq("cited_paper_id", cited_paper_id).execute()
-            logger.info(f"Retrieved citations for cited paper {cited_paper_id}")
+            logger.info("Retrieved citations for cited paper %s", cited_paper_id)
             return response.data
         except Exception as e:
-            logger.error(f"Error getting citations for {cited_paper_id}: {e}")
+            logger.error("Error getting citations for %s: %s", cited_paper_id, e)
 
-    def get_citing_papers(self, cited_paper_id: str) -> dict:
+    def get_citing_papers(self, cited_paper_id: str) -> list:
         """
         Retrieve all citing papers for a given cited paper.
         This method queries the citations table for records with the given cited_paper_id,
-        then fetches the corresponding paper details for each source paper.
-        Returns a dictionary with the list of citing papers.
+        embedding the corresponding paper details in the same request.
+        Returns the list of citing papers.
         """
         try:
-            response = self.client.table("citations").select("source_paper_id").eq("cited_paper_id", cited_paper_id).execute()
-            logger.info(f"Retrieved citations for cited paper {cited_paper_id}")
-            citing_papers = []
-            for citation in response.get("data", []):
-                source_id = citation.get("source_paper_id")
-                paper_response = self.get_paper_by_semantic_id(source_id)
-                # If the paper exists, add its details to the list.
-                if paper_response.get("data"):
-                    citing_papers.append(paper_response.get("data")[0])
-            return citing_papers
+            # Each citation row embeds its source paper through the citations -> papers foreign key,
+            # so a single request returns the paper details
+            response = self.client.table("citations") \
+                .select("source_paper_id, papers!source_paper_id(*)") \
+                .eq("cited_paper_id", cited_paper_id) \
+                .execute()
+            logger.info("Retrieved citing papers for cited paper %s", cited_paper_id)
+            return [citation["papers"] for citation in response.data if citation.get("papers")]
         except Exception as e:
-            logger.error(f"Error getting citing papers for {cited_paper_id}: {e}")
+            logger.error("Error getting citing papers for %s: %s", cited_paper_id, e)
             raise
 
     def process_and_cite_paper(self, start_paper_id: str):
@@ -293,35 +463,88 @@ class PaperRepository:
             process_and_cite_paper(start_paper_id, self.client)
             logger.info("Processing complete.")
         except Exception as e:
-            logger.error(f"Error processing paper {start_paper_id}: {e}")
+            logger.error("Error processing paper %s: %s", start_paper_id, e)
             raise
 
+    @request_scoped
+    @memoize(_read_cache)
     def get_paper_summary_by_semantic_id(self, semantic_id: str, strategy: str) -> dict:
         """
         Retrieve the summary columns for a given paper.
+        Backed by get_paper_summary in repository/sql/hot_getters.sql.
         """
 
         try:
-            response = self.client.table("papers").select("summary").eq("semantic_id", semantic_id).eq("strategy", strategy).execute()
-            logger.info(f"Retrieved paper summary for {semantic_id}")
-            return response.data[0] if response.data else None
+            response = self.client.rpc("get_paper_summary", {"sid": semantic_id, "summary_strategy": strategy}).execute()
+            logger.info("Retrieved paper summary for %s", semantic_id)
+            return response.data
         except Exception as e:
-            logger.error(f"Error getting paper summary for {semantic_id}: {e}")
+            logger.error("Error getting paper summary for %s: %s", semantic_id, e)
             raise
 
     def get_chunks_by_semantic_id(self, semantic_id: str) -> dict:
         """
         Retrieve all chunks for a given paper.
+        Embeddings are returned as float32 NumPy arrays rather than pgvector text.
         """
 
         try:
             response = self.client.table("paper_chunks").select("*").eq("semantic_id", semantic_id).execute()
-            logger.info(f"Retrieved chunks for paper {semantic_id}")
-            return response.data
+            logger.info("Retrieved chunks for paper %s", semantic_id)
+            return _decode_chunk_embeddings(response.data)
         except Exception as e:
-            logger.error(f"Error getting chunks for paper {semantic_id}: {e}")
+            logger.error("Error getting chunks for paper %s: %s", semantic_id, e)
             raise
     
+    def get_chunks_by_semantic_ids(self, semantic_ids: list) -> dict:
+        """
+        Retrieve the chunks of several papers with a single request, grouped by semantic_id.
+        Every requested ID is present in the result, mapped to an empty list if it has no chunks.
+        """
+
+        try:
+            response = self.client.table("paper_chunks").select("*").in_("semantic_id", list(semantic_ids)).execute()
+            logger.info("Retrieved chunks for %s papers", len(semantic_ids))
+            chunks_by_paper = {semantic_id: [] for semantic_id in semantic_ids}
+            for chunk in _decode_chunk_embeddings(response.data):
+                chunks_by_paper.setdefault(chunk["semantic_id"], []).append(chunk)
+            return chunks_by_paper
+        except Exception as e:
+            logger.error("Error getting chunks for papers %s: %s", semantic_ids, e)
+            raise
+
+    def top_k_chunks(self, query_embedding, k: int, semantic_id: str = None) -> list:
+        """
+        Retrieve the k chunks nearest to query_embedding by cosine distance, using the HNSW index across all papers.
+        Restricted to one paper, and ranked exactly, when semantic_id is given. Backed by repository/sql/match_paper_chunks.sql.
+        """
+
+        try:
+            response = self.client.rpc("match_paper_chunks", {
+                "query_embedding": [float(x) for x in query_embedding],
+                "match_count": k,
+                "paper_id": semantic_id
+            }).execute()
+            logger.info("Retrieved top %s chunks for %s", k, semantic_id or 'all papers')
+            return _decode_chunk_embeddings(response.data)
+        except Exception as e:
+            logger.error("Error retrieving top %s chunks for %s: %s", k, semantic_id or 'all papers', e)
+            raise
+
+    def get_paper_similarity(self, semantic_id_a: str, semantic_id_b: str) -> dict:
+        """
+        Compute the mean-embedding and pairwise chunk similarity of two papers inside Postgres.
+        Backed by the paper_chunk_similarity function in repository/sql/paper_chunk_similarity.sql.
+        """
+
+        try:
+            response = self.client.rpc("paper_chunk_similarity", {"paper_a": semantic_id_a, "paper_b": semantic_id_b}).execute()
+            logger.info("Computed chunk similarity for %s and %s", semantic_id_a, semantic_id_b)
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error("Error computing chunk similarity for %s and %s: %s", semantic_id_a, semantic_id_b, e)
+            raise
+
     def create_chunk(self, chunk: dict) -> dict:
         """
         Insert a new chunk record into the paper_chunks table.
@@ -329,10 +552,23 @@ class PaperRepository:
         """
         try:
             response = self.client.table("paper_chunks").insert(chunk).execute()
-            logger.info(f"Created chunk for paper {chunk.get('semantic_id')}")
+            logger.info("Created chunk for paper %s", chunk.get('semantic_id'))
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error creating chunk: {e}")
+            logger.error("Error creating chunk: %s", e)
+            raise
+
+    def create_chunks(self, chunks: list, batch_size: int = 500) -> list:
+        """
+        Insert many chunk records into the paper_chunks table, one request per batch_size rows.
+        Expected keys per chunk: semantic_id, section_title, chunk_text, embedding.
+        """
+        try:
+            created = self._insert_in_batches("paper_chunks", chunks, batch_size)
+            logger.info("Created %s chunks", len(created))
+            return created
+        except Exception as e:
+            logger.error("Error creating chunks: %s", e)
             raise
 
     def create_paper_comparison(self, paper_comparison: dict) -> dict:
@@ -342,12 +578,49 @@ class PaperRepository:
         """
         try:
             response = self.client.table("paper_comparisons").insert(paper_comparison).execute()
-            logger.info(f"Created comparison for paper")
+            _invalidate_cached("get_paper_comparison_by_semantic_id", paper_comparison.get("semantic_id"))
+            logger.info("Created comparison for paper")
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error creating comparison: {e}")
+            logger.error("Error creating comparison: %s", e)
             raise
 
+    def get_paper_comparison_by_key(self, comparison_key: str) -> dict:
+        """
+        Retrieve a stored comparison table by its comparison_key.
+        """
+
+        try:
+            response = self.client.table("paper_comparisons").select("comparison_data") \
+            .eq("comparison_key", comparison_key) \
+            .limit(1) \
+            .maybe_single() \
+            .execute()
+            logger.info("Retrieved paper comparison %s", comparison_key)
+            return response.data if response else None
+        except Exception as e:
+            logger.error("Error getting paper comparison %s: %s", comparison_key, e)
+            raise
+
+    def get_unkeyed_paper_comparisons(self, semantic_id: str, criterion_generation_strategy: str, content_generation_strategy: str) -> list:
+        """
+        Retrieve the comparison tables stored for a paper and strategies before comparison_key existed.
+        """
+        try:
+            response = self.client.table("paper_comparisons").select("comparison_data") \
+            .eq("semantic_id", semantic_id) \
+            .eq("criterion_generation_strategy", criterion_generation_strategy) \
+            .eq("content_generation_strategy", content_generation_strategy) \
+            .is_("comparison_key", "null") \
+            .execute()
+            logger.info("Retrieved %s unkeyed paper comparisons for %s", len(response.data), semantic_id)
+            return response.data
+        except Exception as e:
+            logger.error("Error getting unkeyed paper comparisons for %s: %s", semantic_id, e)
+            raise
+
+    @request_scoped
+    @memoize(_read_cache)
     def get_paper_comparison_by_semantic_id(self, semantic_id: str, criterion_generation_strategy: str, content_generation_strategy: str, ) -> dict:
         """
         Retrieve the comparison columns for a given paper.
@@ -358,9 +631,11 @@ class PaperRepository:
             .eq("semantic_id", semantic_id) \
             .eq("criterion_generation_strategy", criterion_generation_strategy) \
             .eq("content_generation_strategy", content_generation_strategy) \
+            .limit(1) \
+            .maybe_single() \
             .execute()
-            logger.info(f"Retrieved paper comparison for {semantic_id}")
-            return response.data[0] if response.data else None
+            logger.info("Retrieved paper comparison for %s", semantic_id)
+            return response.data if response else None
         except Exception as e:
-            logger.error(f"Error getting paper comparison for {semantic_id}: {e}")
+            logger.error("Error getting paper comparison for %s: %s", semantic_id, e)
             raise
\ No newline at end of file
@@ -0,0 +1,210 @@
+import contextlib
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+
+
+class TTLCache:
+    """
+    Bounded in-process cache whose entries expire ttl seconds after being stored.
+    When full, the least recently used entry is evicted. Safe to share between threads.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Return (True, value) for a live entry, otherwise (False, None).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, name: str, first_arg):
+        """
+        Drop every entry cached for the function called name whose first argument is first_arg.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == name and key[1] == first_arg]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+def _call_key(signature: inspect.Signature, func, self, args, kwargs) -> tuple:
+    bound = signature.bind(self, *args, **kwargs)
+    bound.apply_defaults()
+    return (func.__name__, *list(bound.arguments.values())[1:])
+
+
+def memoize(cache: TTLCache):
+    """
+    Cache a repository read method in cache, keyed by the method name and its arguments (self excluded).
+    None results are not cached, so a row created later is found on the next call.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            key = _call_key(signature, func, self, args, kwargs)
+            found, value = cache.get(key)
+            if found:
+                return value
+            value = func(self, *args, **kwargs)
+            if value is not None:
+                cache.set(key, value)
+            return value
+
+        return wrapper
+    return decorator
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def single_flight(func):
+    """
+    Coalesce concurrent calls with the same arguments (self excluded): the first caller runs
+    the query and the others wait for its result instead of issuing their own.
+    Place it under @memoize so that only cache misses are coalesced.
+    """
+    signature = inspect.signature(func)
+    flights = {}
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        key = _call_key(signature, func, self, args, kwargs)
+        with lock:
+            flight = flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = func(self, *args, **kwargs)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with lock:
+                del flights[key]
+            flight.done.set()
+
+    return wrapper
+
+
+# Reads made while handling the current request, keyed like the TTL cache; None outside a request
+_request_cache: ContextVar = ContextVar("request_cache", default=None)
+
+
+@contextlib.contextmanager
+def request_cache_scope():
+    """
+    Give the code run inside the block its own read cache, discarded when the block exits.
+    """
+    token = _request_cache.set({})
+    try:
+        yield
+    finally:
+        _request_cache.reset(token)
+
+
+def invalidate_request_cache(name: str, first_arg):
+    """
+    Drop the current request's entries for the function called name whose first argument is first_arg.
+    """
+    cache = _request_cache.get()
+    if cache:
+        for key in [key for key in cache if key[0] == name and key[1] == first_arg]:
+            del cache[key]
+
+
+def request_scoped(func):
+    """
+    Serve repeated calls with the same arguments (self excluded) from the current request's cache,
+    so one request sees a single consistent row per key and never re-fetches it.
+    Outside a request scope the call goes straight through. None results are not cached.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        cache = _request_cache.get()
+        if cache is None:
+            return func(self, *args, **kwargs)
+        key = _call_key(signature, func, self, args, kwargs)
+        if key in cache:
+            return cache[key]
+        value = func(self, *args, **kwargs)
+        if value is not None:
+            cache[key] = value
+        return value
+
+    return wrapper
+
+
+class RequestCacheMiddleware:
+    """
+    ASGI middleware opening a request_cache_scope for every HTTP request and WebSocket session.
+    Sync endpoints run in a worker thread with a copy of the context, which still refers to the same cache.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        with request_cache_scope():
+            await self.app(scope, receive, send)
@@ -0,0 +1,18 @@
+-- Foreign keys from citations to papers, so PostgREST can embed the related
+-- paper rows in a citations query (see get_cited_papers / get_citing_papers).
+-- NOT VALID keeps existing rows that point at papers not yet stored.
+do $$
+begin
+    alter table citations
+        add constraint citations_cited_paper_id_fkey
+        foreign key (cited_paper_id) references papers (semantic_id) not valid;
+exception when duplicate_object then null;
+end $$;
+
+do $$
+begin
+    alter table citations
+        add constraint citations_source_paper_id_fkey
+        foreign key (source_paper_id) references papers (semantic_id) not valid;
+exception when duplicate_object then null;
+end $$;
@@ -0,0 +1,16 @@
+-- Relation row for a source and target paper, created with null fields when missing,
+-- in one statement instead of a lookup followed by an insert.
+-- Called from PaperRepository.fetch_or_insert_relation via supabase.rpc().
+-- The no-op DO UPDATE makes RETURNING yield the existing row on conflict (DO NOTHING
+-- returns nothing); "inserted" is true only when the row was created by this call.
+-- Relies on relations_source_target_key from unique_keys.sql.
+create or replace function fetch_or_insert_relation(source_id text, target_id text)
+returns jsonb
+language sql volatile
+as $$
+    insert into relations as r (source_paper_id, target_paper_id)
+    values (source_id, target_id)
+    on conflict (source_paper_id, target_paper_id)
+        do update set source_paper_id = excluded.source_paper_id
+    returning to_jsonb(r) || jsonb_build_object('inserted', r.xmax = 0);
+$$;
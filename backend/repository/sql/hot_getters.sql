@@ -0,0 +1,31 @@
+-- Single-row lookups behind the hottest PaperRepository getters
+-- (get_paper_by_semantic_id, get_paper_summary_by_semantic_id,
+-- get_relation_by_source_and_target), called via supabase.rpc().
+-- Plain SQL functions, so Postgres caches their plans across calls.
+-- Each returns the row as a JSON object, or null when nothing matches.
+create or replace function get_paper(sid text)
+returns jsonb
+language sql stable
+as $$
+    select to_jsonb(p) from papers p
+    where p.semantic_id = sid
+    limit 1;
+$$;
+
+create or replace function get_paper_summary(sid text, summary_strategy text)
+returns jsonb
+language sql stable
+as $$
+    select jsonb_build_object('summary', p.summary) from papers p
+    where p.semantic_id = sid and p.strategy = summary_strategy
+    limit 1;
+$$;
+
+create or replace function get_relation(source_id text, target_id text)
+returns jsonb
+language sql stable
+as $$
+    select to_jsonb(r) from relations r
+    where r.source_paper_id = source_id and r.target_paper_id = target_id
+    limit 1;
+$$;
@@ -0,0 +1,35 @@
+-- Nearest-neighbour search over chunk embeddings.
+-- Called from PaperRepository.top_k_chunks via supabase.rpc().
+-- Apply paper_chunks_halfvec.sql first: the index and the function below expect the
+-- embedding column to be halfvec(1536).
+create index if not exists paper_chunks_embedding_hnsw
+    on paper_chunks using hnsw (embedding halfvec_cosine_ops);
+
+-- The k chunks closest to query_embedding by cosine distance, best first.
+-- Searches every paper through the HNSW index unless paper_id is given. A paper's chunks are
+-- ranked exactly instead: HNSW only looks at hnsw.ef_search candidates from the whole corpus and
+-- filters by paper afterwards, which would return fewer than k chunks, or none, for most papers.
+-- The materialized CTE keeps the planner from using the index for the per-paper ranking.
+create or replace function match_paper_chunks(query_embedding halfvec(1536), match_count int, paper_id text default null)
+returns setof paper_chunks
+language plpgsql stable
+as $$
+begin
+    if match_paper_chunks.paper_id is null then
+        return query
+            select * from paper_chunks
+            where embedding is not null
+            order by embedding <=> query_embedding
+            limit match_count;
+    else
+        return query
+            with paper as materialized (
+                select * from paper_chunks c
+                where c.semantic_id = match_paper_chunks.paper_id and c.embedding is not null
+            )
+            select * from paper
+            order by paper.embedding <=> query_embedding
+            limit match_count;
+    end if;
+end;
+$$;
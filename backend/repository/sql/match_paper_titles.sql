@@ -0,0 +1,25 @@
+-- Closest stored paper for each of many titles (e.g. the references of a paper),
+-- resolved in one query instead of one title lookup per reference.
+-- Called from paper_search/test.py via supabase.rpc(), to skip searching titles that are already stored.
+-- Returns one row per input title, in input order; paper and similarity are null
+-- when no stored title reaches the 0.3 similarity threshold set below.
+-- The trigram index it relies on is created in papers_title_trgm.sql.
+create extension if not exists pg_trgm;
+
+create or replace function match_paper_titles(titles text[])
+returns table (ord bigint, query text, similarity real, paper jsonb)
+language sql stable
+set pg_trgm.similarity_threshold = 0.3
+as $$
+    select q.ord, q.title, m.sim, m.paper
+    from unnest(titles) with ordinality as q(title, ord)
+    left join lateral (
+        -- % is index-sargable, unlike similarity(...) > threshold
+        select similarity(p.title, q.title) as sim, to_jsonb(p) as paper
+        from papers p
+        where p.title % q.title
+        order by p.title <-> q.title
+        limit 1
+    ) m on true
+    order by q.ord;
+$$;
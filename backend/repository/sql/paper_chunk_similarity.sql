@@ -0,0 +1,26 @@
+-- Similarity between two papers' chunk embeddings, computed next to the data.
+-- Called from PaperRepository.get_paper_similarity via supabase.rpc().
+--   mean_similarity:     cosine similarity of the two papers' mean chunk embeddings
+--   pairwise_similarity: average of each chunk's best match in the other paper, in both directions
+create or replace function paper_chunk_similarity(paper_a text, paper_b text)
+returns table (mean_similarity double precision, pairwise_similarity double precision)
+language sql stable
+as $$
+    with chunks_a as (
+        select id, embedding from paper_chunks
+        where semantic_id = paper_a and embedding is not null
+    ),
+    chunks_b as (
+        select id, embedding from paper_chunks
+        where semantic_id = paper_b and embedding is not null
+    ),
+    pairs as (
+        select a.id as a_id, b.id as b_id, 1 - (a.embedding <=> b.embedding) as similarity
+        from chunks_a a cross join chunks_b b
+    ),
+    best_a as (select max(similarity) as similarity from pairs group by a_id),
+    best_b as (select max(similarity) as similarity from pairs group by b_id)
+    select
+        1 - ((select avg(embedding) from chunks_a) <=> (select avg(embedding) from chunks_b)),
+        ((select avg(similarity) from best_a) + (select avg(similarity) from best_b)) / 2;
+$$;
@@ -0,0 +1,7 @@
+-- Store chunk embeddings at half precision (2 bytes per dimension instead of 4).
+-- text-embedding-3-small vectors lose no ranking quality at fp16, and the
+-- <=> operator and avg() used by paper_chunk_similarity support halfvec natively.
+-- Requires pgvector >= 0.7.0. Clients keep sending and receiving "[x,y,...]" text.
+alter table paper_chunks
+    alter column embedding type halfvec(1536)
+    using embedding::halfvec(1536);
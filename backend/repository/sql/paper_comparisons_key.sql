@@ -0,0 +1,8 @@
+-- Identify a stored comparison table by everything it was generated from:
+-- main paper, the set of baseline papers, and both generation strategies.
+-- Written and looked up by create_comparison_table (see comparison_cache_key).
+-- Existing rows keep a null key (the hash is computed in Python); create_comparison_table
+-- still reuses them through find_unkeyed_comparison, matching on their paper set.
+alter table paper_comparisons add column if not exists comparison_key text;
+create unique index if not exists paper_comparisons_comparison_key
+    on paper_comparisons (comparison_key);
@@ -0,0 +1,9 @@
+-- Trigram index on papers.title. It serves the % filter in match_paper_titles.sql,
+-- which a similarity(title, ...) > threshold predicate never could, and also the
+-- ILIKE in PaperRepository.get_paper_by_title. GIN cannot produce <-> order itself,
+-- so that ordering only sorts the few rows that pass the % filter.
+-- Built concurrently so the papers table stays writable; run it outside a transaction.
+create extension if not exists pg_trgm;
+
+create index concurrently if not exists papers_title_trgm
+    on papers using gin (title gin_trgm_ops);
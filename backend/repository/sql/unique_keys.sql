@@ -0,0 +1,21 @@
+-- Unique keys matching the on_conflict targets of upsert_paper, upsert_citation
+-- and upsert_relation (and the ingestion inserts in semantic_scholar.py).
+-- Existing duplicate rows are removed first, keeping the earliest copy.
+delete from citations a
+    using citations b
+    where a.ctid > b.ctid
+      and a.source_paper_id = b.source_paper_id
+      and a.cited_paper_id = b.cited_paper_id;
+
+delete from relations a
+    using relations b
+    where a.ctid > b.ctid
+      and a.source_paper_id = b.source_paper_id
+      and a.target_paper_id = b.target_paper_id;
+
+create unique index if not exists papers_semantic_id_key
+    on papers (semantic_id);
+create unique index if not exists citations_source_cited_key
+    on citations (source_paper_id, cited_paper_id);
+create unique index if not exists relations_source_target_key
+    on relations (source_paper_id, target_paper_id);
@@ -1,13 +1,15 @@
 from fastapi import APIRouter, HTTPException, Query, WebSocket
 from fastapi.responses import FileResponse
-from backend.services.paper_service import PaperService
-from paper_search.semantic_scholar import search_papers_by_title
+from services.paper_service import PaperService
+from repository.async_paper_repository import AsyncPaperRepository
+from paper_search.semantic_scholar import search_paper_by_title_shared
 import os
 
 router = APIRouter()
 
 # Initialize the service instance
 paper_service = PaperService()
+async_repository = AsyncPaperRepository()
 
 # 1. Get All Papers
 @router.get("/papers/", tags=["Papers"])
@@ -26,13 +28,13 @@ def get_all_papers():
 
 # 2. Get Paper by Title
 @router.get("/papers/search/", tags=["Papers"])
-def search_paper_by_title(title: str = Query(..., description="Paper title to search")):
+async def search_paper_by_title(title: str = Query(..., description="Paper title to search")):
     """
     Retrieve papers by title from semantic scholar. Return top 5 results.
     """
     print("Searching for papers with title:", title)
     try:
-        papers = search_papers_by_title(title, limit=5)
+        papers = await search_paper_by_title_shared(title, limit=5)
         if not papers:
             raise HTTPException(status_code=404, detail=f"No papers found for title '{title}'")
         print(papers.keys())
@@ -59,6 +61,50 @@ def get_paper_by_id(paper_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# 3a. Download a Paper in the Background
+@router.post("/papers/{paper_id}/download/", status_code=202, tags=["Papers"])
+def download_paper(paper_id: str):
+    """
+    Queue the download and record creation for a paper and return immediately with a job id.
+    Poll /jobs/{job_id} for its status.
+    """
+    try:
+        job_id = paper_service.enqueue_paper_download(paper_id)
+        return {"job_id": job_id, "paper_id": paper_id}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{job_id}", tags=["Papers"])
+def get_download_job(job_id: str):
+    """
+    Retrieve the status of a paper download job.
+    """
+    job = paper_service.get_download_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+# 3b. Get a Paper with its Chunks and Stored Comparison
+@router.get("/papers/{paper_id}/details/", tags=["Papers"])
+async def get_paper_details(
+    paper_id: str,
+    criterion_generation_strategy: str = Query("boolean_then_expand + full_table"),
+    content_generation_strategy: str = Query("rag")
+):
+    """
+    Retrieve a paper together with its chunks and its stored comparison table.
+    The three lookups are issued concurrently.
+    """
+    try:
+        bundle = await async_repository.get_paper_bundle(paper_id, criterion_generation_strategy, content_generation_strategy)
+        if not bundle["paper"]:
+            raise HTTPException(status_code=404, detail=f"Paper with ID '{paper_id}' not found")
+        return bundle
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # 4. Exploration Method
 @router.websocket("/papers/{paper_id}/explore/")
 async def explore_paper(
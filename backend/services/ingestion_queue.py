@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class IngestionQueue:
+    """
+    Runs paper ingestion jobs (Semantic Scholar fetch, PDF download, DB writes) on background
+    threads, so request handlers can hand the work off and return a job id immediately.
+    Only one job per paper runs at a time: enqueueing a paper that is already in progress
+    returns the existing job id.
+    Finished jobs stay queryable for job_retention seconds, and at most max_finished_jobs of them are kept.
+    """
+
+    def __init__(self, process_paper, max_workers: int = 2, job_retention: float = 3600, max_finished_jobs: int = 10_000):
+        self._process_paper = process_paper
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion")
+        self._job_retention = job_retention
+        self._max_finished_jobs = max_finished_jobs
+        self._jobs = {}    # job_id -> (paper_id, future)
+        self._active = {}  # paper_id -> job_id of its unfinished job
+        self._finished = deque()  # (finish time, job_id), oldest first
+        self._lock = threading.Lock()
+
+    def enqueue(self, paper_id: str) -> str:
+        """
+        Schedule ingestion of a paper and return the job id.
+        """
+        with self._lock:
+            self._evict_finished()
+            job_id = self._active.get(paper_id)
+            if job_id is not None:
+                return job_id
+            job_id = uuid.uuid4().hex
+            future = self._executor.submit(self._process_paper, paper_id)
+            self._jobs[job_id] = (paper_id, future)
+            self._active[paper_id] = job_id
+        logger.info("Queued ingestion job %s for paper %s", job_id, paper_id)
+        future.add_done_callback(lambda _: self._finish(paper_id, job_id))
+        return job_id
+
+    def _finish(self, paper_id: str, job_id: str):
+        with self._lock:
+            if self._active.get(paper_id) == job_id:
+                del self._active[paper_id]
+            self._finished.append((time.monotonic(), job_id))
+            self._evict_finished()
+
+    def _evict_finished(self):
+        # Called with the lock held
+        expiry = time.monotonic() - self._job_retention
+        while self._finished and (self._finished[0][0] < expiry or len(self._finished) > self._max_finished_jobs):
+            _, job_id = self._finished.popleft()
+            self._jobs.pop(job_id, None)
+
+    def status(self, job_id: str) -> dict:
+        """
+        Return the state of a job (queued, running, done or failed), or None for an unknown or expired job id.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        paper_id, future = job
+        if not future.done():
+            status = "running" if future.running() else "queued"
+            return {"job_id": job_id, "paper_id": paper_id, "status": status}
+        error = future.exception()
+        if error is not None:
+            return {"job_id": job_id, "paper_id": paper_id, "status": "failed", "error": str(error)}
+        return {"job_id": job_id, "paper_id": paper_id, "status": "done"}
+
+    def wait(self, job_id: str, timeout: float = None):
+        """
+        Block until a job finishes, re-raising its exception if it failed.
+        """
+        with self._lock:
+            _, future = self._jobs[job_id]
+        return future.result(timeout)
@@ -1,7 +1,15 @@
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 import tiktoken
+import asyncio
+import hashlib
 import logging
 import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import numpy as np
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,12 +17,21 @@ load_dotenv()
 # Fetch the API key from the environment variable
 api_key = os.getenv("OPENAI_API_KEY")
 
-# Initialize the OpenAI client with the API key
+# Initialize the OpenAI clients with the API key
 client = OpenAI(api_key=api_key)
+aclient = AsyncOpenAI(api_key=api_key)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Embeddings are memoized in-process (LRU) and on disk (SQLite), keyed by model + text.
+# Cached vectors are held as contiguous float32 arrays rather than lists of Python floats.
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+EMBEDDING_MEMORY_CACHE_SIZE = 8192
+_embedding_memory_cache = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+_embedding_db = None
+
 
 def count_tokens(text: str, model: str = "gpt-4o") -> int:
     encoding = tiktoken.encoding_for_model(model)
@@ -25,19 +42,30 @@ def count_tokens(text: str, model: str = "gpt-4o") -> int:
 total_prompt_tokens = 0
 total_response_tokens = 0
 total_embedding_tokens = 0
+# Counters are updated from worker threads when prompts are sent concurrently
+_token_count_lock = threading.Lock()
+
+def _record_prompt_tokens(messages, model):
+    global total_prompt_tokens
+    prompt_text = "\n".join(message["content"] for message in messages)
+    prompt_token_count = count_tokens(prompt_text, model=model)
+    with _token_count_lock:
+        total_prompt_tokens += prompt_token_count
+    logger.info("Prompt tokens for this call: %d (Total so far: %d)\n\n", prompt_token_count, total_prompt_tokens)
+
+def _record_response_tokens(response_content, model):
+    global total_response_tokens
+    response_token_count = count_tokens(response_content, model=model)
+    with _token_count_lock:
+        total_response_tokens += response_token_count
+    logger.info("Response tokens for this call: %d (Total so far: %d)\n\n", response_token_count, total_response_tokens)
 
 def prompt_chatgpt(messages, model="gpt-4o"):
     """
     Sends a series of messages to ChatGPT and returns the response.
     Also logs and aggregates token usage.
     """
-    global total_prompt_tokens, total_response_tokens
-    
-    # Combine all message contents for token counting
-    prompt_text = "\n".join(message["content"] for message in messages)
-    prompt_token_count = count_tokens(prompt_text, model=model)
-    total_prompt_tokens += prompt_token_count
-    logger.info("Prompt tokens for this call: %d (Total so far: %d)\n\n", prompt_token_count, total_prompt_tokens)
+    _record_prompt_tokens(messages, model)
     
     try:
         completion = client.chat.completions.create(
@@ -46,24 +74,162 @@ def prompt_chatgpt(messages, model="gpt-4o"):
             # temperature=0
         )
         response_content = completion.choices[0].message.content
-        response_token_count = count_tokens(response_content, model=model)
-        total_response_tokens += response_token_count
-        logger.info("Response tokens for this call: %d (Total so far: %d)\n\n", response_token_count, total_response_tokens)
+        _record_response_tokens(response_content, model)
         return response_content
     except Exception as e:
         logger.error("Error in prompt_chatgpt: %s", e)
         return {"error": str(e)}
 
-def generate_embedding(text, model="text-embedding-3-small"):
-    text = text.replace("\n", " ")
+async def _prompt_chatgpt_async(messages, model, semaphore):
+    _record_prompt_tokens(messages, model)
+    try:
+        async with semaphore:
+            completion = await aclient.chat.completions.create(model=model, messages=messages)
+        response_content = completion.choices[0].message.content
+        _record_response_tokens(response_content, model)
+        return response_content
+    except Exception as e:
+        logger.error("Error in prompt_chatgpt_batch: %s", e)
+        return {"error": str(e)}
+
+async def prompt_chatgpt_batch(list_of_message_lists, model="gpt-4o", max_concurrency=8):
+    """
+    Sends several independent conversations to ChatGPT concurrently and returns
+    their responses in input order. At most max_concurrency requests are in flight.
+    Failed requests yield {"error": ...} like prompt_chatgpt.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    return await asyncio.gather(
+        *(_prompt_chatgpt_async(messages, model, semaphore) for messages in list_of_message_lists)
+    )
+
+def prompt_chatgpt_stream(messages, model="gpt-4o"):
+    """
+    Sends a series of messages to ChatGPT and yields the response text as it arrives.
+    Token usage is logged once the stream completes.
+    """
+    _record_prompt_tokens(messages, model)
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True)
+    parts = []
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+    _record_response_tokens("".join(parts), model)
 
-    # Count tokens for the embedding
+def _embed_batch(batch, model):
+    return [np.asarray(item.embedding, dtype=np.float32) for item in client.embeddings.create(input=batch, model=model).data]
+
+def _embedding_key(text, model):
+    return hashlib.sha256(f"{model}|{text}".encode()).hexdigest()
+
+# Raw float32 blobs; the older `embeddings` table holds orjson-encoded lists and is left untouched
+EMBEDDING_CACHE_TABLE = "embeddings_f32"
+
+def _get_embedding_db():
+    global _embedding_db
+    if _embedding_db is None:
+        _embedding_db = sqlite3.connect(EMBEDDING_CACHE_PATH, check_same_thread=False)
+        _embedding_db.execute(f"CREATE TABLE IF NOT EXISTS {EMBEDDING_CACHE_TABLE} (key TEXT PRIMARY KEY, embedding BLOB)")
+    return _embedding_db
+
+def _remember_embedding(key, embedding):
+    _embedding_memory_cache[key] = embedding
+    _embedding_memory_cache.move_to_end(key)
+    if len(_embedding_memory_cache) > EMBEDDING_MEMORY_CACHE_SIZE:
+        _embedding_memory_cache.popitem(last=False)
+
+def _lookup_cached_embeddings(keys):
+    """
+    Returns {key: embedding} for every key found in the memory or disk cache.
+    """
+    found = {}
+    with _embedding_cache_lock:
+        for key in keys:
+            if key in _embedding_memory_cache:
+                _embedding_memory_cache.move_to_end(key)
+                found[key] = _embedding_memory_cache[key]
+
+        missing = [key for key in keys if key not in found]
+        if missing:
+            db = _get_embedding_db()
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = db.execute(f"SELECT key, embedding FROM {EMBEDDING_CACHE_TABLE} WHERE key IN ({placeholders})", chunk)
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                    _remember_embedding(key, found[key])
+    return found
+
+def _store_embeddings(entries):
+    with _embedding_cache_lock:
+        for key, embedding in entries:
+            _remember_embedding(key, embedding)
+        db = _get_embedding_db()
+        db.executemany(
+            f"INSERT OR REPLACE INTO {EMBEDDING_CACHE_TABLE} (key, embedding) VALUES (?, ?)",
+            [(key, embedding.tobytes()) for key, embedding in entries]
+        )
+        db.commit()
+
+def generate_embeddings_batch(texts, model="text-embedding-3-small", batch_size=256, max_workers=4, as_array=False):
+    """
+    Embeds many texts with one API request per batch_size inputs and returns
+    the embeddings in input order. Batches are sent concurrently, and texts
+    already embedded with the same model are served from the cache.
+
+    By default each embedding is a list of floats (ready to store in the
+    database); with as_array=True a single (len(texts), dim) float32 matrix
+    is returned instead.
+    """
     global total_embedding_tokens
-    embedding_token_count = count_tokens(text, model=model)
-    total_embedding_tokens += embedding_token_count
-    logger.info("Embedding tokens for this call: %d (Total so far: %d)\n\n", embedding_token_count, total_embedding_tokens)
-    
-    return client.embeddings.create(input = [text], model=model).data[0].embedding
+    texts = [text.replace("\n", " ") for text in texts]
+    keys = [_embedding_key(text, model) for text in texts]
+    embeddings = _lookup_cached_embeddings(set(keys))
+
+    # Only unseen texts go to the API, each once even if repeated in the input
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key not in embeddings:
+            pending.setdefault(key, text)
+
+    if pending:
+        pending_keys = list(pending)
+        pending_texts = list(pending.values())
+
+        # Count tokens for the embeddings
+        embedding_token_count = sum(count_tokens(text, model=model) for text in pending_texts)
+        with _token_count_lock:
+            total_embedding_tokens += embedding_token_count
+        logger.info("Embedding tokens for this call: %d (Total so far: %d)\n\n", embedding_token_count, total_embedding_tokens)
+
+        iterator = iter(pending_texts)
+        batches = list(iter(lambda: list(islice(iterator, batch_size)), []))
+        if len(batches) == 1:
+            new_embeddings = _embed_batch(batches[0], model)
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = executor.map(lambda batch: _embed_batch(batch, model), batches)
+                new_embeddings = [embedding for batch_embeddings in results for embedding in batch_embeddings]
+
+        new_entries = list(zip(pending_keys, new_embeddings))
+        _store_embeddings(new_entries)
+        embeddings.update(new_entries)
+
+    if as_array:
+        return np.vstack([embeddings[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+    return [embeddings[key].tolist() for key in keys]
+
+def generate_embedding(text, model="text-embedding-3-small"):
+    return generate_embeddings_batch([text], model=model)[0]
+
+def generate_embedding_array(text, model="text-embedding-3-small"):
+    return generate_embeddings_batch([text], model=model, as_array=True)[0]
 
 def get_total_prompt_tokens():
     return total_prompt_tokens
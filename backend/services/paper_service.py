@@ -8,7 +8,9 @@ from fastapi import HTTPException, WebSocket
 from old_code.paper_comparison import generate_embedding_for_paper_chunks, compare_two_papers, create_comparison_table
 
 # Import your PaperRepository, which handles the DB logic
-from backend.repository.paper_repository import PaperRepository
+from repository.paper_repository import PaperRepository
+from repository.read_cache import TTLCache
+from services.ingestion_queue import IngestionQueue
 from util.frontier import Queue, PriorityQueue, Stack
 
 
@@ -16,21 +18,39 @@ from util.frontier import Queue, PriorityQueue, Stack
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)  # Adjust as needed
 
+# Relevance scores already read or computed in this process, keyed by (root_paper_id, target_paper_id).
+# A stored score is never recomputed, so repeated explorations of the same root skip the DB and the model.
+_relevance_scores = TTLCache(maxsize=100_000, ttl=24 * 3600)
+
 class PaperService:
     def __init__(self):
         self.repository = PaperRepository()  # Ensure your repository class is properly initialized
+        self.ingestion_queue = IngestionQueue(self.repository.process_and_cite_paper)
 
     def download_paper_and_create_record(self, paper_id: str):
         """
         Download the paper using the Semantic Scholar API and create a record in the database.
+        Runs as an ingestion job, so concurrent requests for the same paper share one download.
         """
         try:
             # Download the paper and create a recordy
-            self.repository.process_and_cite_paper(paper_id)
+            self.ingestion_queue.wait(self.ingestion_queue.enqueue(paper_id))
         except Exception as e:
             logger.exception(f"Error downloading paper with ID: {paper_id}")
             raise HTTPException(status_code=500, detail=str(e))
 
+    def enqueue_paper_download(self, paper_id: str) -> str:
+        """
+        Schedule the download and record creation for a paper in the background and return the job id.
+        """
+        return self.ingestion_queue.enqueue(paper_id)
+
+    def get_download_job(self, job_id: str) -> dict:
+        """
+        Return the status of a download job, or None if the job id is unknown.
+        """
+        return self.ingestion_queue.status(job_id)
+
 
     def get_all_papers(self):
         """
@@ -84,66 +104,62 @@ class PaperService:
         Fetch an existing relation between source_paper_id and target_paper_id
         from the relations table. If none exists, create one with NULL fields
         for relationship_type, remarks, and relevance_score.
-        Returns the relation record (Supabase response).
+        Both cases take a single DB round-trip.
+        Returns the relation record, with "inserted" set when it was just created.
         """
         try:
-            existing_relation_resp = self.repository.get_relation_by_source_and_target(
-                source_paper_id, target_paper_id
-            )
-            if not existing_relation_resp:
-                # No existing relation, create a blank one
-                relation = {
-                    "source_paper_id": source_paper_id,
-                    "target_paper_id": target_paper_id,
-                    "relevance_score": None,
-                }
-                self.repository.create_relation(relation)
-                # Re-fetch to confirm
-                return self.repository.get_relation_by_source_and_target(
-                    source_paper_id, target_paper_id
-                )
-            else:
-                return existing_relation_resp
+            return self.repository.fetch_or_insert_relation(source_paper_id, target_paper_id)
         except Exception as e:
             logger.exception("Error fetching or inserting relation")
             raise HTTPException(status_code=500, detail=str(e))
 
-    def process_citation(self, root_paper_id: str, target_paper_id: str) -> tuple:
+    def ensure_paper_chunks(self, paper_id: str):
+        """
+        Generate and store the chunk embeddings of a paper unless they are already in the DB.
+        """
+        # Assume that having the chunks in the DB implies the embeddings are also present
+        if not self.repository.get_chunks_by_semantic_id(paper_id):
+            generate_embedding_for_paper_chunks(paper_id)
+
+    def process_citation(self, root_paper_id: str, target_paper_id: str, root_ready: bool = False, pending_scores: list = None) -> tuple:
         """
         Process a citation or reference relationship from root_paper_id to target_paper_id:
           - Check or create a record in the `relations` table.
           - If no relevance_score is stored, compute it using get_relevance.
           - Store the computed relevance_score in the relations table.
         Returns (relevance_score, relationship_type, remarks).
+        Scores are cached in-process, so a pair seen before costs no DB request.
+        root_ready=True skips the root paper's chunk check, for callers that ran ensure_paper_chunks on it once.
+        With pending_scores, a computed score is appended there as a relation row for the caller to
+        write in bulk (see write_relevance_scores) instead of being updated right away.
         """
+        found, relevance_score = _relevance_scores.get((root_paper_id, target_paper_id))
+        if found:
+            return relevance_score
+
         try:
             # Make sure the target paper exists in the 'papers' table
-            target_paper_resp = self.repository.get_paper_by_semantic_id(target_paper_id)
-            print("\n" * 5)
-            print("checkpoint 0")
-            if not target_paper_resp:
+            target_paper_exists = self.repository.paper_exists(target_paper_id)
+            if not target_paper_exists:
                 logger.error(f"Paper with ID {target_paper_id} not found")
                 return 0.0
 
             # Check or create the relation row
-            print("checkpoint 1")
             relation = self.fetch_or_insert_relation(root_paper_id, target_paper_id)
-            print("checkpoint 2")
+            logger.debug(f"Relation row for {root_paper_id} -> {target_paper_id}: {relation}")
             if not relation:
                 logger.warning(f"Relation row could not be created for {root_paper_id} -> {target_paper_id}")
                 return 0.0
 
             if relation.get("relevance_score") is not None:
                 # Already computed
+                _relevance_scores.set((root_paper_id, target_paper_id), relation["relevance_score"])
                 return relation["relevance_score"]
                 
             # Generate embeddings for the papers and compare
-            # Check whether the embeddings are already computed
-            # Assume that having the chunks in the DB implies the embeddings are also present
-            if not self.repository.get_chunks_by_semantic_id(root_paper_id):
-                generate_embedding_for_paper_chunks(root_paper_id)
-            if not self.repository.get_chunks_by_semantic_id(target_paper_id):
-                generate_embedding_for_paper_chunks(target_paper_id)
+            if not root_ready:
+                self.ensure_paper_chunks(root_paper_id)
+            self.ensure_paper_chunks(target_paper_id)
 
             relevance_score = compare_two_papers(root_paper_id, target_paper_id)
             
@@ -151,16 +167,32 @@ class PaperService:
             updated_fields = {
                 "relevance_score": relevance_score,
             }
-            self.repository.update_relation_by_source_and_target(
-                root_paper_id, target_paper_id, updated_fields
-            )
+            if pending_scores is not None:
+                # Cached by write_relevance_scores once the row is stored
+                pending_scores.append({"source_paper_id": root_paper_id, "target_paper_id": target_paper_id, **updated_fields})
+            else:
+                self.repository.update_relation_by_source_and_target(
+                    root_paper_id, target_paper_id, updated_fields
+                )
+                _relevance_scores.set((root_paper_id, target_paper_id), relevance_score)
 
             return relevance_score
         except Exception as e:
             logger.exception("Error processing citation")
             raise HTTPException(status_code=500, detail=str(e))
 
-    def process_citations(self, root_paper_id: str, current_paper_id: str, explored_papers: set, similarity_threshold: float = 0.88) -> dict:
+    def write_relevance_scores(self, pending_scores: list):
+        """
+        Store the relation rows collected by process_citation in one upsert request,
+        then cache their scores. Nothing is cached if the upsert fails.
+        Callers flush in a finally block, so scores computed before an error are not lost.
+        """
+        if pending_scores:
+            self.repository.upsert_relations(pending_scores)
+            for row in pending_scores:
+                _relevance_scores.set((row["source_paper_id"], row["target_paper_id"]), row["relevance_score"])
+
+    def process_citations(self, root_paper_id: str, current_paper_id: str, explored_papers: set, similarity_threshold: float = 0.88, root_ready: bool = False) -> dict:
         """
         For the given current_paper_id, look up its citations in the 'citations' table,
         compute or retrieve the relevance score for each cited paper, and filter out
@@ -170,9 +202,7 @@ class PaperService:
         try:
             logger.debug(f"Processing references for paper ID: {current_paper_id}")
             # Check that the current paper is in the DB
-            paper_resp = self.repository.get_paper_by_semantic_id(current_paper_id)
-
-            if not paper_resp:
+            if not self.repository.paper_exists(current_paper_id):
                 logger.error(f"Paper with ID {current_paper_id} not found in DB")
                 return {}
 
@@ -183,21 +213,25 @@ class PaperService:
                 return {}
 
             filtered_citations = {}
-            for citation_row in citations_resp:
-                target_id = citation_row["cited_paper_id"]
-                if target_id in explored_papers:
-                    continue
-
-                relevance_score = self.process_citation(root_paper_id, target_id)
-                if relevance_score < similarity_threshold:
-                    # Mark as explored to skip in future
-                    explored_papers.add(target_id)
-                    continue
-                
-                filtered_citations[target_id] = {
-                    "relevance_score": relevance_score,
-                }
-
+            pending_scores = []
+            try:
+                for citation_row in citations_resp:
+                    target_id = citation_row["cited_paper_id"]
+                    if target_id in explored_papers:
+                        continue
+
+                    relevance_score = self.process_citation(root_paper_id, target_id, root_ready, pending_scores)
+                    if relevance_score < similarity_threshold:
+                        # Mark as explored to skip in future
+                        explored_papers.add(target_id)
+                        continue
+
+                    filtered_citations[target_id] = {
+                        "relevance_score": relevance_score,
+                    }
+            finally:
+                # Scores computed before a failing citation are still stored
+                self.write_relevance_scores(pending_scores)
             return filtered_citations
         except Exception as e:
             logger.exception("Error processing citations")
@@ -207,7 +241,7 @@ class PaperService:
     # Handling "Parent" Papers (i.e., who cites this paper?)
     # ----------------------------------------------------------------
 
-    def process_parents(self, root_paper_id: str, child_paper_id: str, explored_papers: set, similarity_threshold: float = 0.88) -> dict:
+    def process_parents(self, root_paper_id: str, child_paper_id: str, explored_papers: set, similarity_threshold: float = 0.88, root_ready: bool = False) -> dict:
         """
         For each paper that cites child_paper_id, compute or retrieve the relevance score in the 'relations' table,
         skipping if it is below similarity_threshold or if the PDF paths are missing, etc.
@@ -219,21 +253,25 @@ class PaperService:
                 return {}
 
             parents_dict = {}
-            for citation in parent_citations:
-                parent_id = citation["source_paper_id"]
-                if parent_id in explored_papers:
-                    continue
-
-                # Compute or retrieve the relevance_score for root_paper_id -> parent_id
-                relevance_score = self.process_citation(root_paper_id, parent_id)
-                if relevance_score < similarity_threshold:
-                    explored_papers.add(parent_id)
-                    continue
-
-                parents_dict[parent_id] = {
-                    "relevance_score": relevance_score,
-                }
-
+            pending_scores = []
+            try:
+                for citation in parent_citations:
+                    parent_id = citation["source_paper_id"]
+                    if parent_id in explored_papers:
+                        continue
+
+                    # Compute or retrieve the relevance_score for root_paper_id -> parent_id
+                    relevance_score = self.process_citation(root_paper_id, parent_id, root_ready, pending_scores)
+                    if relevance_score < similarity_threshold:
+                        explored_papers.add(parent_id)
+                        continue
+
+                    parents_dict[parent_id] = {
+                        "relevance_score": relevance_score,
+                    }
+            finally:
+                # Scores computed before a failing parent are still stored
+                self.write_relevance_scores(pending_scores)
             return parents_dict
         except Exception as e:
             logger.exception("Error processing parents")
@@ -252,87 +290,47 @@ class PaperService:
         max_depth: int,
         current_depth: int,
         similarity_threshold: float,
-        traversal_type: str
+        traversal_type: str,
+        root_ready: bool = False
     ) -> set:
         """
-        Recursively explores the 'downward' citations from a paper,
-        i.e., the papers that it cites. If the relevance score is below
-        similarity_threshold, it is skipped. Otherwise, it's added to frontier
-        for further exploration.
+        Explores the 'downward' citations from a paper, i.e., the papers that it cites.
+        If the relevance score is below similarity_threshold, it is skipped. Otherwise, it's
+        added to frontier for further exploration, in the order the frontier pops it.
+        Each expanded paper uses up one level of max_depth, so at most max_depth - current_depth + 1
+        papers are expanded; once that budget is spent, the rest of the frontier is drained unexpanded.
+        The root paper's chunks are checked once here rather than for every reference,
+        or not at all with root_ready=True, for callers that already ran ensure_paper_chunks on it.
         """
         try:
-            if current_depth > max_depth:
-                await websocket.send_json({"status": "Max exploration depth reached"})
-                return set()
+            if not root_ready:
+                self.ensure_paper_chunks(root_paper_id)
+            budget = max_depth - current_depth + 1
+            expanded = 0
+            frontier.insert({"id": start_paper_id})
+            discovered_nodes = set()
+            depth_reported = False
 
-            if start_paper_id in explored_papers:
-                return set()
-
-            explored_papers.add(start_paper_id)
-
-            # Gather references that pass the threshold
-            reference_ids = self.process_citations(root_paper_id, start_paper_id, explored_papers, similarity_threshold)
-
-            # Build nodes from discovered references
-            nodes = []
-            for ref_id, ref_data in reference_ids.items():
-                ref_paper_resp = self.repository.get_paper_by_semantic_id(ref_id)
-                if not ref_paper_resp:
+            while not frontier.is_empty():
+                # 'id' should match the 'semantic_id'
+                paper_id = frontier.pop().get("id")
+                if paper_id in explored_papers:
+                    continue
+                if expanded >= budget:
+                    if not depth_reported:
+                        await websocket.send_json({"status": "Max exploration depth reached"})
+                        depth_reported = True
                     continue
-                ref_paper = ref_paper_resp
-                nodes.append({
-                    "id": ref_id,
-                    "title": ref_paper.get("title"),
-                    "year": ref_paper.get("year"),
-                    "relevance_score": ref_data.get("relevance_score"),
-                })
-
-            # Also include the current paper node
-            current_paper_resp = self.repository.get_paper_by_semantic_id(start_paper_id)
-            if current_paper_resp:
-                current_paper = current_paper_resp
-                print(current_paper)
-                nodes.append({
-                    "id": start_paper_id,
-                    "title": current_paper.get("title"),
-                    "year": current_paper.get("year"),
-                    "relevance_score": current_paper.get("relevance_score"),
-                })
-
-            # Build links from the current paper to each reference
-            links = [{"source": start_paper_id, "target": ref_id} for ref_id in reference_ids.keys()]
-
-            await websocket.send_json({
-                "phase": "downward",
-                "nodes": nodes,
-                "links": links,
-            })
-
-            # Insert discovered references into the frontier for further exploration
-            for node in nodes:
-                frontier.insert(node)
 
-            discovered_nodes = {start_paper_id}
-            discovered_nodes.update(reference_ids.keys())
+                expanded += 1
+                explored_papers.add(paper_id)
+                discovered_nodes.add(paper_id)
+                reference_ids, nodes = await self._expand_downward(websocket, root_paper_id, paper_id, explored_papers, similarity_threshold)
+                discovered_nodes.update(reference_ids.keys())
 
-            # Continue exploring
-            while not frontier.is_empty():
-                next_paper = frontier.pop()
-                # 'id' should match the 'semantic_id'
-                paper_id = next_paper.get("id")
-                if paper_id not in explored_papers:
-                    child_nodes = await self.explore_downward(
-                        websocket,
-                        root_paper_id,
-                        paper_id,
-                        explored_papers,
-                        frontier,
-                        max_depth,
-                        current_depth + 1,
-                        similarity_threshold,
-                        traversal_type
-                    )
-                    discovered_nodes.update(child_nodes)
+                # Insert discovered references into the frontier for further exploration
+                for node in nodes:
+                    frontier.insert(node)
 
             return discovered_nodes
         except Exception as e:
@@ -340,6 +338,47 @@ class PaperService:
             await websocket.send_json({"status": "error", "message": str(e)})
             return set()
 
+    async def _expand_downward(self, websocket: WebSocket, root_paper_id: str, start_paper_id: str, explored_papers: set, similarity_threshold: float) -> tuple:
+        # Sends start_paper_id and its references above the threshold to the client; returns (reference_ids, nodes)
+        # Gather references that pass the threshold
+        reference_ids = self.process_citations(root_paper_id, start_paper_id, explored_papers, similarity_threshold, root_ready=True)
+
+        # Build nodes from discovered references
+        nodes = []
+        for ref_id, ref_data in reference_ids.items():
+            ref_paper_resp = self.repository.get_paper_header(ref_id)
+            if not ref_paper_resp:
+                continue
+            ref_paper = ref_paper_resp
+            nodes.append({
+                "id": ref_id,
+                "title": ref_paper.get("title"),
+                "year": ref_paper.get("year"),
+                "relevance_score": ref_data.get("relevance_score"),
+            })
+
+        # Also include the current paper node
+        current_paper_resp = self.repository.get_paper_by_semantic_id(start_paper_id)
+        if current_paper_resp:
+            current_paper = current_paper_resp
+            nodes.append({
+                "id": start_paper_id,
+                "title": current_paper.get("title"),
+                "year": current_paper.get("year"),
+                "relevance_score": current_paper.get("relevance_score"),
+            })
+
+        # Build links from the current paper to each reference
+        links = [{"source": start_paper_id, "target": ref_id} for ref_id in reference_ids.keys()]
+
+        await websocket.send_json({
+            "phase": "downward",
+            "nodes": nodes,
+            "links": links,
+        })
+
+        return reference_ids, nodes
+
     # ----------------------------------------------------------------
     # Upward Exploration
     # ----------------------------------------------------------------
@@ -353,84 +392,41 @@ class PaperService:
         max_depth: int,
         current_depth: int,
         similarity_threshold: float,
-        traversal_type: str
+        traversal_type: str,
+        root_ready: bool = False
     ) -> set:
         """
-        Recursively explores 'parent' papers that cite the current paper.
-        Similar approach to downward, but we call process_parents.
+        Explores 'parent' papers that cite the current paper.
+        Same iterative traversal and expansion budget as explore_downward, but we call process_parents.
         """
         try:
-            if current_depth > max_depth:
-                await websocket.send_json({"status": "Max upward depth reached"})
-                return set()
+            if not root_ready:
+                self.ensure_paper_chunks(root_paper_id)
+            budget = max_depth - current_depth + 1
+            expanded = 0
+            frontier.insert({"id": start_paper_id})
+            discovered_nodes = set()
+            depth_reported = False
 
-            if start_paper_id in explored_papers:
-                return set()
-
-            explored_papers.add(start_paper_id)
-
-            # Find parent papers with relevance above threshold
-            parents_dict = self.process_parents(root_paper_id, start_paper_id, explored_papers, similarity_threshold)
-
-            nodes = []
-            for parent_id, parent_data in parents_dict.items():
-                if parent_id in explored_papers:
+            while not frontier.is_empty():
+                pid = frontier.pop()["id"]
+                if pid in explored_papers:
                     continue
-                parent_paper_resp = self.repository.get_paper_by_semantic_id(parent_id)
-                if not parent_paper_resp:
+                if expanded >= budget:
+                    if not depth_reported:
+                        await websocket.send_json({"status": "Max upward depth reached"})
+                        depth_reported = True
                     continue
-                parent_paper = parent_paper_resp
-                nodes.append({
-                    "id": parent_id,
-                    "title": parent_paper.get("title"),
-                    "year": parent_paper.get("year"),
-                    "relevance_score": parent_data.get("relevance_score"),
-                })
-
-            # Create links from each parent to the current paper
-            links = [{"source": parent_id, "target": start_paper_id} for parent_id in parents_dict.keys()]
-
-            # Also include the current paper node
-            current_paper_resp = self.repository.get_paper_by_semantic_id(start_paper_id)
-            if current_paper_resp:
-                current_paper = current_paper_resp
-                nodes.append({
-                    "id": start_paper_id,
-                    "title": current_paper.get("title"),
-                    "year": current_paper.get("year"),
-                    "relevance_score": current_paper.get("relevance_score"),
-                })
-
-            if nodes or links:
-                await websocket.send_json({
-                    "phase": "upward",
-                    "nodes": nodes,
-                    "links": links,
-                })
-
-            discovered_nodes = {start_paper_id}
-            discovered_nodes.update(parents_dict.keys())
-
-            # Add found parent papers to the frontier
-            for node in nodes:
-                frontier.insert(node)
 
-            while not frontier.is_empty():
-                next_paper = frontier.pop()
-                pid = next_paper["id"]
-                if pid not in explored_papers:
-                    child_nodes = await self.explore_upward(
-                        websocket=websocket,
-                        root_paper_id=root_paper_id,
-                        start_paper_id=pid,
-                        explored_papers=explored_papers,
-                        frontier=frontier,
-                        max_depth=max_depth,
-                        current_depth=current_depth + 1,
-                        similarity_threshold=similarity_threshold,
-                        traversal_type=traversal_type
-                    )
-                    discovered_nodes.update(child_nodes)
+                expanded += 1
+                explored_papers.add(pid)
+                discovered_nodes.add(pid)
+                parents_dict, nodes = await self._expand_upward(websocket, root_paper_id, pid, explored_papers, similarity_threshold)
+                discovered_nodes.update(parents_dict.keys())
+
+                # Add found parent papers to the frontier
+                for node in nodes:
+                    frontier.insert(node)
 
             return discovered_nodes
         except Exception as e:
@@ -438,6 +434,49 @@ class PaperService:
             await websocket.send_json({"status": "error", "message": str(e)})
             return set()
 
+    async def _expand_upward(self, websocket: WebSocket, root_paper_id: str, start_paper_id: str, explored_papers: set, similarity_threshold: float) -> tuple:
+        # Sends start_paper_id and its parents above the threshold to the client; returns (parents_dict, nodes)
+        # Find parent papers with relevance above threshold
+        parents_dict = self.process_parents(root_paper_id, start_paper_id, explored_papers, similarity_threshold, root_ready=True)
+
+        nodes = []
+        for parent_id, parent_data in parents_dict.items():
+            if parent_id in explored_papers:
+                continue
+            parent_paper_resp = self.repository.get_paper_header(parent_id)
+            if not parent_paper_resp:
+                continue
+            parent_paper = parent_paper_resp
+            nodes.append({
+                "id": parent_id,
+                "title": parent_paper.get("title"),
+                "year": parent_paper.get("year"),
+                "relevance_score": parent_data.get("relevance_score"),
+            })
+
+        # Create links from each parent to the current paper
+        links = [{"source": parent_id, "target": start_paper_id} for parent_id in parents_dict.keys()]
+
+        # Also include the current paper node
+        current_paper_resp = self.repository.get_paper_by_semantic_id(start_paper_id)
+        if current_paper_resp:
+            current_paper = current_paper_resp
+            nodes.append({
+                "id": start_paper_id,
+                "title": current_paper.get("title"),
+                "year": current_paper.get("year"),
+                "relevance_score": current_paper.get("relevance_score"),
+            })
+
+        if nodes or links:
+            await websocket.send_json({
+                "phase": "upward",
+                "nodes": nodes,
+                "links": links,
+            })
+
+        return parents_dict, nodes
+
     # ----------------------------------------------------------------
     # Primary Exploration Method
     # ----------------------------------------------------------------
@@ -473,6 +512,9 @@ class PaperService:
                 # For a priority-based approach
                 frontier_down = PriorityQueue(lambda x: -x.get("relevance_score", 0))
 
+            # The root's chunks are checked once for the downward and every upward exploration
+            self.ensure_paper_chunks(root_paper_id)
+
             # Downward exploration
             explored_papers_downward = set()
             discovered_nodes_downward = await self.explore_downward(
@@ -485,6 +527,7 @@ class PaperService:
                 current_depth=0,
                 similarity_threshold=similarity_threshold,
                 traversal_type=traversal_type,
+                root_ready=True,
             )
 
             # For each discovered node (excluding root), we may explore upward
@@ -498,7 +541,7 @@ class PaperService:
                 if rel_resp:
                     rel_data = rel_resp
                     # We consider "relevance_score" to see if it is above threshold
-                    if rel_data.get("relevance_score", 0) >= similarity_threshold:
+                    if (rel_data.get("relevance_score") or 0) >= similarity_threshold:
                         qualified_nodes.append(node_id)
 
             # Upward exploration for qualified nodes
@@ -527,6 +570,7 @@ class PaperService:
                     current_depth=0,
                     similarity_threshold=similarity_threshold,
                     traversal_type=traversal_type,
+                    root_ready=True,
                 )
                 all_upward_nodes.update(upward_discovered)
 
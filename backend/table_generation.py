@@ -5,7 +5,7 @@ from comparison_table_generation.criterion_generation import generate_detailed_s
 from comparison_table_generation.paper_comparison_table import create_comparison_table
 from comparison_table_generation.visualization import display_comparison_table
 from backend.comparison_table_generation.grobid_service import extract_all_sections
-from services.openai_service import prompt_chatgpt, generate_embedding, get_total_prompt_tokens, get_total_response_tokens
+from services.openai_service import prompt_chatgpt, generate_embedding_array, generate_embeddings_batch, get_total_prompt_tokens, get_total_response_tokens
 from comparison_table_generation.table_logging import save_intermediate_tables, log_intermediate_table
 
 
@@ -38,7 +38,7 @@ def main():
 
     # Pre-compute embeddings for all papers.
     for paper_id in paper_ids:
-        generate_embedding_for_paper_chunks(repository, paper_id, extract_all_sections, generate_embedding)
+        generate_embedding_for_paper_chunks(repository, paper_id, extract_all_sections, generate_embeddings_batch)
     
     # Create the comparison table using the "hybrid" criterion-generation approach.
     expansion_approach = "boolean_then_expand" # "direct_boolean" or "boolean_then_expand"
@@ -56,9 +56,10 @@ def main():
         criterion_generation_strategy=criterion_generation_strategy,
         get_paper_chunks=lambda pid: repository.get_chunks_by_semantic_id(pid),
         prompt_chatgpt=prompt_chatgpt,
-        retrieve_relevant_chunks=lambda query, chunks, top_k=3: retrieve_relevant_chunks(query, chunks, generate_embedding, top_k),
+        retrieve_relevant_chunks=lambda query, embedded, chunk_matrix, top_k=3: retrieve_relevant_chunks(query, embedded, chunk_matrix, generate_embedding_array, top_k),
         generate_detailed_summary=lambda full_text: generate_detailed_summary(prompt_chatgpt, full_text),
-        content_generation_strategy=content_generation_strategy
+        content_generation_strategy=content_generation_strategy,
+        generate_embeddings_batch=lambda texts: generate_embeddings_batch(texts, as_array=True)
     )
     time_taken = time() - start
     print("Time taken:", time_taken)
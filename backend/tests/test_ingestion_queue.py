@@ -0,0 +1,87 @@
+"""
+backend/tests/test_ingestion_queue.py
+
+Tests for the background paper ingestion queue
+"""
+
+import threading
+import unittest
+from unittest.mock import patch
+
+from services import ingestion_queue
+from services.ingestion_queue import IngestionQueue
+
+
+class TestIngestionQueue(unittest.TestCase):
+    """Test job deduplication, status reporting and expiry of finished jobs"""
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.processed = []
+
+    def tearDown(self):
+        self.release.set()
+
+    def process_paper(self, paper_id):
+        self.release.wait(5)
+        self.processed.append(paper_id)
+        if paper_id == "broken":
+            raise RuntimeError("download failed")
+
+    def test_paper_in_progress_reuses_its_job(self):
+        queue = IngestionQueue(self.process_paper)
+        first = queue.enqueue("p1")
+        second = queue.enqueue("p1")
+        self.assertEqual(first, second)
+
+        self.release.set()
+        queue.wait(first, timeout=5)
+        self.assertEqual(self.processed, ["p1"])
+        self.assertEqual(queue.status(first)["status"], "done")
+
+    def test_failed_job_reports_its_error(self):
+        self.release.set()
+        queue = IngestionQueue(self.process_paper)
+        job_id = queue.enqueue("broken")
+        with self.assertRaises(RuntimeError):
+            queue.wait(job_id, timeout=5)
+
+        status = queue.status(job_id)
+        self.assertEqual(status["status"], "failed")
+        self.assertEqual(status["error"], "download failed")
+
+    def test_unknown_job_has_no_status(self):
+        queue = IngestionQueue(self.process_paper)
+        self.assertIsNone(queue.status("missing"))
+
+    def test_finished_jobs_expire_after_retention(self):
+        self.release.set()
+        queue = IngestionQueue(self.process_paper, job_retention=60)
+        with patch.object(ingestion_queue.time, "monotonic", return_value=1000.0):
+            job_id = queue.enqueue("p1")
+            queue.wait(job_id, timeout=5)
+            # The done callback records the finish time; wait for it before moving the clock
+            queue._executor.shutdown(wait=True)
+        self.assertIsNotNone(queue.status(job_id))
+
+        with patch.object(ingestion_queue.time, "monotonic", return_value=1061.0):
+            with queue._lock:
+                queue._evict_finished()
+        self.assertIsNone(queue.status(job_id))
+
+    def test_at_most_max_finished_jobs_are_kept(self):
+        self.release.set()
+        queue = IngestionQueue(self.process_paper, max_workers=1, max_finished_jobs=2)
+        job_ids = []
+        for paper_id in ("p1", "p2", "p3"):
+            job_ids.append(queue.enqueue(paper_id))
+            queue.wait(job_ids[-1], timeout=5)
+        queue._executor.shutdown(wait=True)
+
+        self.assertIsNone(queue.status(job_ids[0]))
+        self.assertIsNotNone(queue.status(job_ids[1]))
+        self.assertIsNotNone(queue.status(job_ids[2]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+"""
+backend/tests/test_paper_service_explore.py
+
+Tests for the citation graph exploration budget and batched relevance score writes in PaperService
+"""
+
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import HTTPException
+
+from services import paper_service
+from services.paper_service import PaperService
+from util.frontier import Queue
+
+# paper -> papers it cites (downward) or that cite it (upward), all above the threshold
+GRAPH = {
+    "root": ["a", "b"],
+    "a": ["c"],
+    "b": ["d"],
+    "c": ["e"],
+    "d": [],
+    "e": [],
+}
+
+
+async def fake_expand(websocket, root_paper_id, start_paper_id, explored_papers, similarity_threshold):
+    # Mirrors _expand_downward/_expand_upward: new neighbours plus the current paper's own node
+    found = {pid: {"relevance_score": 0.9} for pid in GRAPH[start_paper_id] if pid not in explored_papers}
+    nodes = [{"id": pid, "relevance_score": 0.9} for pid in found]
+    nodes.append({"id": start_paper_id, "relevance_score": None})
+    return found, nodes
+
+
+class TestExploreBudget(unittest.IsolatedAsyncioTestCase):
+    """Test that exploration expands at most max_depth - current_depth + 1 papers"""
+
+    def setUp(self):
+        with patch.object(paper_service, "PaperRepository"):
+            self.service = PaperService()
+        self.service._expand_downward = AsyncMock(side_effect=fake_expand)
+        self.service._expand_upward = AsyncMock(side_effect=fake_expand)
+        self.websocket = MagicMock()
+        self.websocket.send_json = AsyncMock()
+
+    async def explore_downward(self, max_depth, frontier=None):
+        return await self.service.explore_downward(
+            websocket=self.websocket,
+            root_paper_id="root",
+            start_paper_id="root",
+            explored_papers=set(),
+            frontier=frontier or Queue(),
+            max_depth=max_depth,
+            current_depth=0,
+            similarity_threshold=0.88,
+            traversal_type="bfs",
+            root_ready=True,
+        )
+
+    def expanded(self, expand_mock):
+        return [call.args[2] for call in expand_mock.await_args_list]
+
+    def depth_messages(self):
+        return [
+            call.args[0] for call in self.websocket.send_json.await_args_list
+            if "depth reached" in call.args[0].get("status", "")
+        ]
+
+    async def test_budget_limits_expanded_papers(self):
+        discovered = await self.explore_downward(max_depth=1)
+
+        # Breadth-first: the root, then its first reference
+        self.assertEqual(self.expanded(self.service._expand_downward), ["root", "a"])
+        self.assertEqual(discovered, {"root", "a", "b", "c"})
+        self.assertEqual(self.depth_messages(), [{"status": "Max exploration depth reached"}])
+
+    async def test_max_depth_zero_expands_only_the_start_paper(self):
+        discovered = await self.explore_downward(max_depth=0)
+
+        self.assertEqual(self.expanded(self.service._expand_downward), ["root"])
+        self.assertEqual(discovered, {"root", "a", "b"})
+
+    async def test_large_budget_explores_the_whole_graph(self):
+        discovered = await self.explore_downward(max_depth=10)
+
+        self.assertEqual(sorted(self.expanded(self.service._expand_downward)), sorted(GRAPH))
+        self.assertEqual(discovered, set(GRAPH))
+        self.assertEqual(self.depth_messages(), [])
+
+    async def test_unexpanded_frontier_is_drained(self):
+        """Papers left over once the budget is spent do not leak into a later run sharing the frontier"""
+        frontier = Queue()
+        await self.explore_downward(max_depth=1, frontier=frontier)
+        self.assertTrue(frontier.is_empty())
+
+    async def test_upward_uses_the_same_budget(self):
+        frontier = Queue()
+        discovered = await self.service.explore_upward(
+            websocket=self.websocket,
+            root_paper_id="root",
+            start_paper_id="root",
+            explored_papers=set(),
+            frontier=frontier,
+            max_depth=1,
+            current_depth=0,
+            similarity_threshold=0.88,
+            traversal_type="bfs",
+            root_ready=True,
+        )
+
+        self.assertEqual(self.expanded(self.service._expand_upward), ["root", "a"])
+        self.assertEqual(discovered, {"root", "a", "b", "c"})
+        self.assertEqual(self.depth_messages(), [{"status": "Max upward depth reached"}])
+        self.assertTrue(frontier.is_empty())
+
+
+class TestRelevanceScoreWrites(unittest.TestCase):
+    """Test that scores collected by process_citations are written in one batch, even on failure"""
+
+    def setUp(self):
+        with patch.object(paper_service, "PaperRepository"):
+            self.service = PaperService()
+        self.service.repository.paper_exists.return_value = True
+        self.service.repository.get_citations_by_source.return_value = [
+            {"cited_paper_id": "t1"},
+            {"cited_paper_id": "t2"},
+            {"cited_paper_id": "t3"},
+        ]
+
+    def tearDown(self):
+        paper_service._relevance_scores.clear()
+
+    def score(self, root_paper_id, target_paper_id, root_ready, pending_scores):
+        if target_paper_id == "t3":
+            raise RuntimeError("comparison failed")
+        relevance_score = 0.95 if target_paper_id == "t1" else 0.5
+        pending_scores.append({
+            "source_paper_id": root_paper_id,
+            "target_paper_id": target_paper_id,
+            "relevance_score": relevance_score,
+        })
+        return relevance_score
+
+    def test_scores_are_written_in_one_upsert(self):
+        self.service.repository.get_citations_by_source.return_value = [
+            {"cited_paper_id": "t1"},
+            {"cited_paper_id": "t2"},
+        ]
+        explored = set()
+        with patch.object(self.service, "process_citation", side_effect=self.score):
+            result = self.service.process_citations("root", "root", explored)
+
+        self.assertEqual(result, {"t1": {"relevance_score": 0.95}})
+        self.assertEqual(explored, {"t2"})
+        self.service.repository.upsert_relations.assert_called_once()
+        rows = self.service.repository.upsert_relations.call_args.args[0]
+        self.assertEqual([row["target_paper_id"] for row in rows], ["t1", "t2"])
+        self.assertEqual(paper_service._relevance_scores.get(("root", "t1")), (True, 0.95))
+
+    def test_scores_before_a_failure_are_still_written(self):
+        with patch.object(self.service, "process_citation", side_effect=self.score):
+            with self.assertRaises(HTTPException):
+                self.service.process_citations("root", "root", set())
+
+        self.service.repository.upsert_relations.assert_called_once()
+        rows = self.service.repository.upsert_relations.call_args.args[0]
+        self.assertEqual([row["target_paper_id"] for row in rows], ["t1", "t2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
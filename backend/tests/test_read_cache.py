@@ -0,0 +1,221 @@
+"""
+backend/tests/test_read_cache.py
+
+Tests for the in-process read caches used by the paper repository
+"""
+
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from repository import read_cache
+from repository.read_cache import (
+    TTLCache,
+    invalidate_request_cache,
+    memoize,
+    request_cache_scope,
+    request_scoped,
+    single_flight,
+)
+
+
+class TestTTLCache(unittest.TestCase):
+    """Test expiry, LRU eviction and invalidation of TTLCache"""
+
+    def test_entry_expires_after_ttl(self):
+        """An entry is served until ttl seconds have passed, then dropped"""
+        cache = TTLCache(maxsize=10, ttl=60)
+        with patch.object(read_cache.time, "monotonic", return_value=1000.0):
+            cache.set("key", "value")
+        with patch.object(read_cache.time, "monotonic", return_value=1059.0):
+            self.assertEqual(cache.get("key"), (True, "value"))
+        with patch.object(read_cache.time, "monotonic", return_value=1061.0):
+            self.assertEqual(cache.get("key"), (False, None))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_evicts_least_recently_used(self):
+        """When full, the entry read or written longest ago is evicted"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # "b" is now the least recently used
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), (True, 1))
+        self.assertEqual(cache.get("b"), (False, None))
+        self.assertEqual(cache.get("c"), (True, 3))
+
+    def test_invalidate_matches_name_and_first_argument(self):
+        """invalidate drops only the entries of one function for one first argument"""
+        cache = TTLCache()
+        cache.set(("get_paper", "p1"), "row 1")
+        cache.set(("get_paper", "p2"), "row 2")
+        cache.set(("get_chunks", "p1"), "chunks 1")
+
+        cache.invalidate("get_paper", "p1")
+
+        self.assertEqual(cache.get(("get_paper", "p1")), (False, None))
+        self.assertEqual(cache.get(("get_paper", "p2")), (True, "row 2"))
+        self.assertEqual(cache.get(("get_chunks", "p1")), (True, "chunks 1"))
+
+    def test_stats_counts_hits_and_misses(self):
+        cache = TTLCache()
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("b")
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+
+class _Repository:
+    """Stand-in repository whose read methods record how often they reach the database"""
+
+    cache = TTLCache()
+
+    def __init__(self, result="row"):
+        self.result = result
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def _query(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return self.result
+
+    @memoize(cache)
+    @single_flight
+    def get_paper(self, paper_id, fields="*"):
+        return self._query()
+
+    @single_flight
+    def get_paper_uncached(self, paper_id):
+        return self._query()
+
+    @request_scoped
+    def get_header(self, paper_id):
+        return self._query()
+
+
+class TestMemoize(unittest.TestCase):
+    """Test memoize caching of repository reads"""
+
+    def setUp(self):
+        _Repository.cache.clear()
+
+    def test_repeated_call_is_served_from_cache(self):
+        repository = _Repository()
+        self.assertEqual(repository.get_paper("p1"), "row")
+        self.assertEqual(repository.get_paper("p1"), "row")
+        self.assertEqual(repository.calls, 1)
+
+    def test_defaults_are_part_of_the_key(self):
+        """A call spelling out a default argument shares the entry of one that omits it"""
+        repository = _Repository()
+        repository.get_paper("p1")
+        repository.get_paper("p1", fields="*")
+        repository.get_paper("p1", fields="title")
+        self.assertEqual(repository.calls, 2)
+
+    def test_none_is_not_cached(self):
+        """A missing row is looked up again, so a row created later is found"""
+        repository = _Repository(result=None)
+        repository.get_paper("p1")
+        repository.get_paper("p1")
+        self.assertEqual(repository.calls, 2)
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test that concurrent identical reads share one query"""
+
+    def test_concurrent_calls_share_one_query(self):
+        repository = _Repository()
+        repository.release.clear()
+        results = []
+
+        def call():
+            results.append(repository.get_paper_uncached("p1"))
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        self.assertTrue(repository.started.wait(5))
+        followers = [threading.Thread(target=call) for _ in range(4)]
+        for follower in followers:
+            follower.start()
+        # Give the followers time to join the leader's flight before it finishes
+        time.sleep(0.2)
+        repository.release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+
+        self.assertEqual(results, ["row"] * 5)
+        self.assertEqual(repository.calls, 1)
+
+    def test_calls_after_a_flight_query_again(self):
+        repository = _Repository()
+        repository.get_paper_uncached("p1")
+        repository.get_paper_uncached("p1")
+        self.assertEqual(repository.calls, 2)
+
+    def test_error_is_raised_and_flight_is_cleared(self):
+        class Failing:
+            calls = 0
+
+            @single_flight
+            def get(self, key):
+                self.calls += 1
+                raise ValueError("query failed")
+
+        failing = Failing()
+        with self.assertRaises(ValueError):
+            failing.get("p1")
+        with self.assertRaises(ValueError):
+            failing.get("p1")
+        self.assertEqual(failing.calls, 2)
+
+
+class TestRequestScoped(unittest.TestCase):
+    """Test the per-request read cache"""
+
+    def test_outside_a_scope_calls_go_through(self):
+        repository = _Repository()
+        repository.get_header("p1")
+        repository.get_header("p1")
+        self.assertEqual(repository.calls, 2)
+
+    def test_inside_a_scope_repeated_calls_are_cached(self):
+        repository = _Repository()
+        with request_cache_scope():
+            repository.get_header("p1")
+            repository.get_header("p1")
+            repository.get_header("p2")
+        self.assertEqual(repository.calls, 2)
+
+    def test_scope_is_discarded_on_exit(self):
+        repository = _Repository()
+        with request_cache_scope():
+            repository.get_header("p1")
+        with request_cache_scope():
+            repository.get_header("p1")
+        self.assertEqual(repository.calls, 2)
+
+    def test_invalidate_request_cache(self):
+        """Invalidating a key makes the next call in the same request query again"""
+        repository = _Repository()
+        with request_cache_scope():
+            repository.get_header("p1")
+            invalidate_request_cache("get_header", "p1")
+            repository.get_header("p1")
+        self.assertEqual(repository.calls, 2)
+
+    def test_invalidate_outside_a_scope_is_a_no_op(self):
+        invalidate_request_cache("get_header", "p1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,78 +1,105 @@
-import re
 import os
+import asyncio
+import functools
+import httpx
 import requests
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import StaleElementReferenceException
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import parse_qs, urlparse
+from bs4 import BeautifulSoup
 import argparse
-import time
 from PyPDF2 import PdfReader
 
+# Shared session so the many candidate downloads of a search reuse pooled connections
+# instead of paying a TCP+TLS handshake per URL
+SESSION = requests.Session()
+_DOWNLOAD_ADAPTER = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=Retry(total=3, backoff_factor=0.3))
+SESSION.mount("http://", _DOWNLOAD_ADAPTER)
+SESSION.mount("https://", _DOWNLOAD_ADAPTER)
+DOWNLOAD_TIMEOUT = (3, 30)  # (connect, read) seconds
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+HEAD_TIMEOUT = 5  # seconds
+MAX_BYTES_PER_PAGE = 250_000  # rough upper bound used to reject oversized files before downloading
+PDF_MAGIC = b"%PDF-"
+
+# Characters that are invalid in file names, each mapped to an underscore
+SANITIZE_TABLE = str.maketrans({char: "_" for char in '<>:"/\\|?*'})
+
 # Sanitize title for file naming to prevent directory issues
 def sanitize_title(title):
-    # Remove invalid characters and replace them with underscores
-    return re.sub(r'[<>:"/\\|?*]', '_', title)
+    # Replace invalid characters with underscores in a single C-level pass
+    return title.translate(SANITIZE_TABLE)
+
+# HTML-only search endpoint: plain GET, no JavaScript, so no browser is needed
+SEARCH_URL = "https://html.duckduckgo.com/html/"
+SEARCH_TIMEOUT = 10  # seconds
+USER_AGENT = "PaperGraph/1.0 (research paper downloader)"
+MAX_CONCURRENT_DOWNLOADS = 5
+
+def result_url(href):
+    # Result links point at a redirect page carrying the target in its uddg parameter
+    if "uddg=" in href:
+        return parse_qs(urlparse(href).query).get("uddg", [None])[0]
+    return href
+
+async def search_pdf_links(title, max_results):
+    async with httpx.AsyncClient(headers={"User-Agent": USER_AGENT}, timeout=SEARCH_TIMEOUT, follow_redirects=True) as client:
+        response = await client.get(SEARCH_URL, params={"q": title + " pdf"})  # Adding 'pdf' increases chance of finding downloadable papers
+        response.raise_for_status()
+
+    soup = BeautifulSoup(response.text, "html.parser")
+    links = [result_url(a["href"]) for a in soup.find_all("a", href=True)]
+    print(f"Found {len(links)} links on the page.")
+
+    # Limit to max_results links, keeping only direct PDF links
+    return [url for url in dict.fromkeys(links[:max_results]) if url and url.lower().endswith(".pdf")]
+
+async def download_first_candidate(urls, save_directory, title, min_pages, max_pages):
+    # Returns (url, file_path) of the first candidate to download successfully, or (None, None)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+    found = asyncio.Event()
+
+    async def try_download(index, url):
+        async with semaphore:
+            # Candidates still queued once a PDF is saved are skipped without downloading
+            if found.is_set():
+                return url, None
+            print(f"Attempting to download from: {url}")
+            # Each candidate gets its own file so concurrent downloads never overwrite each other
+            return url, await asyncio.to_thread(download_paper_from_url, url, save_directory, f"{title}.{index}", min_pages, max_pages)
+
+    tasks = [asyncio.create_task(try_download(index, url)) for index, url in enumerate(urls)]
+    winner = (None, None)
+    for next_done in asyncio.as_completed(tasks):
+        url, candidate_path = await next_done
+        if not candidate_path:
+            continue
+        if winner[1] is None:
+            winner = (url, candidate_path)
+            found.set()
+        else:
+            # Downloads already running in a thread when the winner arrived cannot be interrupted;
+            # they are awaited so their files are removed rather than left behind
+            os.remove(candidate_path)
+    return winner
 
 def search_and_download_google_paper(title, save_directory, min_pages=2, max_pages=50, max_results=50):
     print(f"Searching for: {title}")
-    from selenium.webdriver.chrome.options import Options
-
-    # # Configure Chrome options
-    # chrome_options = Options()
-    # chrome_options.add_argument("--headless")  # Run in headless mode
-
-    # Initialize the WebDriver with options
-    driver = webdriver.Chrome()
+    urls = asyncio.run(search_pdf_links(title, max_results))
+    if not urls:
+        print(f"No PDF link found for '{title}' in the top {max_results} results.")
+        return None
 
-    try:
-        # Step 1: Open Google
-        driver.get("https://www.google.com")
+    url, candidate_path = asyncio.run(download_first_candidate(urls, save_directory, title, min_pages, max_pages))
+    if candidate_path is None:
+        print(f"No PDF link found for '{title}' in the top {max_results} results.")
+        return None
 
-        # Step 2: Accept cookies if needed (depends on location)
-        try:
-            consent_button = driver.find_element(By.XPATH, '//button[contains(text(),"I agree")]')
-            consent_button.click()
-        except Exception:
-            print("No consent button found or click failed.")
-
-        # Step 3: Search for the paper title
-        search_box = driver.find_element(By.NAME, "q")
-        search_box.send_keys(title + " pdf")  # Adding 'pdf' increases chance of finding downloadable papers
-        search_box.send_keys(Keys.RETURN)
-
-        # Use explicit wait for search results to load
-        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.XPATH, '//a')))
-
-        # Step 4: Extract and visit links with retry for stale element references
-        while True:
-            try:
-                links = driver.find_elements(By.XPATH, '//a')
-                print(f"Found {len(links)} links on the page.")
-
-                # Limit to max_results number of links
-                for index, link in enumerate(links[:max_results]):
-                    url = link.get_attribute('href')
-                    if url:
-                        print(f"Checking URL #{index + 1}: {url}")
-                        # Check if the URL ends with ".pdf" instead of just containing "pdf"
-                        if url.lower().endswith(".pdf"):
-                            print(f"Attempting to download from: {url}")
-                            file_path = download_paper_from_url(url, save_directory, title, min_pages, max_pages)
-                            if file_path:
-                                print(f"Successfully downloaded: {title}")
-                                print(f"Download link: {url}")
-                                return file_path  # Return the path to the downloaded PDF file
-                print(f"No PDF link found for '{title}' in the top {max_results} results.")
-                return None  # Return None if no PDF link found within the limit
-            except StaleElementReferenceException:
-                print("Encountered stale element, retrying...")
-                time.sleep(1)
-                continue  # Refetch elements if stale element error occurs
-    finally:
-        driver.quit()
+    file_path = os.path.join(save_directory, f"{sanitize_title(title)}.pdf")
+    os.replace(candidate_path, file_path)
+    print(f"Successfully downloaded: {title}")
+    print(f"Download link: {url}")
+    return file_path  # Return the path to the downloaded PDF file
 
 def download_paper_from_url(url, save_directory, title, min_pages, max_pages):
     try:
@@ -84,32 +111,70 @@ def download_paper_from_url(url, save_directory, title, min_pages, max_pages):
         sanitized_title = sanitize_title(title)
         file_path = os.path.join(save_directory, f"{sanitized_title}.pdf")
 
+        # A HEAD request filters out non-PDFs and oversized files without downloading them.
+        # Servers that reject HEAD are not filtered here; the magic-byte check below still applies
+        head = SESSION.head(url, allow_redirects=True, timeout=HEAD_TIMEOUT)
+        if head.ok:
+            content_type = head.headers.get('Content-Type', '')
+            size = int(head.headers.get('Content-Length') or 0)
+            if 'pdf' not in content_type or size > max_pages * MAX_BYTES_PER_PAGE:
+                print(f"Skipping {url}: Content-Type '{content_type}', {size} bytes")
+                return None
+
         # Download the PDF file
-        response = requests.get(url, stream=True)
-        if response.status_code == 200 and 'application/pdf' in response.headers.get('Content-Type', ''):
-            with open(file_path, "wb") as file:
-                file.write(response.content)
-
-            # Check the number of pages in the downloaded PDF
-            num_pages = get_pdf_page_count(file_path)
-            if num_pages and min_pages <= num_pages <= max_pages:
-                print(f"Downloaded '{sanitized_title}' with {num_pages} pages to '{file_path}'")
-                return file_path  # Return the path to the downloaded file
-            else:
-                print(f"PDF '{sanitized_title}' has {num_pages} pages, outside the range {min_pages}-{max_pages}. Skipping...")
-                os.remove(file_path)  # Remove the file if it doesn't meet the criteria
+        with SESSION.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            if response.status_code != 200:
+                print(f"Failed to download from {url}, status code: {response.status_code}")
+                return None
+
+            # Check the leading bytes rather than trusting Content-Type, before anything is written
+            chunks = response.iter_content(DOWNLOAD_CHUNK_SIZE)
+            first = b""
+            for chunk in chunks:
+                first += chunk
+                if len(first) >= len(PDF_MAGIC):
+                    break
+            if not first.startswith(PDF_MAGIC):
+                print(f"Failed to download from {url}: response is not a PDF")
                 return None
+
+            # Write the body to disk as it arrives instead of holding the whole PDF in memory
+            with open(file_path, "wb") as file:
+                file.write(first)
+                for chunk in chunks:
+                    file.write(chunk)
+
+        # Check the number of pages in the downloaded PDF
+        num_pages = get_pdf_page_count(file_path)
+        if num_pages and min_pages <= num_pages <= max_pages:
+            print(f"Downloaded '{sanitized_title}' with {num_pages} pages to '{file_path}'")
+            return file_path  # Return the path to the downloaded file
         else:
-            print(f"Failed to download from {url}, status code: {response.status_code}")
+            print(f"PDF '{sanitized_title}' has {num_pages} pages, outside the range {min_pages}-{max_pages}. Skipping...")
+            os.remove(file_path)  # Remove the file if it doesn't meet the criteria
             return None
     except Exception as e:
         print(f"An error occurred while downloading: {e}")
         return None
 
 def get_pdf_page_count(file_path):
+    # Keyed on modification time and size so a re-downloaded file is parsed again
     try:
-        reader = PdfReader(file_path)
-        return len(reader.pages)
+        stat = os.stat(file_path)
+    except OSError as e:
+        print(f"Failed to read PDF '{file_path}': {e}")
+        return None
+    return _pdf_page_count(file_path, stat.st_mtime_ns, stat.st_size)
+
+@functools.lru_cache(maxsize=1024)
+def _pdf_page_count(file_path, mtime_ns, size):
+    try:
+        reader = PdfReader(file_path, strict=False)
+        try:
+            # /Count of the root page tree is the total page count, so the page tree is never walked
+            return int(reader.trailer["/Root"]["/Pages"]["/Count"])
+        except (KeyError, TypeError, ValueError):
+            return len(reader.pages)
     except Exception as e:
         print(f"Failed to read PDF '{file_path}': {e}")
         return None